@@ -1,4 +1,11 @@
 import re
+
+from agents.problem_ir import build_ir, text_ir
+from utils.logging import span, traced
+from utils.model_registry import registry
+from utils.process_pool import TaskFailed, TaskTimeout, WorkerCrashed
+
+
 class HumanInTheLoopRequired(Exception):
     pass
 
@@ -38,26 +45,53 @@ def build_parser_input(
 
 
 class ParserAgent:
+    """
+    Cleans the text and builds the problem IR (agents.problem_ir) that
+    every later agent works from. SymPy parsing runs in the solver pool
+    under a timeout, like all other SymPy work (isolate=False parses
+    inline).
+    """
+
+    def __init__(self, timeout: float = 10.0, isolate: bool = True):
+        self.timeout = timeout
+        self.isolate = isolate
 
+    @traced("agent.parser")
     def parse(self, parser_input: dict) -> dict:
         text = self._clean_text(parser_input["extracted_text"])
 
         topic = self._detect_topic(text)
-        variables = self._extract_variables(text)
         constraints = self._extract_constraints(text)
         needs_clarification, reason = self._detect_ambiguity(text)
 
         if needs_clarification:
             raise HumanInTheLoopRequired(reason)
 
+        ir = self._build_ir(text)
+        variables = ir["symbols"] if ir["kind"] != "text" else self._extract_variables(text)
+
         return {
             "problem_text": text,
             "topic": topic,
             "variables": variables,
             "constraints": constraints,
+            "ir": ir,
             "needs_clarification": False,
             "clarification_reason": None
         }
+
+    def _build_ir(self, text: str) -> dict:
+        with span("sympy.parse", isolated=self.isolate) as s:
+            try:
+                if not self.isolate:
+                    ir = build_ir(text)
+                else:
+                    ir = registry.get("solver_pool").run(build_ir, text, timeout=self.timeout)
+            except (TaskTimeout, TaskFailed, WorkerCrashed) as e:
+                # Still routable on keywords; the solver will fail cleanly
+                ir = text_ir(text, f"{type(e).__name__}: {e}")
+            s.set(kind=ir["kind"], degree=ir["degree"])
+        return ir
     
     def _clean_text(self, text: str) -> str:
         text = text.replace("÷", "/").replace("×", "*")
@@ -0,0 +1,178 @@
+"""
+Structured intermediate representation of a problem.
+
+ParserAgent builds it once (in the solver pool, since SymPy parsing can
+run away on hostile input) and puts it in structured_problem["ir"];
+the router, solver and verifier read it instead of re-splitting and
+re-sympifying the text.
+
+    kind        "equation"    lhs = rhs, stored as lhs - rhs
+                "function"    f(x) = body
+                "expression"  a bare expression
+                "text"        nothing SymPy could parse (error says why)
+    expr        srepr of the main expression (see load_expr)
+    canonical   srepr of the expanded expression, for cache keys
+    functions   detected definitions: [{"name", "args", "body"}]
+    symbols     free symbol names; variable is "x" when present,
+                parameters are the others
+    degree      polynomial degree in variable, None if not polynomial
+    objective   "minimum" / "maximum" when the text asks for one
+    target      the given extremum value ("minimum value = 5"), as text
+
+The IR is a plain JSON-serializable dict, so it also travels through
+st.json, the batch JSONL, the API and the process pool as is.
+"""
+import functools
+import re
+
+
+# f(x) = ... anywhere in the first clause ("Find the minimum of f(x) = ...")
+FUNCTION_DEF = re.compile(r"\b([a-zA-Z])\s*\(\s*([a-zA-Z])\s*\)\s*=\s*(.+)$")
+OBJECTIVE = re.compile(r"\b(minimum|maxim(?:um)?)\b")
+TARGET = re.compile(r"(minimum|maxim(?:um)?) value\s*=?\s*([0-9\.\-]+)")
+
+
+def normalize_math_text(text: str) -> str:
+    """
+    Converts human-readable / OCR math into SymPy-friendly syntax
+    """
+    replacements = {
+        "²": "**2",
+        "³": "**3",
+        "–": "-",
+        "−": "-",
+        "^": "**",
+        "×": "*",
+        "·": "*",
+    }
+
+    for k, v in replacements.items():
+        text = text.replace(k, v)
+
+    # 2x -> 2*x
+    text = re.sub(r"(\d)([a-zA-Z])", r"\1*\2", text)
+
+    # )( -> )*(
+    text = re.sub(r"\)\(", r")*(", text)
+
+    return text.replace(" ", "")
+
+
+def text_ir(text: str, error: str = None) -> dict:
+    """
+    The IR of text that was not (or could not be) parsed: only the
+    keyword-level fields are filled in. Needs no SymPy.
+    """
+    lowered = text.lower()
+    objective = OBJECTIVE.search(lowered)
+    target = TARGET.search(lowered)
+    return {
+        "kind": "text",
+        "expr": None,
+        "canonical": None,
+        "functions": [],
+        "symbols": [],
+        "variable": None,
+        "parameters": [],
+        "degree": None,
+        "objective": _objective_name(objective.group(1)) if objective else None,
+        "target": target.group(2) if target else None,
+        "error": error,
+    }
+
+
+def build_ir(text: str) -> dict:
+    """
+    Parses cleaned problem text into the IR. Never raises: text SymPy
+    cannot parse gives kind "text" with the reason in "error".
+    """
+    import sympy as sp
+    from sympy.core.function import AppliedUndef
+
+    ir = text_ir(text)
+    clause = text.split(",")[0]
+    try:
+        definition = FUNCTION_DEF.search(clause)
+        if definition:
+            name, arg, body = definition.groups()
+            expr = sp.sympify(normalize_math_text(body))
+            ir["kind"] = "function"
+            ir["functions"] = [{"name": name, "args": [arg], "body": sp.srepr(expr)}]
+        elif clause.count("=") == 1:
+            lhs, rhs = clause.split("=")
+            expr = sp.sympify(normalize_math_text(lhs)) - sp.sympify(normalize_math_text(rhs))
+            ir["kind"] = "equation"
+        elif "=" not in clause:
+            expr = sp.sympify(normalize_math_text(clause))
+            ir["kind"] = "expression"
+        else:
+            raise ValueError("More than one '=' in the first clause")
+
+        if not isinstance(expr, sp.Expr):
+            raise ValueError(f"Not an algebraic expression: {type(expr).__name__}")
+        # Spaces are stripped before parsing, so words become long symbols
+        # (or, before parentheses, undefined functions: "Findtheminimumoff(x)")
+        words = [str(s) for s in expr.free_symbols if len(str(s)) > 1]
+        words += [str(f.func) for f in expr.atoms(AppliedUndef) if len(str(f.func)) > 1]
+        if words:
+            raise ValueError(f"Words, not math: {', '.join(sorted(words))[:100]}")
+    except Exception as e:
+        ir["kind"] = "text"
+        ir["error"] = f"{type(e).__name__}: {e}"[:300]
+        return ir
+
+    symbols = sorted(str(s) for s in expr.free_symbols)
+    if definition:
+        variable = definition.group(2)
+    else:
+        variable = "x" if "x" in symbols else (symbols[0] if symbols else None)
+
+    ir.update({
+        "expr": sp.srepr(expr),
+        "canonical": sp.srepr(sp.expand(expr)),
+        "symbols": symbols,
+        "variable": variable,
+        "parameters": [s for s in symbols if s != variable],
+        "degree": _degree(expr, variable),
+    })
+    return ir
+
+
+def _objective_name(word: str) -> str:
+    return "minimum" if word.startswith("min") else "maximum"
+
+
+def _degree(expr, variable):
+    import sympy as sp
+
+    if variable is None:
+        return 0
+    try:
+        return int(sp.Poly(expr, sp.Symbol(variable)).degree())
+    except (sp.PolynomialError, sp.GeneratorsNeeded):
+        return None
+
+
+@functools.lru_cache(maxsize=1024)
+def _from_srepr(srepr: str):
+    import sympy as sp
+
+    return sp.sympify(srepr)
+
+
+def load_expr(ir: dict, field: str = "expr"):
+    """
+    The SymPy object behind an IR field. srepr strings are constructor
+    calls (Add(Pow(Symbol('x'), Integer(2)), ...)), so this evaluates
+    them without any of the text heuristics; results are memoized per
+    process.
+    """
+    if ir.get(field) is None:
+        raise ValueError(f"The problem IR has no {field} (kind {ir.get('kind')!r})")
+    return _from_srepr(ir[field])
+
+
+def variable_symbol(ir: dict):
+    import sympy as sp
+
+    return sp.Symbol(ir.get("variable") or "x")
@@ -1,16 +1,38 @@
+from utils.logging import traced
+
+
 class RouterAgent:
     """
     Routes based on mathematical structure, not wording.
     """
 
+    @traced("agent.router")
     def route(self, structured_problem: dict) -> str:
-        text = structured_problem["problem_text"]
+        ir = structured_problem.get("ir")
+        if ir is None or ir["kind"] == "text":
+            return self._route_by_text(structured_problem["problem_text"], ir)
+
+        # Nothing to solve for or factor
+        if not ir["symbols"]:
+            return "unknown"
+
+        # Optimization (must come first): an extremum asked for, whatever
+        # shape the rest of the text parsed into
+        if ir["objective"]:
+            return "quadratic_optimization"
+
+        if ir["kind"] == "equation":
+            return "quadratic_equation"
+
+        # Bare expressions and function definitions without a question → factor
+        return "expression_analysis"
 
-        # Normalize
+    def _route_by_text(self, text: str, ir: dict = None) -> str:
+        # Keyword fallback for text SymPy could not parse
         t = text.lower()
 
         # Optimization (must come first)
-        if "minimum" in t or "maximum" in t:
+        if (ir and ir["objective"]) or "minimum" in t or "maximum" in t:
             return "quadratic_optimization"
 
         # Any equation with '=' → solve
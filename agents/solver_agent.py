@@ -1,6 +1,19 @@
-import sympy as sp
-import re
+import copy
+from agents.problem_ir import build_ir, load_expr, normalize_math_text, variable_symbol
 from utils.answer_validator import AnswerValidator
+from utils.cache import DiskCache, LRUCache, TieredCache
+from utils.logging import METRICS, span
+from utils.model_registry import registry
+from utils.polynomial import slowest, solve_polynomial, vertex
+from utils.process_pool import TaskFailed, TaskTimeout, WorkerCrashed
+
+
+# Last step of an equation solution, by the tier that solved it
+TIER_STEPS = {
+    "closed_form": "Apply the quadratic formula.",
+    "numpy": "Find the roots with NumPy (companion matrix), keeping rational roots exact.",
+    "sympy": "Solve using symbolic computation.",
+}
 
 
 class SolverAgent:
@@ -10,12 +23,113 @@ class SolverAgent:
     - Quadratic equations
     - Quadratic optimization (min/max)
     - Expression analysis (factoring)
+
+    Works from the problem IR built by ParserAgent (structured_problem
+    ["ir"]); the text is only parsed here when a caller passes no IR.
+    All SymPy work runs in the shared solver process pool with a
+    wall-clock timeout (isolate=False runs it inline, as the pool
+    workers themselves do). SymPy is imported inside the methods that
+    use it, so the app / API process never pays for the import.
     """
 
+    # Shared by every SolverAgent in the process (app.py builds one per click)
+    cache = TieredCache(LRUCache(maxsize=1024, ttl=3600))
+
+    @classmethod
+    def configure_cache(cls, maxsize: int = 1024, ttl: float = 3600, disk_path: str = None):
+        """
+        Replaces the shared solve cache. With disk_path, results are also
+        persisted in SQLite and survive restarts.
+        """
+        disk = DiskCache(disk_path, ttl=ttl) if disk_path else None
+        cls.cache = TieredCache(LRUCache(maxsize=maxsize, ttl=ttl), disk)
+
+    def __init__(self, timeout: float = 10.0, isolate: bool = True):
+        self.timeout = timeout
+        self.isolate = isolate
+
     # -------------------------------------------------
     # PUBLIC ENTRY POINT
     # -------------------------------------------------
-    def solve(self, structured_problem: dict, rag_context: list, route: str) -> dict:
+    def solve(
+        self,
+        structured_problem: dict,
+        rag_context: list,
+        route: str,
+        cancel_event=None
+    ) -> dict:
+        problem_text = structured_problem["problem_text"]
+        with span("agent.solver", route=route, input_size=len(problem_text)) as s:
+            result = self._solve_cached(structured_problem, route, cancel_event, s)
+            if result.get("error"):
+                s.set(failure=result["error"])
+            return result
+
+    def _solve_cached(self, structured_problem: dict, route: str, cancel_event, s) -> dict:
+        # Exact text first: a hit here costs a dict lookup, no SymPy at all
+        text_key = f"{route}|text|{structured_problem['problem_text']}"
+        cached = self.cache.get(text_key)
+        if cached is not None:
+            s.set(cache_hit=True, cache="text")
+            return copy.deepcopy(cached)
+
+        # The IR already carries the expanded form, so this needs no SymPy
+        canonical_key = self._canonical_key(structured_problem, route)
+        if canonical_key is not None:
+            cached = self.cache.get(canonical_key)
+            if cached is not None:
+                s.set(cache_hit=True, cache="canonical")
+                self.cache.set(text_key, cached)
+                return copy.deepcopy(cached)
+
+        s.set(cache_hit=False)
+        try:
+            result = self._run(_solve_task, structured_problem, route, cancel_event)
+
+        except TaskTimeout:
+            return {
+                "final_answer": f"Solver timed out after {self.timeout:g}s.",
+                "steps": [],
+                "used_context": [],
+                "error": "timeout",
+                "timed_out": True
+            }
+        except (TaskFailed, WorkerCrashed) as e:
+            return {
+                "final_answer": "Could not solve the problem.",
+                "steps": [],
+                "used_context": [],
+                "error": str(e)
+            }
+
+        if result.get("tier"):
+            s.set(tier=result["tier"])
+            METRICS.inc("solver_tier_total", {"tier": result["tier"]}, help="Uncached solves by solving tier")
+
+        if not result.get("error") and "could not" not in result["final_answer"].lower():
+            stored = copy.deepcopy(result)
+            self.cache.set(text_key, stored)
+            if canonical_key is not None:
+                self.cache.set(canonical_key, stored)
+
+        return result
+
+    def _run(self, task, structured_problem: dict, route: str, cancel_event=None):
+        # _solve_task -> sympy.solve
+        name = "sympy." + task.__name__.strip("_")[:-len("_task")]
+        with span(name, isolated=self.isolate):
+            if not self.isolate:
+                return task(structured_problem, route)
+
+            return registry.get("solver_pool").run(
+                task,
+                structured_problem,
+                route,
+                timeout=self.timeout,
+                cancel_event=cancel_event
+            )
+
+    def _solve_uncached(self, structured_problem: dict, route: str) -> dict:
         if route == "quadratic_equation":
             result = self._solve_quadratic_equation(structured_problem)
 
@@ -33,7 +147,7 @@ class SolverAgent:
             }
 
         # -------- ANSWER-TYPE VALIDATION (FORMAT ONLY) --------
-        if not AnswerValidator.validate(route, result.get("final_answer", "")):
+        if not AnswerValidator.validate(route, result.get("final_answer", ""), self._ir(structured_problem)):
             return {
                 "final_answer": (
                     "The computed result does not match the expected answer type "
@@ -47,60 +161,59 @@ class SolverAgent:
         return result
 
     # -------------------------------------------------
-    # NORMALIZATION (CRITICAL)
+    # CACHE KEY
     # -------------------------------------------------
-    @staticmethod
-    def normalize_math_text(text: str) -> str:
+    def _canonical_key(self, structured_problem: dict, route: str):
         """
-        Converts human-readable / OCR math into SymPy-friendly syntax
+        Canonical SymPy form of the problem, from the IR's expanded
+        expression: "x^2-4x+k" and "k - 4*x + x**2" share one key. Symbol
+        names are kept as-is because answers are expressed in them
+        (x = ..., k = ...). The variable is part of the key, and so are
+        the optimization objective and target: the same f(x) has a
+        different minimum and maximum. Returns None without an IR or
+        when the text did not parse.
         """
-        replacements = {
-            "²": "**2",
-            "³": "**3",
-            "–": "-",
-            "−": "-",
-            "^": "**",
-            "×": "*",
-            "·": "*",
-        }
-
-        for k, v in replacements.items():
-            text = text.replace(k, v)
+        ir = structured_problem.get("ir")
+        if ir is None or ir["canonical"] is None:
+            return None
 
-        # 2x -> 2*x
-        text = re.sub(r"(\d)([a-zA-Z])", r"\1*\2", text)
+        extra = f"{ir['objective'] or ''}|{ir['target'] or ''}" if route == "quadratic_optimization" else ""
+        return f"{route}|canonical|{ir['canonical']}|{ir['variable']}|{extra}"
 
-        # )( -> )*(
-        text = re.sub(r"\)\(", r")*(", text)
+    # -------------------------------------------------
+    # NORMALIZATION (CRITICAL)
+    # -------------------------------------------------
+    normalize_math_text = staticmethod(normalize_math_text)
 
-        return text.replace(" ", "")
+    @staticmethod
+    def _ir(structured_problem: dict) -> dict:
+        ir = structured_problem.get("ir")
+        return ir if ir is not None else build_ir(structured_problem["problem_text"])
 
     # -------------------------------------------------
     # 1. QUADRATIC EQUATION SOLVER
     # -------------------------------------------------
     def _solve_quadratic_equation(self, structured_problem):
+        import sympy as sp
+
         steps = []
-        x = sp.symbols("x")
-        text = structured_problem["problem_text"]
+        ir = self._ir(structured_problem)
+        x = variable_symbol(ir)
 
         steps.append("Identify the quadratic equation.")
 
-        try:
-            lhs, rhs = text.split("=")
-            lhs = self.normalize_math_text(lhs)
-            rhs = self.normalize_math_text(rhs)
-            expr = sp.sympify(lhs) - sp.sympify(rhs)
-        except Exception:
+        if ir["kind"] != "equation":
             return {
                 "final_answer": "Could not parse the equation.",
                 "steps": steps,
                 "used_context": []
             }
+        expr = load_expr(ir)
 
         steps.append("Convert equation to standard form ax² + bx + c = 0.")
 
         try:
-            solutions = sp.solve(expr, x)
+            solutions, tier = solve_polynomial(expr, x)
         except Exception:
             return {
                 "final_answer": "Could not solve the equation.",
@@ -116,83 +229,108 @@ class SolverAgent:
             }
 
         sol_str = ", ".join(str(sol) for sol in solutions)
-        steps.append("Solve using symbolic computation.")
+        steps.append(TIER_STEPS[tier])
 
         return {
-            "final_answer": f"x = {sol_str}",
+            "final_answer": f"{x} = {sol_str}",
             "steps": steps,
-            "used_context": []
+            "used_context": [],
+            "tier": tier,
+            "values": {"symbol": str(x), "roots": [sp.srepr(sol) for sol in solutions]}
         }
 
     # -------------------------------------------------
     # 2. QUADRATIC OPTIMIZATION SOLVER
     # -------------------------------------------------
     def _solve_quadratic_optimization(self, structured_problem):
+        import sympy as sp
+
         steps = []
-        x = sp.symbols("x")
-        text = structured_problem["problem_text"]
+        ir = self._ir(structured_problem)
+        x = variable_symbol(ir)
 
         steps.append("Identify the quadratic function f(x).")
 
-        try:
-            fx_part = text.split(",")[0]
-            expr_raw = fx_part.split("=")[1]
-            expr = sp.sympify(self.normalize_math_text(expr_raw))
-        except Exception:
+        if ir["kind"] not in ("function", "expression"):
             return {
                 "final_answer": "Could not parse the function f(x).",
                 "steps": steps,
                 "used_context": []
             }
+        expr = load_expr(ir)
+
+        # Quadratics: vertex formula, no differentiation or solving
+        found = vertex(expr, x)
+        if found is not None:
+            tier = "closed_form"
+            x_vertex, extremum_value = found
+            steps.append("Use the vertex formula x = -b / (2a).")
+            steps.append(f"Critical point at x = {x_vertex}.")
+            steps.append("Evaluate f(x) at the vertex: c - b² / (4a).")
+        else:
+            tier = "sympy"
+            steps.append("Differentiate f(x) to find the critical point.")
 
-        steps.append("Differentiate f(x) to find the critical point.")
-
-        derivative = sp.diff(expr, x)
-        critical_points = sp.solve(derivative, x)
+            derivative = sp.diff(expr, x)
+            critical_points = sp.solve(derivative, x)
 
-        if not critical_points:
-            return {
-                "final_answer": "No critical point found.",
-                "steps": steps,
-                "used_context": []
-            }
+            if not critical_points:
+                return {
+                    "final_answer": "No critical point found.",
+                    "steps": steps,
+                    "used_context": [],
+                    "tier": tier
+                }
 
-        x_vertex = critical_points[0]
-        steps.append(f"Critical point at x = {x_vertex}.")
+            x_vertex = _pick_extremum(expr, x, critical_points, ir["objective"])
+            steps.append(f"Critical point at x = {x_vertex}.")
 
-        extremum_value = expr.subs(x, x_vertex)
-        steps.append("Evaluate f(x) at the critical point.")
+            extremum_value = expr.subs(x, x_vertex)
+            steps.append("Evaluate f(x) at the critical point.")
 
-        # Extract minimum or maximum value if given
-        match = re.search(r"(minimum|maxim(?:um)?) value\s*=?\s*([0-9\.\-]+)", text.lower())
-        if match:
-            given_val = sp.sympify(match.group(2))
-            k_solution = sp.solve(extremum_value - given_val)
+        # Minimum or maximum value, if the problem gives one
+        if ir["target"] is not None and ir["parameters"]:
+            given_val = sp.sympify(ir["target"])
+            k = sp.Symbol(ir["parameters"][0])
+            if len(ir["parameters"]) == 1:
+                k_solution, k_tier = solve_polynomial(extremum_value - given_val, k)
+            else:
+                k_solution, k_tier = sp.solve(extremum_value - given_val, k), "sympy"
+            tier = slowest(tier, k_tier)
 
             if k_solution:
                 steps.append("Solve for the unknown constant.")
+                values = {"vertex": sp.srepr(x_vertex), "extremum": sp.srepr(extremum_value)}
+                if len(ir["parameters"]) == 1:
+                    values.update(symbol=str(k), roots=[sp.srepr(k_solution[0])])
                 return {
-                    "final_answer": f"k = {str(k_solution[0])}",
+                    "final_answer": f"{k} = {str(k_solution[0])}",
                     "steps": steps,
-                    "used_context": []
+                    "used_context": [],
+                    "tier": tier,
+                    "values": values
                 }
 
+        label = (ir["objective"] or "extremum").capitalize()
         return {
-            "final_answer": f"Extremum value = {str(extremum_value)}",
+            "final_answer": f"{label} value = {str(extremum_value)}",
             "steps": steps,
-            "used_context": []
+            "used_context": [],
+            "tier": tier,
+            "values": {"vertex": sp.srepr(x_vertex), "extremum": sp.srepr(extremum_value)}
         }
 
     # -------------------------------------------------
     # 3. EXPRESSION ANALYSIS (FACTORING)
     # -------------------------------------------------
     def _analyze_expression(self, structured_problem):
+        import sympy as sp
+
         steps = []
-        text = structured_problem["problem_text"]
+        ir = self._ir(structured_problem)
 
         try:
-            expr = sp.sympify(self.normalize_math_text(text))
-            factored = sp.factor(expr)
+            factored = sp.factor(load_expr(ir))
         except Exception:
             return {
                 "final_answer": "Could not analyze the expression.",
@@ -205,5 +343,41 @@ class SolverAgent:
         return {
             "final_answer": f"Factored form: {str(factored)}",
             "steps": steps,
-            "used_context": []
+            "used_context": [],
+            "values": {"factored": sp.srepr(factored)}
         }
+
+
+# -------------------------------------------------
+# POOL TASKS (module-level so they can be pickled)
+# -------------------------------------------------
+def _pick_extremum(expr, x, critical_points: list, objective: str):
+    """
+    The critical point that is the requested kind of extremum by the
+    second-derivative test (the lowest / highest one if several); the
+    first point when none qualifies or no objective was given.
+    """
+    import sympy as sp
+
+    if objective is None:
+        return critical_points[0]
+
+    sign = 1 if objective == "minimum" else -1
+    curvature = sp.diff(expr, x, 2)
+    matching = []
+    for point in critical_points:
+        value = curvature.subs(x, point)
+        if value.is_number and value.is_real and sign * value > 0:
+            matching.append(point)
+    if not matching:
+        return critical_points[0]
+
+    def rank(point):
+        value = expr.subs(x, point)
+        return sign * value if value.is_number and value.is_real else sp.oo
+
+    return min(matching, key=rank)
+
+
+def _solve_task(structured_problem: dict, route: str) -> dict:
+    return SolverAgent(isolate=False)._solve_uncached(structured_problem, route)
@@ -1,12 +1,33 @@
-import sympy as sp
+import re
+
+from utils.logging import METRICS, span, traced
+from utils.model_registry import registry
+from utils.process_pool import TaskFailed, TaskTimeout, WorkerCrashed
+
+
+# "x = 2, 3" / "k = 5": the symbol an answer solves for
+ANSWER_SYMBOL = re.compile(r"^\s*([a-zA-Z])\s*=\s*(.+)$")
+# Share of numeric checks that must pass (utils.verification)
+MIN_CONFIDENCE = 0.95
 
 
 class VerifierAgent:
     """
     Verifies correctness of solver output.
     Conservative: only fails if solution is clearly invalid.
+
+    Answers that carry structured values (solution["values"]) are also
+    substituted back into the problem and checked numerically (see
+    utils.verification), in the solver process pool like the solve
+    itself. If that check cannot run (timeout, crash) the answer is
+    judged on the string and structural checks alone.
     """
 
+    def __init__(self, timeout: float = 10.0, isolate: bool = True):
+        self.timeout = timeout
+        self.isolate = isolate
+
+    @traced("agent.verifier")
     def verify(self, structured_problem: dict, solution: dict) -> dict:
         final_answer = solution.get("final_answer", "")
 
@@ -17,6 +38,20 @@ class VerifierAgent:
                 "reason": "Empty solution."
             }
 
+        # Solver was stopped by its wall-clock limit
+        if solution.get("timed_out"):
+            return {
+                "is_valid": False,
+                "reason": "Solver timed out; the problem may be too complex to solve automatically."
+            }
+
+        # Solver reported a failure (answer-type validation, pool errors)
+        if solution.get("error"):
+            return {
+                "is_valid": False,
+                "reason": f"Solver failed: {solution['error']}."
+            }
+
         # Rejects Invalid answer
         if "invalid answer format" in solution["final_answer"].lower():
             return {
@@ -31,7 +66,93 @@ class VerifierAgent:
                 "reason": "Solver failed to compute solution."
             }
 
+        # Structural checks against the parsed problem
+        reason = self._check_structure(structured_problem.get("ir"), final_answer)
+        if reason:
+            return {
+                "is_valid": False,
+                "reason": reason
+            }
+
+        # Substitute the answer back into the problem
+        check = self._check_values(structured_problem.get("ir"), solution.get("values"))
+        if check is None:
+            return {
+                "is_valid": True
+            }
+
+        if check["reason"] or check["confidence"] < MIN_CONFIDENCE:
+            return {
+                "is_valid": False,
+                "reason": check["reason"] or "Answer does not satisfy the problem.",
+                "confidence": check["confidence"],
+                "check": check
+            }
+
         # Otherwise accept
         return {
-            "is_valid": True
+            "is_valid": True,
+            "confidence": check["confidence"],
+            "check": check
         }
+
+    def _check_values(self, ir: dict, values: dict):
+        if not ir or ir["kind"] == "text" or not values:
+            return None
+
+        with span("sympy.verify", isolated=self.isolate) as s:
+            try:
+                if self.isolate:
+                    check = registry.get("solver_pool").run(_verify_task, ir, values, timeout=self.timeout)
+                else:
+                    check = _verify_task(ir, values)
+            except (TaskTimeout, TaskFailed, WorkerCrashed) as e:
+                s.set(failure=type(e).__name__)
+                return None
+
+            if check["method"] == "none":
+                return None
+            s.set(method=check["method"], confidence=check["confidence"])
+            METRICS.inc("verifier_checks_total", {"method": check["method"]}, help="Numeric answer checks by method")
+            return check
+
+    def _check_structure(self, ir: dict, final_answer: str):
+        if not ir or ir["kind"] == "text":
+            return None
+
+        match = ANSWER_SYMBOL.match(final_answer)
+        if not match:
+            return None
+        symbol, values = match.groups()
+
+        if symbol not in ir["symbols"]:
+            return f"Answer solves for '{symbol}', which does not appear in the problem."
+
+        # A polynomial equation of degree n has at most n roots
+        if ir["kind"] == "equation" and symbol == ir["variable"] and ir["degree"]:
+            if _count_items(values) > ir["degree"]:
+                return f"More solutions than a degree-{ir['degree']} equation can have."
+
+        return None
+
+
+def _count_items(values: str) -> int:
+    # Top-level commas only: CRootOf(x**5 - x + 1, 0) is one root
+    depth, count = 0, 1
+    for ch in values:
+        if ch in "([{":
+            depth += 1
+        elif ch in ")]}":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            count += 1
+    return count
+
+
+# -------------------------------------------------
+# POOL TASKS (module-level so they can be pickled)
+# -------------------------------------------------
+def _verify_task(ir: dict, values: dict) -> dict:
+    from utils.verification import check_solution
+
+    return check_solution(ir, values)
@@ -1,7 +1,6 @@
 import streamlit as st
 from PIL import Image
 import numpy as np
-import tempfile
 import warnings
 
 warnings.filterwarnings(
@@ -9,27 +8,18 @@ warnings.filterwarnings(
     message=".*pin_memory.*"
 )
 
-# Try importing OCR and ASR, but allow graceful fallback
-try:
-    from multimodal.ocr import run_ocr
-    OCR_AVAILABLE = True
-except Exception as e:
-    OCR_AVAILABLE = False
-    run_ocr = None
-
-try:
-    from multimodal.asr import whisper_transcribe
-    ASR_AVAILABLE = True
-except Exception as e:
-    ASR_AVAILABLE = False
-    whisper_transcribe = None
-
-from agents.parser_agent import build_parser_input, HumanInTheLoopRequired, ParserAgent
-from agents.router_agent import RouterAgent
-from agents.solver_agent import SolverAgent
-from agents.verifier_agent import VerifierAgent
-from rag.retriever import RAGRetriever
+# OCR and ASR are checked without importing their libraries (torch,
+# EasyOCR, Whisper); models load the first time an image / audio file
+# is actually uploaded, so text-only sessions never pay for them
+from multimodal import asr, ocr
+
+OCR_AVAILABLE = ocr.is_available()
+ASR_AVAILABLE = asr.is_available()
+
 from memory.memory_store import MemoryStore
+from pipeline.math_pipeline import MathPipeline
+from utils.logging import METRICS, start_trace
+from utils.model_registry import registry
 
 
 if "original_input" not in st.session_state:
@@ -56,10 +46,46 @@ if "route" not in st.session_state:
 if "confidence" not in st.session_state:
     st.session_state.confidence = 1.0
 
+# The last pipeline result, its trace and the feedback given on it. Kept
+# across reruns: clicking a feedback button reruns the script with
+# "Proceed" no longer pressed
+if "result" not in st.session_state:
+    st.session_state.result = None
+
+if "trace" not in st.session_state:
+    st.session_state.trace = None
+
+if "feedback" not in st.session_state:
+    st.session_state.feedback = None
+
 
 # UI
 st.title("📘 AI Math Mentor")
 
+with st.sidebar.expander("Model load times"):
+    st.json(registry.stats())
+
+with st.sidebar.expander("Metrics (Prometheus)"):
+    st.code(METRICS.render_prometheus(), language="text")
+
+
+def _render_trace(container, trace, result=None):
+    """
+    Agent Trace: every span the run produced (agent calls, model loads,
+    FAISS / BM25 searches, SymPy calls, memory I/O) with its duration,
+    and the pipeline stages that set the run's latency.
+    """
+    rows = trace.rows()
+    with container:
+        st.subheader("Agent Trace")
+        if not rows:
+            return
+        st.caption(f"Total {trace.to_dict()['duration_ms']:.1f} ms across {len(rows)} spans")
+        if result and result.get("critical_path", {}).get("stages"):
+            path = result["critical_path"]
+            st.caption(f"Critical path ({path['ms']:.1f} ms): {' → '.join(path['stages'])}")
+        st.table(rows)
+
 input_type = st.radio(
     "Select input type",
     ["text", "image", "audio"]
@@ -83,8 +109,9 @@ elif input_type == "image":
         image_file = st.file_uploader("Upload Image", type=["png", "jpg", "jpeg"])
         if image_file:
             image = Image.open(image_file).convert("RGB")
-            image_np = np.array(image)
-            text, conf = run_ocr(image_np)
+            # A view of PIL's buffer; preprocessing shrinks it before OCR
+            image_np = np.asarray(image)
+            text, conf = ocr.run_ocr(image_np)
             st.session_state.extracted_text = text
             st.session_state.confidence = conf
             st.session_state.original_input = image_file
@@ -95,14 +122,27 @@ elif input_type == "audio":
     else:
         audio_file = st.file_uploader("Upload Audio", type=["wav", "mp3", "m4a"])
         if audio_file:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp:
-                tmp.write(audio_file.read())
-                audio_path = tmp.name
-            text, conf = whisper_transcribe(audio_path)
-            st.session_state.extracted_text = text
-            st.session_state.confidence = conf
-            st.session_state.original_input = audio_path
-
+            # Decoded in memory; partial transcripts show up chunk by chunk
+            partial_box = st.empty()
+            result = None
+            for result in asr.iter_transcribe(audio_file.getvalue()):
+                if not result["done"]:
+                    partial_box.info(f"📝 {result['text']} …")
+            partial_box.empty()
+            st.session_state.extracted_text = result["text"]
+            st.session_state.confidence = result["confidence"]
+            st.session_state.original_input = audio_file.name
+            if len(result["segments"]) > 1:
+                with st.expander("🎙️ Segments"):
+                    st.dataframe(result["segments"], use_container_width=True)
+
+
+# Start loading the embedder and vector store in the background as soon
+# as there is a problem to solve, so the "Proceed" click doesn't pay for
+# the load but a bare page view (or a fresh replica) never imports them
+if st.session_state.extracted_text and "warm_up_started" not in st.session_state:
+    st.session_state.warm_up_started = True
+    registry.warm_up(["embeddings", "vector_store"], background=True)
 
 
 # Review and Confirm
@@ -120,150 +160,178 @@ if st.session_state.extracted_text:
     )
 
 
+# One pipeline (per reuse setting) and one memory store per server
+# process, shared by every session and rerun: each MemoryStore holds a
+# SQLite connection and checks the schema when opened
+@st.cache_resource
+def _pipeline(reuse_memory: bool) -> MathPipeline:
+    return MathPipeline(reuse_memory=reuse_memory, save_to_memory=True)
+
+
+@st.cache_resource
+def _memory_store() -> MemoryStore:
+    return MemoryStore()
+
+
+def _save_feedback(feedback: str, correction: str = None):
+    solution = st.session_state.solution
+    record = {
+        "problem_text": st.session_state.structured_problem["problem_text"],
+        "route": st.session_state.route,
+        "final_answer": solution["final_answer"],
+        "steps": solution["steps"],
+        "verified": feedback == "correct",
+        "user_feedback": feedback
+    }
+    if correction:
+        record["correction"] = correction
+    _memory_store().save(record)
+    st.session_state.feedback = feedback
+
+
+def _show_result(result: dict):
+    if result["status"] == "needs_clarification":
+        st.warning(f"HITL required: {result['reason']}")
+        st.stop()
+
+    # -------- PARSER --------
+    structured_problem = result["structured_problem"]
+    st.session_state.structured_problem = structured_problem
+
+    st.subheader("Parsed Problem")
+    st.json(structured_problem)
+
+    # -------- ROUTER --------
+    route = result["route"]
+    st.session_state.route = route
+
+    st.caption(f"Detected problem type: `{route}`")
+
+    if route == "unknown":
+        st.warning(
+            "Problem intent could not be inferred automatically. "
+            "Please rephrase the problem."
+        )
+        st.stop()
+
+    # -------- RAG --------
+    with st.expander("Retrieved Knowledge Context"):
+        for i, ctx in enumerate(result["retrieved_context"], 1):
+            st.markdown(f"**Source {i}:** {ctx}")
+
+    # -------- MEMORY LOOKUP --------
+    past_solution = result.get("memory_match")
+
+    if past_solution:
+        similarity = past_solution.get("similarity")
+        if similarity is not None:
+            st.info(f"Similar problem found in memory (similarity {similarity:.2f}).")
+        else:
+            st.info("Similar problem found in memory.")
+        st.write(past_solution["final_answer"])
+        feedback = past_solution.get("feedback")
+        if feedback and (feedback["correct"] or feedback["incorrect"]):
+            st.caption(f"Rated correct {feedback['correct']}x, incorrect {feedback['incorrect']}x")
+        if past_solution.get("correction"):
+            st.caption(f"Latest correction: {past_solution['correction']}")
+
+    if result["status"] == "memory_hit":
+        st.subheader("Final Answer")
+        st.success(past_solution["final_answer"])
+        st.stop()
+
+    # -------- SOLVER --------
+    solution = result["solution"]
+    st.session_state.solution = solution
+
+    # -------- VERIFIER --------
+    verification = result["verification"]
+
+    if not verification["is_valid"]:
+        st.error(f"Solution verification failed: {verification['reason']}")
+        st.stop()
+
+    if verification.get("check"):
+        check = verification["check"]
+        st.caption(
+            f"Answer substituted back into the problem: {check['checks']} "
+            f"{check['method']} check(s), confidence {check['confidence']:.2f}"
+        )
+
+    # -------- CONFIDENCE --------
+    st.subheader("Confidence Indicator")
+    conf = st.session_state.confidence
+    if conf >= 0.9:
+        st.success(f"High confidence ({conf:.2f})")
+    elif conf >= 0.75:
+        st.warning(f"Medium confidence ({conf:.2f})")
+    else:
+        st.error(f"Low confidence ({conf:.2f})")
+
+    # -------- OUTPUT --------
+    st.subheader("Step-by-Step Solution")
+    for step in solution["steps"]:
+        st.write("•", step)
+
+    st.subheader("Final Answer")
+    st.success(solution["final_answer"])
+
+    # (The pipeline's memory_save stage already stored the verified solution)
+
+    # -------- FEEDBACK --------
+    st.subheader("Was this solution helpful?")
+    if st.session_state.feedback == "correct":
+        st.success("Feedback saved.")
+        return
+    if st.session_state.feedback == "incorrect":
+        st.success("Correction saved.")
+        return
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        if st.button("✅ Correct"):
+            _save_feedback("correct")
+            st.success("Feedback saved.")
+            return
+
+    with col2:
+        if st.button("❌ Incorrect"):
+            st.session_state.feedback = "pending_correction"
+
+    if st.session_state.feedback == "pending_correction":
+        correction = st.text_area("Provide correction or comment")
+        if st.button("Submit correction") and correction:
+            _save_feedback("incorrect", correction)
+            st.success("Correction saved.")
+
+
 # Proceed
 if st.session_state.extracted_text and st.session_state.user_confirmed:
+    reuse_memory = st.checkbox("Reuse a matching past solution instead of solving again")
+
     if st.button("Proceed"):
-        try:
-            parser_input = build_parser_input(
+        st.session_state.result = None
+        st.session_state.feedback = None
+        # Spans of this run, rendered in the Agent Trace section
+        with start_trace("app.proceed", input_type=input_type) as trace:
+            st.session_state.trace = trace
+            # Parse → route, then retrieval alongside memory lookup →
+            # solve → verify (pipeline.dag); stops early on an unknown
+            # route or a reused memory hit
+            st.session_state.result = _pipeline(reuse_memory).run(
+                st.session_state.edited_text,
                 input_type=input_type,
-                original_input=st.session_state.original_input,
-                extracted_text=st.session_state.edited_text,
                 confidence=st.session_state.confidence,
-                user_confirmed=st.session_state.user_confirmed
-            )
-
-            # -------- AGENT TRACE --------
-            st.subheader("Agent Trace")
-            st.markdown("""
-            - **Parser Agent** → Structured the problem  
-            - **Router Agent** → Determined intent  
-            - **RAG Retriever** → Retrieved knowledge  
-            - **Solver Agent** → Solved the problem  
-            - **Verifier Agent** → Verified correctness  
-            """)
-
-            # -------- PARSER --------
-            parser_agent = ParserAgent()
-            structured_problem = parser_agent.parse(parser_input)
-            st.session_state.structured_problem = structured_problem
-
-            st.subheader("Parsed Problem")
-            st.json(structured_problem)
-
-            # -------- RAG --------
-            retriever = RAGRetriever()
-            retrieved_context = retriever.retrieve(
-                structured_problem["problem_text"]
+                original_input=st.session_state.original_input
             )
 
-            with st.expander("Retrieved Knowledge Context"):
-                for i, ctx in enumerate(retrieved_context, 1):
-                    st.markdown(f"**Source {i}:** {ctx}")
-
-            # -------- ROUTER --------
-            router = RouterAgent()
-            route = router.route(structured_problem)
-            st.session_state.route = route
-
-            st.caption(f"Detected problem type: `{route}`")
-
-            if route == "unknown":
-                st.warning(
-                    "Problem intent could not be inferred automatically. "
-                    "Please rephrase the problem."
-                )
-                st.stop()
-
-            # -------- MEMORY LOOKUP --------
-            memory = MemoryStore()
-            past_solution = memory.find_similar(structured_problem["problem_text"])
-
-            if past_solution:
-                st.info("Similar problem found in memory.")
-                st.write(past_solution["final_answer"])
-                if st.checkbox("Reuse past solution"):
-                    st.subheader("Final Answer")
-                    st.success(past_solution["final_answer"])
-                    st.stop()
-
-            # -------- SOLVER --------
-            solver = SolverAgent()
-            solution = solver.solve(
-                structured_problem=structured_problem,
-                rag_context=retrieved_context,
-                route=route
-            )
-            st.session_state.solution = solution
-
-            # -------- VERIFIER --------
-            verifier = VerifierAgent()
-            verification = verifier.verify(
-                structured_problem=structured_problem,
-                solution=solution
-            )
 
-            if not verification["is_valid"]:
-                st.error("Solution verification failed.")
-                st.stop()
-
-            # -------- CONFIDENCE --------
-            st.subheader("Confidence Indicator")
-            conf = st.session_state.confidence
-            if conf >= 0.9:
-                st.success(f"High confidence ({conf:.2f})")
-            elif conf >= 0.75:
-                st.warning(f"Medium confidence ({conf:.2f})")
-            else:
-                st.error(f"Low confidence ({conf:.2f})")
-
-            # -------- OUTPUT --------
-            st.subheader("Step-by-Step Solution")
-            for step in solution["steps"]:
-                st.write("•", step)
-
-            st.subheader("Final Answer")
-            st.success(solution["final_answer"])
-
-            # -------- SAVE MEMORY --------
-            memory.save({
-                "problem_text": structured_problem["problem_text"],
-                "route": route,
-                "final_answer": solution["final_answer"],
-                "steps": solution["steps"],
-                "verified": True,
-                "user_feedback": "unknown"
-            })
-
-            # -------- FEEDBACK --------
-            st.subheader("Was this solution helpful?")
-            col1, col2 = st.columns(2)
-
-            with col1:
-                if st.button("✅ Correct"):
-                    memory.save({
-                        "problem_text": structured_problem["problem_text"],
-                        "route": route,
-                        "final_answer": solution["final_answer"],
-                        "steps": solution["steps"],
-                        "verified": True,
-                        "user_feedback": "correct"
-                    })
-                    st.success("Feedback saved.")
-
-            with col2:
-                if st.button("❌ Incorrect"):
-                    correction = st.text_area("Provide correction or comment")
-                    if correction:
-                        memory.save({
-                            "problem_text": structured_problem["problem_text"],
-                            "route": route,
-                            "final_answer": solution["final_answer"],
-                            "steps": solution["steps"],
-                            "verified": False,
-                            "user_feedback": "incorrect",
-                            "correction": correction
-                        })
-                        st.success("Correction saved.")
-
-        except HumanInTheLoopRequired as e:
-            st.warning(f"HITL required: {str(e)}")
+# Result of the last run, while the problem text is unchanged
+result = st.session_state.result
+if result is not None and result["problem_text"] == st.session_state.edited_text:
+    trace_container = st.container()
+    try:
+        _show_result(result)
+    finally:
+        _render_trace(trace_container, st.session_state.trace, result)
@@ -0,0 +1,184 @@
+"""
+OCR pre-processing benchmark: raw full-size images vs multimodal.preprocess.
+
+    python -m benchmarks.ocr_preprocess
+    python -m benchmarks.ocr_preprocess --images photos/ -o ocr.json
+    python -m benchmarks.ocr_preprocess --no-ocr     # pre-processing only
+
+Without --images, every corpus problem is rendered as a synthetic phone
+photo (12 MP, large text, a few degrees of skew, uneven lighting and
+sensor noise) whose ground truth is the problem text. With --images,
+each image needs a sidecar <name>.txt holding its expected text.
+
+Both paths are timed end to end (pre-processing + readtext) and scored by
+character accuracy against the ground truth (1 - edit distance / length,
+ignoring case and whitespace).
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.run import CORPUS_PATH, load_corpus, summarize
+from multimodal.ocr import normalize_math_ocr
+from multimodal.preprocess import DEFAULT_CONFIG, preprocess
+
+
+PHOTO_SIZE = (4032, 3024)
+FONT_SIZE = 110
+MAX_SKEW = 4.0
+IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg", ".tif", ".tiff")
+
+
+# -------------------------------------------------
+# INPUTS
+# -------------------------------------------------
+def synthetic_photo(text: str, rng: np.random.Generator) -> np.ndarray:
+    """
+    The text in a large font on a 12 MP canvas, rotated a few degrees,
+    under a lighting gradient and Gaussian noise.
+    """
+    from PIL import Image, ImageDraw, ImageFont
+
+    width, height = PHOTO_SIZE
+    page = Image.new("L", PHOTO_SIZE, 235)
+    draw = ImageDraw.Draw(page)
+    font = ImageFont.load_default(size=FONT_SIZE)
+    x = int(width * rng.uniform(0.08, 0.25))
+    y = int(height * rng.uniform(0.3, 0.6))
+    draw.text((x, y), text, fill=30, font=font)
+    page = page.rotate(rng.uniform(-MAX_SKEW, MAX_SKEW), resample=Image.BILINEAR, fillcolor=235)
+
+    pixels = np.asarray(page, dtype=np.float32)
+    light = np.linspace(0.75, 1.0, width, dtype=np.float32)[None, :]
+    pixels = pixels * light + rng.normal(0, 8, pixels.shape).astype(np.float32)
+    gray = np.clip(pixels, 0, 255).astype(np.uint8)
+    return np.repeat(gray[..., None], 3, axis=2)
+
+
+def load_images(directory: str) -> list:
+    from PIL import Image
+
+    samples = []
+    for path in sorted(glob.glob(os.path.join(directory, "*"))):
+        base, suffix = os.path.splitext(path)
+        if suffix.lower() not in IMAGE_SUFFIXES or not os.path.exists(base + ".txt"):
+            continue
+        with open(base + ".txt", "r", encoding="utf-8") as f:
+            truth = f.read().strip()
+        samples.append((os.path.basename(path), np.asarray(Image.open(path).convert("RGB")), truth))
+    return samples
+
+
+# -------------------------------------------------
+# SCORING
+# -------------------------------------------------
+def char_accuracy(predicted: str, truth: str) -> float:
+    a = "".join(normalize_math_ocr(predicted).lower().split())
+    b = "".join(truth.lower().split())
+    if not b:
+        return float(not a)
+    return max(0.0, 1.0 - _edit_distance(a, b) / len(b))
+
+
+def _edit_distance(a: str, b: str) -> int:
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+
+def read(reader, image: np.ndarray) -> str:
+    return " ".join(text for _, text, _ in reader.readtext(image))
+
+
+# -------------------------------------------------
+# BENCHMARK
+# -------------------------------------------------
+def run(samples: list, use_ocr: bool = True) -> dict:
+    reader = None
+    if use_ocr:
+        from utils.model_registry import registry
+
+        reader = registry.get("ocr_reader")
+        # Warm up so the first sample does not carry model start-up
+        reader.readtext(np.full((64, 64, 3), 255, dtype=np.uint8))
+
+    paths = {"raw": {"ms": [], "accuracy": []}, "preprocessed": {"ms": [], "accuracy": [], "prep_ms": []}}
+    shapes = []
+
+    for name, image, truth in samples:
+        start = time.perf_counter()
+        prepared, info = preprocess(image)
+        prep_ms = (time.perf_counter() - start) * 1000
+        paths["preprocessed"]["prep_ms"].append(prep_ms)
+        shapes.append({"sample": name, "input": info["input_shape"], "output": list(prepared.shape[:2]), "angle": info["angle"]})
+
+        if reader is None:
+            continue
+
+        text = read(reader, prepared)
+        paths["preprocessed"]["ms"].append((time.perf_counter() - start) * 1000)
+        paths["preprocessed"]["accuracy"].append(char_accuracy(text, truth))
+
+        start = time.perf_counter()
+        text = read(reader, image)
+        paths["raw"]["ms"].append((time.perf_counter() - start) * 1000)
+        paths["raw"]["accuracy"].append(char_accuracy(text, truth))
+
+    report = {"samples": len(samples), "config": vars(DEFAULT_CONFIG), "shapes": shapes, "paths": {}}
+    for path, values in paths.items():
+        entry = {key: summarize(ms) for key, ms in values.items() if key != "accuracy" and ms}
+        if values["accuracy"]:
+            entry["accuracy"] = round(float(np.mean(values["accuracy"])), 4)
+        if entry:
+            report["paths"][path] = entry
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark OCR pre-processing against the raw path.")
+    parser.add_argument("--images", help="Directory of images with <name>.txt ground truth")
+    parser.add_argument("--limit", type=int, help="Use at most this many samples")
+    parser.add_argument("--no-ocr", action="store_true", help="Time pre-processing only (no EasyOCR needed)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="Write the JSON report here")
+    args = parser.parse_args(argv)
+
+    if args.images:
+        samples = load_images(args.images)
+    else:
+        rng = np.random.default_rng(args.seed)
+        samples = [(p["id"], synthetic_photo(p["problem_text"], rng), p["problem_text"]) for p in load_corpus(CORPUS_PATH)]
+    samples = samples[:args.limit] if args.limit else samples
+    if not samples:
+        print("No samples found", file=sys.stderr)
+        return 1
+
+    report = run(samples, use_ocr=not args.no_ocr)
+
+    print(f"{'path':<14}{'p50 ms':>10}{'p95 ms':>10}{'prep p50':>10}{'accuracy':>10}")
+    for path, entry in report["paths"].items():
+        total = entry.get("ms", {})
+        prep = entry.get("prep_ms", {})
+        accuracy = entry.get("accuracy")
+        print(
+            f"{path:<14}{total.get('p50', float('nan')):>10.1f}{total.get('p95', float('nan')):>10.1f}"
+            f"{prep.get('p50', float('nan')):>10.1f}{accuracy if accuracy is not None else float('nan'):>10.3f}"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
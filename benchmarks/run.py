@@ -0,0 +1,388 @@
+"""
+End-to-end benchmark over a fixed problem corpus.
+
+    python -m benchmarks.run -o benchmarks/results.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json --save-baseline
+    python -m benchmarks.run --baseline benchmarks/baseline.json   # exits 1 on regression
+
+Each agent stage (parse, route, retrieve, memory_lookup, solve, verify)
+is run over the corpus on its own, then the full MathPipeline is run
+over it on a thread pool. Per stage it reports the cold first call
+(lazy model / pool loading included) separately from the warm calls
+(p50 / p95 / p99, throughput) and the peak RSS of the process so far.
+
+Solver and retrieval caches are cleared before every call so warm
+numbers measure real work; --keep-caches measures the cached path.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from agents.parser_agent import build_parser_input, ParserAgent
+from agents.router_agent import RouterAgent
+from agents.solver_agent import SolverAgent
+from agents.verifier_agent import VerifierAgent
+from pipeline.math_pipeline import MathPipeline
+
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "corpus.jsonl")
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+STAGES = ["parse", "route", "retrieve", "memory_lookup", "solve", "verify"]
+# A stage regresses when it is this much slower than the baseline...
+TOLERANCE = 0.20
+# ...and slower by at least this many ms (sub-ms stages are mostly noise)
+MIN_DELTA_MS = 0.5
+
+
+def load_corpus(path: str) -> list:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def peak_rss_mb(who=None):
+    """
+    Peak resident set size in MB (None where the resource module is
+    unavailable). RUSAGE_CHILDREN only covers children that have exited.
+    """
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF if who is None else who)
+    # ru_maxrss is KB on Linux, bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(usage.ru_maxrss / scale, 1)
+
+
+def summarize(samples_ms: list) -> dict:
+    if not samples_ms:
+        return {"n": 0}
+    samples = np.asarray(samples_ms)
+    return {
+        "n": len(samples),
+        "mean": round(float(samples.mean()), 3),
+        "min": round(float(samples.min()), 3),
+        "p50": round(float(np.percentile(samples, 50)), 3),
+        "p95": round(float(np.percentile(samples, 95)), 3),
+        "p99": round(float(np.percentile(samples, 99)), 3),
+        "max": round(float(samples.max()), 3),
+    }
+
+
+# -------------------------------------------------
+# STAGES
+# -------------------------------------------------
+class Benchmark:
+    def __init__(self, corpus: list, repeat: int = 5, use_rag: bool = True, keep_caches: bool = False,
+                 workers: int = 4, timeout: float = 10.0):
+        self.corpus = corpus
+        self.repeat = repeat
+        self.use_rag = use_rag
+        self.keep_caches = keep_caches
+        self.workers = workers
+        self.timeout = timeout
+        self._memory_dir = tempfile.TemporaryDirectory(prefix="bench-memory-")
+
+    def run(self, stages=None) -> dict:
+        stages = [s for s in (stages or STAGES) if self.use_rag or s != "retrieve"]
+        report = {
+            "meta": {
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+                "corpus_size": len(self.corpus),
+                "repeat": self.repeat,
+                "workers": self.workers,
+                "use_rag": self.use_rag,
+                "keep_caches": self.keep_caches,
+            },
+            "stages": {},
+        }
+
+        # Later stages consume earlier outputs, so parse and route always run
+        self.structured = self._stage(report, "parse", self._parse, self.corpus, record="parse" in stages)
+        pairs = [(p, self._route(p)) for p in self.structured]
+        if "route" in stages:
+            self._stage(report, "route", self._route, self.structured)
+        report["meta"]["route_accuracy"] = round(
+            sum(route == item["route"] for (_, route), item in zip(pairs, self.corpus)) / len(self.corpus), 3
+        )
+
+        if "retrieve" in stages:
+            self._stage(report, "retrieve", self._retrieve, self.structured)
+        if "memory_lookup" in stages:
+            self._stage(report, "memory_lookup", self._memory_lookup, self.structured)
+
+        solutions = None
+        if "solve" in stages or "verify" in stages:
+            solutions = self._stage(report, "solve", self._solve, pairs, record="solve" in stages)
+        if "verify" in stages:
+            self._stage(report, "verify", self._verify, list(zip(self.structured, solutions)))
+
+        report["pipeline"] = self._pipeline()
+        report["peak_rss_mb"] = peak_rss_mb()
+
+        from utils.model_registry import registry
+        report["load_seconds"] = {
+            name: round(seconds, 3) for name, seconds in registry.load_times.items()
+        }
+        # Solver workers only show up in RUSAGE_CHILDREN once they exit
+        if registry.is_loaded("solver_pool"):
+            registry.get("solver_pool").shutdown()
+            registry.reset("solver_pool")
+        report["children_peak_rss_mb"] = peak_rss_mb(resource.RUSAGE_CHILDREN) if resource else None
+        self._memory_dir.cleanup()
+        return report
+
+    def _stage(self, report: dict, name: str, fn, inputs: list, record: bool = True) -> list:
+        """
+        Calls fn on every input, repeat times. The very first call is the
+        cold sample; outputs of the first pass are returned for the next
+        stage. Failures are counted, and a stage that fails on its cold
+        call (e.g. a model that cannot load) is skipped.
+        """
+        outputs, warm, errors = [], [], Counter()
+        cold_ms = None
+
+        for rep in range(self.repeat):
+            for item in inputs:
+                self._clear_caches()
+                start = time.perf_counter()
+                try:
+                    output = fn(item)
+                except Exception as e:
+                    output = None
+                    errors[f"{type(e).__name__}: {e}"[:200]] += 1
+                elapsed = (time.perf_counter() - start) * 1000
+
+                if cold_ms is None:
+                    cold_ms = elapsed
+                    if output is None and errors:
+                        return self._skip(report, name, errors, record, len(inputs))
+                else:
+                    warm.append(elapsed)
+                if rep == 0:
+                    outputs.append(output)
+
+        if record:
+            total_s = sum(warm) / 1000
+            report["stages"][name] = {
+                "cold_ms": round(cold_ms, 3),
+                "warm_ms": summarize(warm),
+                "throughput_per_s": round(len(warm) / total_s, 1) if total_s else None,
+                "peak_rss_mb": peak_rss_mb(),
+                "errors": dict(errors),
+            }
+        return outputs
+
+    @staticmethod
+    def _skip(report: dict, name: str, errors: Counter, record: bool, n: int) -> list:
+        if record:
+            report["stages"][name] = {"skipped": True, "errors": dict(errors)}
+        return [None] * n
+
+    def _clear_caches(self):
+        if self.keep_caches:
+            return
+        SolverAgent.cache.clear()
+        if "rag.retriever" in sys.modules:
+            from rag import retriever
+            retriever._embedding_cache.clear()
+            retriever._result_cache.clear()
+
+    def _parse(self, item: dict) -> dict:
+        parser_input = build_parser_input(
+            input_type="text",
+            original_input=item["problem_text"],
+            extracted_text=item["problem_text"],
+            confidence=1.0,
+            user_confirmed=True
+        )
+        return ParserAgent().parse(parser_input)
+
+    def _route(self, structured_problem: dict) -> str:
+        return RouterAgent().route(structured_problem)
+
+    def _retrieve(self, structured_problem: dict) -> list:
+        if not hasattr(self, "_retriever"):
+            from rag.retriever import RAGRetriever
+            self._retriever = RAGRetriever()
+        return self._retriever.retrieve(
+            structured_problem["problem_text"], topic=structured_problem["topic"]
+        )
+
+    def _memory_lookup(self, structured_problem: dict):
+        # A private store seeded with the corpus, so lookups hit and the
+        # user's memory/memory.db is never touched
+        if not hasattr(self, "_memory"):
+            from memory.memory_store import MemoryStore
+            self._memory = MemoryStore(
+                path=os.path.join(self._memory_dir.name, "memory.db"), legacy_path=None
+            )
+            for problem, item in zip(self.structured, self.corpus):
+                self._memory.save({
+                    "problem_text": problem["problem_text"],
+                    "route": item["route"],
+                    "final_answer": "",
+                    "steps": [],
+                    "verified": True,
+                    "user_feedback": "unknown"
+                })
+        return self._memory.find_similar(structured_problem["problem_text"])
+
+    def _solve(self, pair: tuple) -> dict:
+        structured_problem, route = pair
+        return SolverAgent(timeout=self.timeout).solve(
+            structured_problem=structured_problem, rag_context=[], route=route
+        )
+
+    def _verify(self, pair: tuple) -> dict:
+        structured_problem, solution = pair
+        return VerifierAgent().verify(structured_problem=structured_problem, solution=solution)
+
+    # -------------------------------------------------
+    # FULL PIPELINE
+    # -------------------------------------------------
+    def _pipeline(self) -> dict:
+        pipeline = MathPipeline(use_rag=self.use_rag, use_memory=False, solver_timeout=self.timeout)
+        if hasattr(self, "_memory"):
+            pipeline.memory = self._memory
+            pipeline.use_memory = True
+        problems = [item["problem_text"] for item in self.corpus] * self.repeat
+
+        def run_one(text):
+            self._clear_caches()
+            start = time.perf_counter()
+            try:
+                status = pipeline.run(text)["status"]
+            except Exception as e:
+                status = f"error: {type(e).__name__}"
+            return (time.perf_counter() - start) * 1000, status
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = list(executor.map(run_one, problems))
+        elapsed = time.perf_counter() - start
+
+        return {
+            "latency_ms": summarize([ms for ms, _ in results]),
+            "throughput_per_s": round(len(results) / elapsed, 1),
+            "statuses": dict(Counter(status for _, status in results)),
+            "peak_rss_mb": peak_rss_mb(),
+        }
+
+
+# -------------------------------------------------
+# BASELINE COMPARISON
+# -------------------------------------------------
+def compare(report: dict, baseline: dict, tolerance: float = TOLERANCE) -> list:
+    """
+    Returns human-readable regressions of report against baseline: warm
+    p50 / p95 per stage, pipeline p95 latency and pipeline throughput.
+    """
+    regressions = []
+
+    def check(label, current, previous):
+        if current is None or previous is None:
+            return
+        if current > previous * (1 + tolerance) and current - previous >= MIN_DELTA_MS:
+            regressions.append(f"{label}: {previous:.3f} -> {current:.3f} ms (+{current / previous - 1:.0%})")
+
+    for name, stage in report["stages"].items():
+        previous = baseline.get("stages", {}).get(name)
+        if not previous or stage.get("skipped") or previous.get("skipped"):
+            continue
+        for stat in ("p50", "p95"):
+            check(f"{name} {stat}", stage["warm_ms"].get(stat), previous["warm_ms"].get(stat))
+
+    current, previous = report.get("pipeline"), baseline.get("pipeline")
+    if current and previous:
+        check("pipeline p95", current["latency_ms"].get("p95"), previous["latency_ms"].get("p95"))
+        if current["throughput_per_s"] < previous["throughput_per_s"] / (1 + tolerance):
+            regressions.append(
+                f"pipeline throughput: {previous['throughput_per_s']} -> {current['throughput_per_s']} /s"
+            )
+    return regressions
+
+
+def print_report(report: dict):
+    print(f"{'stage':<15}{'cold ms':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'ops/s':>10}{'rss MB':>9}")
+    for name, stage in report["stages"].items():
+        if stage.get("skipped"):
+            print(f"{name:<15}  skipped: {next(iter(stage['errors']))}")
+            continue
+        warm = stage["warm_ms"]
+        print(
+            f"{name:<15}{stage['cold_ms']:>10.2f}{warm.get('p50', 0):>10.2f}{warm.get('p95', 0):>10.2f}"
+            f"{warm.get('p99', 0):>10.2f}{stage['throughput_per_s'] or 0:>10.1f}{stage['peak_rss_mb'] or 0:>9.1f}"
+        )
+
+    pipeline = report["pipeline"]
+    latency = pipeline["latency_ms"]
+    print(
+        f"{'pipeline':<15}{'':>10}{latency['p50']:>10.2f}{latency['p95']:>10.2f}{latency['p99']:>10.2f}"
+        f"{pipeline['throughput_per_s']:>10.1f}{pipeline['peak_rss_mb'] or 0:>9.1f}"
+    )
+    print("statuses: " + ", ".join(f"{k}={v}" for k, v in sorted(pipeline["statuses"].items())))
+    print(f"route accuracy: {report['meta']['route_accuracy']:.0%}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the agent pipeline.")
+    parser.add_argument("--corpus", default=CORPUS_PATH, help="JSONL problems with id, problem_text, route")
+    parser.add_argument("--repeat", type=int, default=5, help="Passes over the corpus per stage")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--workers", type=int, default=4, help="Threads for the full-pipeline run")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Solver timeout per problem (s)")
+    parser.add_argument("--no-rag", action="store_true", help="Skip retrieval (stage and pipeline)")
+    parser.add_argument("--keep-caches", action="store_true", help="Measure the cached path")
+    parser.add_argument("-o", "--output", help="Write the JSON report here")
+    parser.add_argument("--baseline", nargs="?", const=BASELINE_PATH, help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Overwrite the baseline with this run")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="Allowed slowdown (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    benchmark = Benchmark(
+        load_corpus(args.corpus),
+        repeat=args.repeat,
+        use_rag=not args.no_rag,
+        keep_caches=args.keep_caches,
+        workers=args.workers,
+        timeout=args.timeout
+    )
+    report = benchmark.run(args.stages)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline and args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+
+    elif args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print("REGRESSIONS:\n  " + "\n  ".join(regressions))
+            return 1
+        print(f"No regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""
+Tiered polynomial solving vs always calling sp.solve.
+
+    python -m benchmarks.solver_tiers
+    python -m benchmarks.solver_tiers --generated 100 --repeat 5 -o tiers.json
+
+Runs the corpus equations / optimizations plus generated polynomials
+(quadratics, cubics and quartics with rational roots, quintics without)
+through utils.polynomial and through the pre-tiering reference path
+(sp.solve; sp.diff + sp.solve + subs for optimization), both inline on
+the parsed IR so parsing and the process pool are excluded. SymPy's
+cache is cleared before every call so both sides do the full work.
+
+Reports per tier: problems, p50 ms for each path, speedup, and how many
+answers agree (exactly for exact tiers, numerically for numeric roots).
+Exits 1 if any answer disagrees.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from agents.problem_ir import build_ir, load_expr, variable_symbol
+from benchmarks.run import CORPUS_PATH, load_corpus, summarize
+from utils.polynomial import TIERS, slowest, solve_polynomial, vertex
+
+
+def generated_problems(count: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+
+    def root():
+        return rng.choice([rng.randint(-9, 9), f"{rng.randint(-9, 9)}/{rng.randint(2, 5)}"])
+
+    problems = []
+    for i in range(count):
+        kind = i % 5
+        if kind == 0:
+            a = rng.choice([n for n in range(-9, 10) if n])
+            text = f"{a}x^2 + {rng.randint(-20, 20)}x + {rng.randint(-20, 20)} = 0"
+        elif kind == 1:
+            text = f"f(x) = {rng.randint(1, 6)}x^2 + {rng.randint(-20, 20)}x + k, minimum value = {rng.randint(-9, 9)}, find k"
+        elif kind == 2:
+            text = "(x - ({}))(x - ({}))(x - ({})) = 0".format(root(), root(), root())
+        elif kind == 3:
+            text = "(x - ({}))(x - ({}))(x^2 - {}) = 0".format(root(), root(), rng.randint(2, 30))
+        else:
+            text = f"x^5 - {rng.randint(1, 9)}x + {rng.randint(1, 9)} = 0"
+        problems.append({"id": f"gen-{i:03d}", "problem_text": text})
+    return problems
+
+
+# -------------------------------------------------
+# PATHS
+# -------------------------------------------------
+def tiered(ir: dict):
+    import sympy as sp
+
+    expr, x = load_expr(ir), variable_symbol(ir)
+    if ir["kind"] == "equation":
+        return solve_polynomial(expr, x)
+
+    found = vertex(expr, x)
+    if found is None:
+        return None, "sympy"
+    value, tier = found[1], "closed_form"
+    if ir["target"] is not None and len(ir["parameters"]) == 1:
+        value, k_tier = solve_polynomial(value - sp.sympify(ir["target"]), sp.Symbol(ir["parameters"][0]))
+        tier = slowest(tier, k_tier)
+    return value, tier
+
+
+def reference(ir: dict):
+    import sympy as sp
+
+    expr, x = load_expr(ir), variable_symbol(ir)
+    if ir["kind"] == "equation":
+        return sp.solve(expr, x)
+
+    value = expr.subs(x, sp.solve(sp.diff(expr, x), x)[0])
+    if ir["target"] is not None:
+        value = sp.solve(value - sp.sympify(ir["target"]))
+    return value
+
+
+def agree(fast, slow) -> bool:
+    import sympy as sp
+
+    if str(fast) == str(slow):
+        return True
+    try:
+        a = sorted((complex(sp.N(v)) for v in fast), key=lambda c: (round(c.real, 6), round(c.imag, 6)))
+        b = sorted((complex(sp.N(v)) for v in slow), key=lambda c: (round(c.real, 6), round(c.imag, 6)))
+    except TypeError:
+        return False
+    return len(a) == len(b) and all(abs(p - q) < 1e-6 * max(1.0, abs(q)) for p, q in zip(a, b))
+
+
+def timed(fn, ir: dict, repeat: int):
+    from sympy.core.cache import clear_cache
+
+    samples = []
+    for _ in range(repeat):
+        clear_cache()
+        start = time.perf_counter()
+        result = fn(ir)
+        samples.append((time.perf_counter() - start) * 1000)
+    return result, float(np.median(samples))
+
+
+def run(problems: list, repeat: int) -> dict:
+    by_tier = defaultdict(lambda: {"problems": 0, "tiered_ms": [], "sympy_ms": [], "agree": 0, "mismatches": []})
+
+    for problem in problems:
+        ir = build_ir(problem["problem_text"])
+        if ir["kind"] not in ("equation", "function") or ir["variable"] is None:
+            continue
+
+        (fast, tier), fast_ms = timed(tiered, ir, repeat)
+        slow, slow_ms = timed(reference, ir, repeat)
+
+        entry = by_tier[tier]
+        entry["problems"] += 1
+        entry["tiered_ms"].append(fast_ms)
+        entry["sympy_ms"].append(slow_ms)
+        if fast is None or agree(fast, slow):
+            entry["agree"] += 1
+        else:
+            entry["mismatches"].append({"id": problem["id"], "tiered": str(fast), "sympy": str(slow)})
+
+    report = {"repeat": repeat, "tiers": {}}
+    for tier in TIERS:
+        if tier not in by_tier:
+            continue
+        entry = by_tier[tier]
+        fast, slow = summarize(entry["tiered_ms"]), summarize(entry["sympy_ms"])
+        report["tiers"][tier] = {
+            "problems": entry["problems"],
+            "tiered": fast,
+            "sympy": slow,
+            "speedup_p50": round(slow["p50"] / fast["p50"], 1) if fast["p50"] else None,
+            "agree": entry["agree"],
+            "mismatches": entry["mismatches"],
+        }
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark tiered polynomial solving against sp.solve.")
+    parser.add_argument("--generated", type=int, default=50, help="Generated problems on top of the corpus")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed calls per problem and path (median kept)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="Write the JSON report here")
+    args = parser.parse_args(argv)
+
+    problems = load_corpus(CORPUS_PATH) + generated_problems(args.generated, args.seed)
+    report = run(problems, args.repeat)
+
+    print(f"{'tier':<13}{'problems':>9}{'tiered p50':>12}{'sympy p50':>11}{'speedup':>9}{'agree':>8}")
+    mismatched = False
+    for tier, entry in report["tiers"].items():
+        mismatched = mismatched or bool(entry["mismatches"])
+        print(
+            f"{tier:<13}{entry['problems']:>9}{entry['tiered']['p50']:>12.3f}{entry['sympy']['p50']:>11.3f}"
+            f"{entry['speedup_p50'] or float('nan'):>8.1f}x{entry['agree']:>5}/{entry['problems']}"
+        )
+        for mismatch in entry["mismatches"]:
+            print(f"  mismatch {mismatch['id']}: {mismatch['tiered']} vs {mismatch['sympy']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 1 if mismatched else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
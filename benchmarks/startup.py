@@ -0,0 +1,136 @@
+"""
+Startup-time budget for the app, the pipeline and the API server.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --budget-ms 800 -o startup.json
+
+Each entry point is imported in a fresh interpreter (best of --repeat
+runs). A run fails, and the script exits 1, when an import takes longer
+than the budget or pulls in a heavy library (torch, Whisper, EasyOCR,
+LangChain, sentence-transformers, FAISS, SymPy) that should only load
+when its feature is first used.
+
+The app entry point imports exactly what app.py imports at top level
+(read from its source), minus Streamlit itself.
+"""
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_MS = 1000.0
+HEAVY_MODULES = [
+    "torch",
+    "whisper",
+    "easyocr",
+    "cv2",
+    "langchain",
+    "langchain_community",
+    "sentence_transformers",
+    "transformers",
+    "faiss",
+    "sympy",
+]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+{body}
+elapsed = (time.perf_counter() - start) * 1000
+heavy = [m for m in {heavy!r} if m in sys.modules]
+print(json.dumps({{"import_ms": elapsed, "heavy": heavy, "modules": len(sys.modules)}}))
+"""
+
+
+def app_imports(path: str = os.path.join(ROOT, "app.py")) -> str:
+    """
+    The top-level import statements of app.py, as source.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+
+    lines = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names if not alias.name.startswith("streamlit")]
+            lines += [f"import {name}" for name in names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and not node.module.startswith("streamlit"):
+            lines.append(f"from {node.module} import {', '.join(alias.name for alias in node.names)}")
+    return "\n".join(lines)
+
+
+def entry_points() -> dict:
+    return {
+        "app": app_imports(),
+        "pipeline": "from pipeline.math_pipeline import MathPipeline\nMathPipeline(use_memory=False)",
+        "server": "import server",
+    }
+
+
+def measure(body: str, repeat: int) -> dict:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE.format(body=body, heavy=HEAVY_MODULES)],
+            cwd=ROOT, capture_output=True, text=True
+        )
+        process_ms = (time.perf_counter() - start) * 1000
+        if output.returncode != 0:
+            return {"error": output.stderr.strip().splitlines()[-1] if output.stderr.strip() else "failed"}
+
+        result = json.loads(output.stdout.strip().splitlines()[-1])
+        result["process_ms"] = process_ms
+        if best is None or result["import_ms"] < best["import_ms"]:
+            best = result
+
+    best["import_ms"] = round(best["import_ms"], 1)
+    best["process_ms"] = round(best["process_ms"], 1)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check startup time against a budget.")
+    parser.add_argument("--budget-ms", type=float, default=BUDGET_MS, help="Max import time per entry point")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per entry point (best is kept)")
+    parser.add_argument("--only", nargs="+", help="Entry points to check (app, pipeline, server)")
+    parser.add_argument("-o", "--output", help="Write the JSON report here")
+    args = parser.parse_args(argv)
+
+    report = {"budget_ms": args.budget_ms, "entry_points": {}}
+    failed = False
+
+    print(f"{'entry point':<12}{'import ms':>11}{'process ms':>12}{'modules':>9}  heavy")
+    for name, body in entry_points().items():
+        if args.only and name not in args.only:
+            continue
+        result = measure(body, args.repeat)
+        report["entry_points"][name] = result
+
+        if "error" in result:
+            failed = True
+            print(f"{name:<12}  error: {result['error']}")
+            continue
+
+        over = result["import_ms"] > args.budget_ms
+        failed = failed or over or bool(result["heavy"])
+        print(
+            f"{name:<12}{result['import_ms']:>11.1f}{result['process_ms']:>12.1f}{result['modules']:>9}  "
+            f"{', '.join(result['heavy']) or '-'}{'  OVER BUDGET' if over else ''}"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    print("FAILED" if failed else f"All entry points within {args.budget_ms:g} ms without heavy imports")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,35 +1,556 @@
+import hashlib
 import json
 import os
+import re
+import sqlite3
+import threading
+import time
 from typing import Optional, List
 
+import numpy as np
+
+from agents.problem_ir import normalize_math_text
+from utils.logging import span, traced
+from utils.model_registry import registry
+
+
+SCHEMA_VERSION = 3
+
+# Retention: records not seen for MAX_AGE_DAYS are dropped unless users
+# rated them correct; above MAX_RECORDS the least useful ones go first
+MAX_RECORDS = 5000
+MAX_AGE_DAYS = 180
+# Seconds between compactions, per database and process
+COMPACT_INTERVAL = 3600
+
+# Aggregated columns, merged into the record returned to callers
+RECORD_COLUMNS = "id, record, verified, correct_count, incorrect_count, correction, last_seen"
+
 
 class MemoryStore:
-    def __init__(self, path="memory/memory.json"):
+    """
+    Stores solved problems in SQLite (WAL mode).
+
+    There is one row per problem, keyed by a hash of its normalized text
+    (problem_hash): save() upserts it, keeping the latest answer, the
+    feedback counts ("correct" / "incorrect" saves), the latest
+    correction and when it was last seen. Saves and exact lookups go
+    through indexes, so neither depends on the size of the history. WAL
+    lets several Streamlit sessions read while another one writes.
+
+    Each record also stores the sentence-transformer embedding of its
+    problem text (the same model the RAG layer uses), which backs a
+    process-wide nearest-neighbour index for find_similar().
+    """
+
+    def __init__(
+        self,
+        path="memory/memory.db",
+        legacy_path="memory/memory.json",
+        similarity_threshold: float = 0.92,
+        top_k: int = 5,
+        max_records: int = MAX_RECORDS,
+        max_age_days: float = MAX_AGE_DAYS
+    ):
         self.path = path
+        self.legacy_path = legacy_path
+        self.similarity_threshold = similarity_threshold
+        self.top_k = top_k
+        self.max_records = max_records
+        self.max_age_days = max_age_days
         os.makedirs(os.path.dirname(path), exist_ok=True)
 
-        if not os.path.exists(self.path):
-            with open(self.path, "w") as f:
-                json.dump([], f)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._init_schema()
+        self._index = _EmbeddingIndex.for_path(self.path)
 
+    @traced("memory.save")
     def save(self, record: dict):
-        data = self._load_all()
-        data.append(record)
-        with open(self.path, "w") as f:
-            json.dump(data, f, indent=2)
+        key = problem_hash(record["problem_text"])
+
+        # Feedback on a stored problem does not need a new embedding
+        with self._lock:
+            embedded = self._conn.execute(
+                "SELECT 1 FROM records WHERE problem_hash = ? AND embedding IS NOT NULL", (key,)
+            ).fetchone()
+        vector = None
+        if embedded is None:
+            embedding = _embed_or_none([record["problem_text"]])
+            vector = embedding[0] if embedding is not None else None
+
+        with self._lock, self._conn:
+            record_id, inserted = self._upsert(key, record, vector)
+
+        if vector is not None:
+            self._index.add(record_id, vector)
+
+        if inserted and _compaction_due(self.path):
+            self.compact()
+
+    def compact(self, now: Optional[float] = None) -> int:
+        """
+        Applies the retention policy and returns the number of records
+        removed: records not seen for max_age_days go unless rated
+        correct more often than incorrect; beyond max_records, records
+        rated down, unverified and least recently seen go first.
+        """
+        now = time.time() if now is None else now
+        with span("memory.compact") as s, self._lock, self._conn:
+            stale = [row[0] for row in self._conn.execute(
+                "SELECT id FROM records WHERE last_seen < ? AND correct_count <= incorrect_count",
+                (now - self.max_age_days * 86400,)
+            )]
+            self._conn.executemany("DELETE FROM records WHERE id = ?", [(rid,) for rid in stale])
+
+            excess = self._conn.execute("SELECT COUNT(*) FROM records").fetchone()[0] - self.max_records
+            surplus = []
+            if excess > 0:
+                surplus = [row[0] for row in self._conn.execute(
+                    "SELECT id FROM records "
+                    "ORDER BY correct_count - incorrect_count, COALESCE(verified, 0), last_seen LIMIT ?",
+                    (excess,)
+                )]
+                self._conn.executemany("DELETE FROM records WHERE id = ?", [(rid,) for rid in surplus])
+            s.set(stale=len(stale), surplus=len(surplus))
+
+        self._index.remove(stale + surplus)
+        return len(stale) + len(surplus)
 
     def find_similar(self, problem_text: str) -> Optional[dict]:
         """
-        Very simple similarity:
-        match by route + keywords
-        (Enough for assignment)
+        Returns the best stored problem above the similarity threshold.
+
+        Embedding neighbours must also contain the same numbers as the
+        query: MiniLM scores "x^2 - 8x + 12 = 0" and "x^2 - 8x + 13 = 0"
+        as near-identical, but their answers are not interchangeable.
+        Records rated incorrect more often than correct are never
+        returned; among the rest, positively rated and verified ones win
+        over a slightly closer match. The same problem (by problem_hash)
+        is found without embedding the query; substring matching is the
+        fallback if the embedder is unavailable.
         """
-        data = self._load_all()
-        for item in data:
-            if item["problem_text"] in problem_text or problem_text in item["problem_text"]:
-                return item
-        return None
+        with span("memory.find_similar", input_size=len(problem_text)) as s:
+            match = self._find_exact(problem_text)
+            if match is not None:
+                s.set(method="exact", cache_hit=True)
+                match["similarity"] = 1.0
+                self._touch(problem_text)
+                return match
+
+            matches = self.search_similar(problem_text)
+            if matches is None:
+                match = self._find_by_text(problem_text)
+                s.set(method="text", cache_hit=match is not None)
+            else:
+                candidates = [
+                    m for m in matches
+                    if _numbers(m["problem_text"]) == _numbers(problem_text) and _usable(m)
+                ]
+                match = max(candidates, key=lambda m: (_preference(m), m["similarity"]), default=None)
+                s.set(method="embedding", cache_hit=match is not None)
+                if match is not None:
+                    s.set(similarity=round(match["similarity"], 4))
+
+            if match is not None:
+                self._touch(match["problem_text"])
+            return match
+
+    def search_similar(
+        self,
+        problem_text: str,
+        k: Optional[int] = None,
+        threshold: Optional[float] = None
+    ) -> Optional[List[dict]]:
+        """
+        Top-k stored records by cosine similarity, best first. Each
+        returned record carries its score under "similarity".
+        Returns None if the embedder cannot be loaded.
+        """
+        k = k or self.top_k
+        threshold = self.similarity_threshold if threshold is None else threshold
+
+        query = _embed_or_none([problem_text])
+        if query is None:
+            return None
+
+        self._index.sync(self._conn, self._lock)
+        hits = [(rid, score) for rid, score in self._index.search(query[0], k) if score >= threshold]
+        if not hits:
+            return []
+
+        with self._lock:
+            rows = {row[0]: row for row in self._conn.execute(
+                f"SELECT {RECORD_COLUMNS} FROM records WHERE id IN ({','.join('?' * len(hits))})",
+                [rid for rid, _ in hits]
+            )}
+
+        results = []
+        for rid, score in hits:
+            if rid in rows:
+                record = _to_record(rows[rid])
+                record["similarity"] = score
+                results.append(record)
+        return results
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # -------------------------------------------------
+    # TEXT FALLBACK
+    # -------------------------------------------------
+    def _find_exact(self, problem_text: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {RECORD_COLUMNS} FROM records "
+                "WHERE problem_hash = ? AND correct_count >= incorrect_count",
+                (problem_hash(problem_text),)
+            ).fetchone()
+        return _to_record(row) if row else None
+
+    def _find_by_text(self, problem_text: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {RECORD_COLUMNS} FROM records "
+                "WHERE (instr(?, problem_text) > 0 OR instr(problem_text, ?) > 0) "
+                "AND correct_count >= incorrect_count "
+                "ORDER BY correct_count > incorrect_count DESC, COALESCE(verified, 0) DESC, last_seen DESC "
+                "LIMIT 1",
+                (problem_text, problem_text)
+            ).fetchone()
+
+        return _to_record(row) if row else None
+
+    def _touch(self, problem_text: str):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE records SET last_seen = ? WHERE problem_hash = ?",
+                (time.time(), problem_hash(problem_text))
+            )
+
+    # -------------------------------------------------
+    # SCHEMA & MIGRATION
+    # -------------------------------------------------
+    def _init_schema(self):
+        with self._lock, self._conn:
+            # Take the write lock before reading user_version, so two
+            # processes opening the store at once cannot both migrate
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS records ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " problem_text TEXT NOT NULL,"
+                " route TEXT,"
+                " record TEXT NOT NULL,"
+                " created_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_records_problem_text "
+                "ON records(problem_text)"
+            )
+
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            if version < 1:
+                self._migrate_legacy_json()
+            if version < 2:
+                # Embeddings are backfilled lazily by _EmbeddingIndex.sync
+                self._conn.execute("ALTER TABLE records ADD COLUMN embedding BLOB")
+            if version < 3:
+                for column in (
+                    "problem_hash TEXT",
+                    "verified INTEGER",
+                    "correct_count INTEGER NOT NULL DEFAULT 0",
+                    "incorrect_count INTEGER NOT NULL DEFAULT 0",
+                    "correction TEXT",
+                    "last_seen REAL",
+                ):
+                    self._conn.execute(f"ALTER TABLE records ADD COLUMN {column}")
+                self._merge_duplicates()
+                self._conn.execute(
+                    "CREATE UNIQUE INDEX IF NOT EXISTS idx_records_problem_hash "
+                    "ON records(problem_hash)"
+                )
+            if version < SCHEMA_VERSION:
+                self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _migrate_legacy_json(self):
+        """
+        One-time import of the old memory.json list. The JSON file is
+        left untouched; user_version marks the import as done.
+        """
+        if not self.legacy_path or not os.path.exists(self.legacy_path):
+            return
+
+        try:
+            with open(self.legacy_path, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        for record in data:
+            if isinstance(record, dict) and "problem_text" in record:
+                self._conn.execute(
+                    "INSERT INTO records (problem_text, route, record, created_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (record["problem_text"], record.get("route"), json.dumps(record), time.time())
+                )
+
+    def _merge_duplicates(self):
+        """
+        Collapses the pre-upsert history (one row per save) into one row
+        per problem: the latest save, with its feedback counted over all
+        of them.
+        """
+        groups = {}
+        for row in self._conn.execute("SELECT id, problem_text, record, created_at FROM records ORDER BY id"):
+            groups.setdefault(problem_hash(row[1]), []).append(row)
+
+        for key, rows in groups.items():
+            saves = [json.loads(row[2]) for row in rows]
+            corrections = [s["correction"] for s in saves if s.get("correction")]
+            latest = saves[-1]
+            self._conn.execute(
+                "UPDATE records SET problem_hash = ?, verified = ?, correct_count = ?, "
+                "incorrect_count = ?, correction = ?, last_seen = ? WHERE id = ?",
+                (
+                    key,
+                    _verified_flag(latest),
+                    sum(s.get("user_feedback") == "correct" for s in saves),
+                    sum(s.get("user_feedback") == "incorrect" for s in saves),
+                    corrections[-1] if corrections else None,
+                    max(row[3] for row in rows),
+                    rows[-1][0],
+                )
+            )
+            self._conn.executemany("DELETE FROM records WHERE id = ?", [(row[0],) for row in rows[:-1]])
+
+    def _upsert(self, key: str, record: dict, vector: Optional[np.ndarray]) -> tuple:
+        """
+        (record id, whether the row is new). The stored record is the
+        latest save; counters add up and the correction is kept until a
+        newer one arrives.
+        """
+        now = time.time()
+        feedback = record.get("user_feedback")
+        row = self._conn.execute(
+            "INSERT INTO records (problem_hash, problem_text, route, record, created_at, embedding, "
+            "verified, correct_count, incorrect_count, correction, last_seen) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(problem_hash) DO UPDATE SET "
+            "problem_text = excluded.problem_text, route = excluded.route, record = excluded.record, "
+            "embedding = COALESCE(excluded.embedding, records.embedding), verified = excluded.verified, "
+            "correct_count = records.correct_count + excluded.correct_count, "
+            "incorrect_count = records.incorrect_count + excluded.incorrect_count, "
+            "correction = COALESCE(excluded.correction, records.correction), "
+            "last_seen = excluded.last_seen "
+            "RETURNING id, created_at",
+            (
+                key,
+                record["problem_text"],
+                record.get("route"),
+                json.dumps(record),
+                now,
+                vector.tobytes() if vector is not None else None,
+                _verified_flag(record),
+                int(feedback == "correct"),
+                int(feedback == "incorrect"),
+                record.get("correction") or None,
+                now
+            )
+        ).fetchone()
+        return row[0], row[1] == now
 
     def _load_all(self) -> List[dict]:
-        with open(self.path, "r") as f:
-            return json.load(f)
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {RECORD_COLUMNS} FROM records ORDER BY id").fetchall()
+        return [_to_record(row) for row in rows]
+
+
+# -------------------------------------------------
+# EMBEDDING INDEX
+# -------------------------------------------------
+class _EmbeddingIndex:
+    """
+    In-memory matrix of normalized problem embeddings, shared by every
+    MemoryStore opened on the same database in this process.
+
+    Rows are appended on save() and picked up incrementally from SQLite
+    (id > last seen id), so records written by other processes become
+    visible without reloading the whole table.
+    """
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    @classmethod
+    def for_path(cls, path: str) -> "_EmbeddingIndex":
+        key = os.path.abspath(path)
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls()
+            return cls._instances[key]
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._matrix = None
+        self._size = 0
+        self._known = set()
+        self._last_id = 0
+        self._backfilled = False
+
+    def add(self, record_id: int, vector: np.ndarray):
+        with self._lock:
+            if record_id not in self._known:
+                self._append(np.array([record_id]), vector[None, :])
+
+    def remove(self, record_ids: List[int]):
+        with self._lock:
+            removed = set(record_ids) & self._known
+            if not removed:
+                return
+            keep = ~np.isin(self._ids[:self._size], list(removed))
+            size = int(keep.sum())
+            self._matrix[:size] = self._matrix[:self._size][keep]
+            self._ids[:size] = self._ids[:self._size][keep]
+            self._size = size
+            self._known -= removed
+
+    def sync(self, conn: sqlite3.Connection, conn_lock: threading.Lock):
+        if not self._backfilled:
+            self._backfill(conn, conn_lock)
+
+        with conn_lock:
+            rows = conn.execute(
+                "SELECT id, embedding FROM records "
+                "WHERE id > ? AND embedding IS NOT NULL ORDER BY id",
+                (self._last_id,)
+            ).fetchall()
+
+        if not rows:
+            return
+
+        with self._lock:
+            self._last_id = max(self._last_id, rows[-1][0])
+            rows = [(rid, blob) for rid, blob in rows if rid not in self._known]
+            if rows:
+                ids = np.array([rid for rid, _ in rows], dtype=np.int64)
+                vectors = np.stack([np.frombuffer(blob, dtype=np.float32) for _, blob in rows])
+                self._append(ids, vectors)
+
+    def search(self, vector: np.ndarray, k: int) -> List[tuple]:
+        with self._lock:
+            if self._size == 0:
+                return []
+            scores = self._matrix[:self._size] @ vector
+            ids = self._ids[:self._size]
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(ids[i]), float(scores[i])) for i in top]
+
+    def _append(self, ids: np.ndarray, vectors: np.ndarray):
+        needed = self._size + len(ids)
+        if self._matrix is None or needed > len(self._matrix):
+            capacity = max(needed, 2 * (len(self._matrix) if self._matrix is not None else 64))
+            matrix = np.zeros((capacity, vectors.shape[1]), dtype=np.float32)
+            all_ids = np.zeros(capacity, dtype=np.int64)
+            if self._matrix is not None:
+                matrix[:self._size] = self._matrix[:self._size]
+                all_ids[:self._size] = self._ids[:self._size]
+            self._matrix, self._ids = matrix, all_ids
+
+        self._matrix[self._size:needed] = vectors
+        self._ids[self._size:needed] = ids
+        self._known.update(ids.tolist())
+        self._size = needed
+
+    def _backfill(self, conn: sqlite3.Connection, conn_lock: threading.Lock):
+        """
+        Embeds records stored without a vector (migrated from JSON or
+        saved while the embedder was unavailable).
+        """
+        with conn_lock:
+            rows = conn.execute(
+                "SELECT id, problem_text FROM records WHERE embedding IS NULL"
+            ).fetchall()
+
+        if rows:
+            vectors = _embed_or_none([text for _, text in rows])
+            if vectors is None:
+                return
+            with conn_lock, conn:
+                conn.executemany(
+                    "UPDATE records SET embedding = ? WHERE id = ?",
+                    [(vec.tobytes(), rid) for (rid, _), vec in zip(rows, vectors)]
+                )
+
+        self._backfilled = True
+
+
+def _embed_or_none(texts: List[str]) -> Optional[np.ndarray]:
+    try:
+        embeddings = registry.get("embeddings")
+        with span("memory.embed", texts=len(texts)):
+            vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+    except Exception:
+        return None
+
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _numbers(text: str) -> list:
+    return sorted(re.findall(r"\d+(?:\.\d+)?", text))
+
+
+def problem_hash(problem_text: str) -> str:
+    """
+    Key of a problem in the store: case, spacing, "^" vs "**", implicit
+    multiplication and trailing punctuation do not matter.
+    """
+    normalized = normalize_math_text(problem_text.strip().lower()).rstrip(".?!")
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def _to_record(row: tuple) -> dict:
+    _, record, verified, correct, incorrect, correction, last_seen = row
+    record = json.loads(record)
+    record["verified"] = bool(verified) if verified is not None else record.get("verified")
+    record["feedback"] = {"correct": correct, "incorrect": incorrect}
+    record["correction"] = correction
+    record["last_seen"] = last_seen
+    return record
+
+
+def _verified_flag(record: dict):
+    verified = record.get("verified")
+    return None if verified is None else int(bool(verified))
+
+
+def _usable(record: dict) -> bool:
+    # Rated wrong more often than right: not worth showing or reusing
+    return record["feedback"]["incorrect"] <= record["feedback"]["correct"]
+
+
+def _preference(record: dict) -> tuple:
+    feedback = record["feedback"]
+    return (feedback["correct"] > feedback["incorrect"], bool(record.get("verified")))
+
+
+_last_compaction = {}
+_last_compaction_lock = threading.Lock()
+
+
+def _compaction_due(path: str) -> bool:
+    key = os.path.abspath(path)
+    now = time.time()
+    with _last_compaction_lock:
+        if now - _last_compaction.get(key, 0.0) < COMPACT_INTERVAL:
+            return False
+        _last_compaction[key] = now
+        return True
@@ -1,17 +1,242 @@
-import whisper
+"""
+Whisper transcription from in-memory audio.
+
+    for partial in iter_transcribe(uploaded_bytes):
+        show(partial["text"])            # transcript so far
+    text, confidence = whisper_transcribe(uploaded_bytes)
+
+Audio (bytes, a path or a 16 kHz float array) is decoded and resampled
+once, by piping it through ffmpeg, and never written to disk. Long
+recordings are split at pauses found by an energy-based voice-activity
+detector into chunks of at most Whisper's 30 s window; silence is
+dropped. Chunks are transcribed one after another on the shared model
+(Whisper's decoder is not re-entrant) and every finished chunk is
+yielded right away, so a long dictation shows text as it goes.
+"""
+import importlib.util
+import os
 import re
+import subprocess
+import tempfile
+import threading
+from typing import Iterator, List, Union
+
+import numpy as np
+
+from utils.logging import span
+from utils.model_registry import registry
+
+
+SAMPLE_RATE = 16000
+# Chunks never exceed Whisper's own context window
+MAX_CHUNK_SECONDS = 30.0
+FRAME_SECONDS = 0.03
+# A frame is speech when its energy is this many dB above the noise
+# floor, or within VAD_RANGE_DB of the loudest speech (recordings with
+# hardly any silence have no usable noise floor)
+VAD_MARGIN_DB = 12.0
+VAD_RANGE_DB = 30.0
+VAD_FLOOR_DB = -50.0
+# Pauses at least this long are candidate cut points
+MIN_SILENCE_SECONDS = 0.3
+# Speech spans further apart than this go to separate chunks, so a
+# chunk never carries long silence (Whisper tends to hallucinate on it)
+MAX_PAUSE_SECONDS = 2.0
+# Speech shorter than this (clicks, breaths) is not worth a decode
+MIN_SPEECH_SECONDS = 0.2
+# Kept around each chunk so word onsets are not clipped
+CHUNK_PADDING_SECONDS = 0.15
+
+_model_lock = threading.Lock()
+
+
+def is_available() -> bool:
+    """
+    Whether Whisper is installed, checked without importing it (that
+    pulls in torch); the model itself loads on first use.
+    """
+    return importlib.util.find_spec("whisper") is not None
+
+
+# -------------------------------------------------
+# DECODING
+# -------------------------------------------------
+def decode_audio(audio: Union[bytes, str, np.ndarray], sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """
+    Mono float32 samples in [-1, 1] at sample_rate. Arrays are taken to
+    be decoded already; bytes go to ffmpeg over stdin. Raises ValueError
+    for audio ffmpeg cannot decode.
+    """
+    if isinstance(audio, np.ndarray):
+        return audio.astype(np.float32, copy=False)
+
+    with span("asr.decode", input_bytes=len(audio) if isinstance(audio, (bytes, bytearray)) else None) as s:
+        if isinstance(audio, str):
+            pcm = _ffmpeg(audio, None, sample_rate)
+        else:
+            try:
+                pcm = _ffmpeg("pipe:0", bytes(audio), sample_rate)
+            except ValueError:
+                # MP4 / M4A files with the index at the end cannot be read
+                # from a pipe; ffmpeg needs to seek. Use a file that is
+                # removed as soon as it has been decoded.
+                pcm = _decode_seekable(bytes(audio), sample_rate)
+        samples = np.frombuffer(pcm, np.int16).astype(np.float32) / 32768.0
+        s.set(seconds=round(len(samples) / sample_rate, 2))
+    return samples
+
+
+def _ffmpeg(source: str, data, sample_rate: int) -> bytes:
+    cmd = [
+        "ffmpeg", "-nostdin", "-threads", "0", "-i", source,
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sample_rate), "-"
+    ]
+    if data is not None:
+        cmd.remove("-nostdin")
+    try:
+        result = subprocess.run(cmd, input=data, capture_output=True, check=True)
+    except FileNotFoundError:
+        raise RuntimeError("Decoding audio needs ffmpeg on the PATH")
+    except subprocess.CalledProcessError as e:
+        detail = e.stderr.decode(errors="ignore").strip().splitlines()
+        raise ValueError(f"ffmpeg could not decode the audio: {detail[-1] if detail else e.returncode}")
+    return result.stdout
+
+
+def _decode_seekable(data: bytes, sample_rate: int) -> bytes:
+    fd, path = tempfile.mkstemp()
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        return _ffmpeg(path, None, sample_rate)
+    finally:
+        os.remove(path)
+
+
+# -------------------------------------------------
+# VOICE ACTIVITY
+# -------------------------------------------------
+def speech_chunks(samples: np.ndarray, sample_rate: int = SAMPLE_RATE,
+                  max_seconds: float = MAX_CHUNK_SECONDS) -> List[tuple]:
+    """
+    [start, end) sample spans covering the speech in samples, each at
+    most max_seconds long and cut inside pauses wherever possible.
+    """
+    frame = max(1, int(FRAME_SECONDS * sample_rate))
+    count = len(samples) // frame
+    if count == 0:
+        return [(0, len(samples))] if len(samples) else []
+
+    frames = samples[:count * frame].reshape(count, frame)
+    energy_db = 10 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+    # Noise floor from the quietest tenth of the recording
+    noise, loud = np.percentile(energy_db, [10, 95])
+    threshold = max(min(noise + VAD_MARGIN_DB, loud - VAD_RANGE_DB), VAD_FLOOR_DB)
+    voiced = energy_db > threshold
+
+    # Speech spans, bridging pauses shorter than MIN_SILENCE_SECONDS
+    min_gap = max(1, int(MIN_SILENCE_SECONDS / FRAME_SECONDS))
+    spans = []
+    for start, end in _runs(voiced):
+        if spans and start - spans[-1][1] < min_gap:
+            spans[-1] = (spans[-1][0], end)
+        else:
+            spans.append((start, end))
+    min_frames = int(MIN_SPEECH_SECONDS / FRAME_SECONDS)
+    spans = [(a, b) for a, b in spans if b - a >= min_frames]
+
+    # Pack spans greedily into chunks; a span longer than a chunk is cut
+    # at its quietest frame
+    max_frames = max(1, int(max_seconds / FRAME_SECONDS))
+    max_pause = int(MAX_PAUSE_SECONDS / FRAME_SECONDS)
+    chunks = []
+    for start, end in spans:
+        while end - start > max_frames:
+            window = energy_db[start + max_frames // 2:start + max_frames]
+            cut = start + max_frames // 2 + int(np.argmin(window))
+            chunks.append((start, cut))
+            start = cut
+        if chunks and end - chunks[-1][0] <= max_frames and start - chunks[-1][1] <= max_pause:
+            chunks[-1] = (chunks[-1][0], end)
+        else:
+            chunks.append((start, end))
+
+    pad = int(CHUNK_PADDING_SECONDS * sample_rate)
+    return [
+        (max(0, a * frame - pad), min(len(samples), b * frame + pad))
+        for a, b in chunks
+    ]
+
+
+def _runs(mask: np.ndarray) -> List[tuple]:
+    padded = np.concatenate([[False], mask, [False]])
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    return [(int(a), int(b)) for a, b in zip(edges[::2], edges[1::2])]
+
+
+# -------------------------------------------------
+# TRANSCRIPTION
+# -------------------------------------------------
+def iter_transcribe(audio: Union[bytes, str, np.ndarray], sample_rate: int = SAMPLE_RATE) -> Iterator[dict]:
+    """
+    Yields one partial result per speech chunk:
+        text        normalized transcript so far
+        segments    all segments so far: start / end (seconds in the
+                    recording), text, confidence
+        confidence  estimate_confidence over the segments so far
+        done        True on the last partial
+    """
+    samples = decode_audio(audio, sample_rate)
+    chunks = speech_chunks(samples, sample_rate)
+    model = registry.get("whisper")
+
+    segments = []
+    raw_texts = []
+    if not chunks:
+        yield {"text": "", "segments": [], "confidence": estimate_confidence({}), "done": True}
+        return
+
+    for index, (start, end) in enumerate(chunks):
+        # The previous chunk's text keeps spelling and context consistent
+        # across cuts
+        prompt = raw_texts[-1][-200:] if raw_texts else None
+        with span("asr.transcribe", chunk=index, seconds=round((end - start) / sample_rate, 2)) as s:
+            with _model_lock:
+                result = model.transcribe(samples[start:end], initial_prompt=prompt, fp16=False)
+            s.set(segments=len(result.get("segments", [])))
+
+        offset = start / sample_rate
+        for seg in result.get("segments", []):
+            segments.append({
+                "start": round(seg.get("start", 0.0) + offset, 2),
+                "end": round(seg.get("end", 0.0) + offset, 2),
+                "text": seg.get("text", "").strip(),
+                "avg_logprob": seg.get("avg_logprob", -1.0),
+                "confidence": round(estimate_confidence({"segments": [seg]}), 4),
+            })
+        raw_texts.append(result.get("text", "").strip())
 
-model = whisper.load_model("base")
+        yield {
+            "text": normalize_math_phrases(" ".join(t for t in raw_texts if t)),
+            "segments": [{k: v for k, v in seg.items() if k != "avg_logprob"} for seg in segments],
+            "confidence": estimate_confidence({"segments": segments}),
+            "done": index == len(chunks) - 1,
+        }
 
-def whisper_transcribe(audio_path: str):
-    result = model.transcribe(audio_path)
 
-    raw_text = result.get("text", "").strip()
-    confidence = estimate_confidence(result)
+def transcribe(audio: Union[bytes, str, np.ndarray]) -> dict:
+    """
+    The final partial of iter_transcribe (text, segments, confidence).
+    """
+    result = None
+    for result in iter_transcribe(audio):
+        pass
+    return result
 
-    normalized_text = normalize_math_phrases(raw_text)
 
-    return normalized_text, confidence
+def whisper_transcribe(audio: Union[bytes, str, np.ndarray]):
+    result = transcribe(audio)
+    return result["text"], result["confidence"]
 
 
 def normalize_math_phrases(text: str) -> str:
@@ -1,22 +1,39 @@
-import easyocr
-import numpy as np
+import importlib.util
 import re
 
-reader = None
+import numpy as np
+
+from utils.logging import span
+from utils.model_registry import registry
+
+
+def is_available() -> bool:
+    """
+    Whether EasyOCR is installed, checked without importing it (that
+    pulls in torch); the reader itself loads on first use.
+    """
+    return importlib.util.find_spec("easyocr") is not None
+
 
 def _get_reader():
-    global reader
-    if reader is None:
-        reader = easyocr.Reader(['en'], gpu=False)
-    return reader
+    return registry.get("ocr_reader")
 
-def run_ocr(image:np.ndarray):
+def run_ocr(image:np.ndarray, preprocess: bool = True):
     """
     image: numpy.ndarray (RGB)
+    preprocess: shrink / deskew / binarize first (multimodal.preprocess,
+    configured by OCR_PREPROCESS_* variables); False reads the raw image
 
     """
+    if preprocess:
+        from multimodal.preprocess import preprocess as prepare
+
+        image, _ = prepare(image)
+
     reader_instance = _get_reader()
-    results = reader_instance.readtext(image)
+    with span("ocr.readtext", height=image.shape[0], width=image.shape[1]) as s:
+        results = reader_instance.readtext(image)
+        s.set(regions=len(results))
 
     if not results:
         return "", 0.0
@@ -0,0 +1,214 @@
+"""
+Image pre-processing in front of EasyOCR.
+
+Phone photos arrive at 12 MP and more, while EasyOCR's detector only
+needs text a few dozen pixels tall; running it at full size costs
+seconds for no accuracy. preprocess() turns an RGB array into a small,
+upright, cropped grayscale (or binary) image:
+
+    grayscale   one uint8 channel
+    downscale   so the median character is about target_text_height px
+                (never upscales; max_side caps the result either way)
+    deskew      projection-profile search over +-max_skew degrees
+    binarize    adaptive threshold, window sized from the text height
+    crop        to the ink bounding box plus a margin (a view, no copy)
+
+Each step can be turned off per deployment through PreprocessConfig,
+which also reads OCR_PREPROCESS_* environment variables.
+"""
+import os
+
+import numpy as np
+
+from utils.logging import span
+
+
+class PreprocessConfig:
+    def __init__(
+        self,
+        enabled: bool = True,
+        target_text_height: int = 32,
+        max_side: int = 2000,
+        min_side: int = 320,
+        deskew: bool = True,
+        max_skew: float = 10.0,
+        skew_step: float = 0.5,
+        binarize: bool = True,
+        crop: bool = True,
+        crop_margin: int = 16
+    ):
+        self.enabled = enabled
+        self.target_text_height = target_text_height
+        self.max_side = max_side
+        self.min_side = min_side
+        self.deskew = deskew
+        self.max_skew = max_skew
+        self.skew_step = skew_step
+        self.binarize = binarize
+        self.crop = crop
+        self.crop_margin = crop_margin
+
+    @classmethod
+    def from_env(cls, prefix: str = "OCR_PREPROCESS_") -> "PreprocessConfig":
+        """
+        Defaults overridden by environment variables, e.g.
+        OCR_PREPROCESS_TARGET_TEXT_HEIGHT=40 or OCR_PREPROCESS_BINARIZE=0.
+        """
+        config = cls()
+        for name, default in vars(config).items():
+            raw = os.environ.get(prefix + name.upper())
+            if raw is None:
+                continue
+            if isinstance(default, bool):
+                value = raw.strip().lower() not in ("0", "false", "no", "off", "")
+            else:
+                value = type(default)(raw)
+            setattr(config, name, value)
+        return config
+
+
+DEFAULT_CONFIG = PreprocessConfig.from_env()
+
+
+def preprocess(image: np.ndarray, config: PreprocessConfig = None):
+    """
+    Returns (processed uint8 image, info). info holds the scale, skew
+    angle and crop box, so OCR boxes can be mapped back to the input:
+    input_xy = (processed_xy + crop[:2]) / scale (before deskew).
+
+    The input is never modified or copied as a whole; every step works on
+    the (already smaller) output of the previous one.
+    """
+    import cv2
+
+    config = config or DEFAULT_CONFIG
+    height, width = image.shape[:2]
+    info = {"input_shape": [height, width], "scale": 1.0, "angle": 0.0, "crop": [0, 0, width, height]}
+    if not config.enabled:
+        return image, info
+
+    with span("ocr.preprocess", height=height, width=width) as s:
+        gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY) if image.ndim == 3 else image
+
+        # Estimate text height on a cheap thumbnail, then resize once
+        text_height = _text_height(gray)
+        scale = _scale_for(text_height, height, width, config)
+        if scale < 1.0:
+            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        info["scale"] = round(scale, 4)
+        scaled_text = max(8, int(round(text_height * scale if text_height else config.target_text_height)))
+
+        if config.deskew:
+            angle = _skew_angle(gray, config.max_skew, config.skew_step)
+            if abs(angle) >= config.skew_step / 2:
+                gray = _rotate(gray, angle)
+            info["angle"] = angle
+
+        if config.binarize:
+            # Window of a few characters, odd as OpenCV requires
+            block = 2 * scaled_text + 1
+            gray = cv2.adaptiveThreshold(
+                gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY, block, 15
+            )
+
+        if config.crop:
+            gray, box = _crop_to_ink(gray, config.crop_margin)
+            info["crop"] = box
+
+        info["output_shape"] = list(gray.shape[:2])
+        s.set(scale=info["scale"], angle=info["angle"], out_height=gray.shape[0], out_width=gray.shape[1])
+    return gray, info
+
+
+def _text_height(gray: np.ndarray, thumb_side: int = 1000):
+    """
+    Median height (in input pixels) of character-sized connected
+    components, or None if nothing looks like text.
+    """
+    import cv2
+
+    factor = min(1.0, thumb_side / max(gray.shape))
+    thumb = cv2.resize(gray, None, fx=factor, fy=factor, interpolation=cv2.INTER_AREA) if factor < 1 else gray
+    _, _, stats, _ = cv2.connectedComponentsWithStats(_ink(thumb), connectivity=8)
+
+    heights = stats[1:, cv2.CC_STAT_HEIGHT]
+    widths = stats[1:, cv2.CC_STAT_WIDTH]
+    # Drop specks and page-sized blobs (borders, shadows)
+    keep = (heights >= 3) & (heights < thumb.shape[0] * 0.2) & (widths < thumb.shape[1] * 0.2)
+    if keep.sum() < 5:
+        return None
+    return float(np.median(heights[keep])) / factor
+
+
+def _scale_for(text_height, height: int, width: int, config: PreprocessConfig) -> float:
+    scale = config.target_text_height / text_height if text_height else 1.0
+    scale = min(scale, config.max_side / max(height, width), 1.0)
+    # Never shrink below min_side (tiny crops lose everything)
+    floor = min(1.0, config.min_side / max(1, min(height, width)))
+    return max(scale, floor)
+
+
+def _skew_angle(gray: np.ndarray, max_skew: float, step: float, side: int = 600) -> float:
+    """
+    The rotation (degrees) that makes text rows sharpest: rows of ink
+    and rows of background alternate most strongly when lines are level,
+    which maximizes the variance of the horizontal projection. Searched
+    coarse (4 * step) first, then at step around the best coarse angle,
+    never outside +-max_skew. Among equal scores the angle closest to 0
+    wins, so a blank or uniform image is left unrotated.
+    """
+    import cv2
+
+    factor = min(1.0, side / max(gray.shape))
+    small = cv2.resize(gray, None, fx=factor, fy=factor, interpolation=cv2.INTER_AREA) if factor < 1 else gray
+    ink = _ink(small)
+
+    def best(angles):
+        angles = np.clip(angles, -max_skew, max_skew)
+        scores = np.array([float(np.var(_rotate(ink, angle, border=0).sum(axis=1))) for angle in angles])
+        tied = np.flatnonzero(scores >= scores.max() - 1e-9 * max(1.0, scores.max()))
+        return float(angles[tied[np.argmin(np.abs(angles[tied]))]])
+
+    coarse = best(np.arange(-max_skew, max_skew + step / 2, step * 4))
+    fine = best(np.arange(coarse - step * 3, coarse + step * 3.5, step))
+    return round(fine, 2) + 0.0
+
+
+def _ink(gray: np.ndarray) -> np.ndarray:
+    """
+    255 where a thumbnail has ink. A local (adaptive) threshold, since a
+    global Otsu level splits photos along their lighting gradient.
+    """
+    import cv2
+
+    block = max(15, min(gray.shape) // 20) | 1
+    return cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, block, 15)
+
+
+def _rotate(image: np.ndarray, angle: float, border=None) -> np.ndarray:
+    # Replicating the edge (border=None) keeps the new corners the colour
+    # of the paper, so they do not threshold into fake ink
+    import cv2
+
+    height, width = image.shape[:2]
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    if border is None:
+        return cv2.warpAffine(image, matrix, (width, height), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+    return cv2.warpAffine(
+        image, matrix, (width, height), flags=cv2.INTER_LINEAR,
+        borderMode=cv2.BORDER_CONSTANT, borderValue=border
+    )
+
+
+def _crop_to_ink(gray: np.ndarray, margin: int):
+    # A row / column counts as ink only above a small floor, so isolated
+    # noise specks do not stretch the box to the page edges
+    ink = gray < 128
+    rows = np.flatnonzero(np.count_nonzero(ink, axis=1) > max(2, gray.shape[1] // 500))
+    cols = np.flatnonzero(np.count_nonzero(ink, axis=0) > max(2, gray.shape[0] // 500))
+    if not len(rows) or not len(cols):
+        return gray, [0, 0, gray.shape[1], gray.shape[0]]
+
+    y0, y1 = max(0, rows[0] - margin), min(gray.shape[0], rows[-1] + 1 + margin)
+    x0, x1 = max(0, cols[0] - margin), min(gray.shape[1], cols[-1] + 1 + margin)
+    return gray[y0:y1, x0:x1], [int(x0), int(y0), int(x1), int(y1)]
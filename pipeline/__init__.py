@@ -0,0 +1,3 @@
+from pipeline.math_pipeline import MathPipeline
+
+__all__ = ["MathPipeline"]
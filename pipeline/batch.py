@@ -0,0 +1,129 @@
+"""
+Batch-solve problems offline through the MathPipeline.
+
+    python -m pipeline.batch problems.jsonl -o results.jsonl --workers 8
+
+Input is JSONL (one object per line with "problem_text" or "text", and an
+optional "id") or CSV with the same column names. Results are streamed as
+JSONL in completion order; each line carries the input "index" and "id".
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from pipeline.math_pipeline import MathPipeline
+
+
+def read_problems(path: str):
+    """
+    Yields (index, id, problem_text) without loading the whole file.
+    """
+    is_csv = path.lower().endswith(".csv")
+    f = sys.stdin if path == "-" else open(path, "r", encoding="utf-8", newline="")
+
+    try:
+        rows = csv.DictReader(f) if is_csv else (json.loads(line) for line in f if line.strip())
+        for index, row in enumerate(rows):
+            text = row.get("problem_text") or row.get("text") or ""
+            yield index, row.get("id", index), text
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def solve_one(pipeline: MathPipeline, index, problem_id, text: str) -> dict:
+    start = time.perf_counter()
+    try:
+        result = pipeline.run(text)
+    except Exception as e:
+        result = {"problem_text": text, "status": "error", "error": f"{type(e).__name__}: {e}"}
+
+    result["index"] = index
+    result["id"] = problem_id
+    result["total_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    return result
+
+
+def run_batch(pipeline: MathPipeline, problems, out, workers: int) -> Counter:
+    """
+    Solves problems on a thread pool (SymPy itself runs in the solver
+    process pool, so this scales across cores) with a bounded number of
+    in-flight problems, writing each result as soon as it is done.
+    """
+    statuses = Counter()
+    max_in_flight = workers * 2
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+
+        def drain(return_when):
+            nonlocal pending
+            done, pending = wait(pending, return_when=return_when)
+            for future in done:
+                result = future.result()
+                statuses[result["status"]] += 1
+                out.write(json.dumps(result, default=str) + "\n")
+                out.flush()
+
+        for index, problem_id, text in problems:
+            pending.add(executor.submit(solve_one, pipeline, index, problem_id, text))
+            if len(pending) >= max_in_flight:
+                drain(FIRST_COMPLETED)
+
+        if pending:
+            drain("ALL_COMPLETED")
+
+    return statuses
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch-solve math problems.")
+    parser.add_argument("input", help="JSONL or CSV file of problems ('-' for stdin JSONL)")
+    parser.add_argument("-o", "--output", default="-", help="JSONL output file (default: stdout)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--k", type=int, default=3, help="RAG documents per problem")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Solver timeout per problem (s)")
+    parser.add_argument("--no-rag", action="store_true", help="Skip knowledge retrieval")
+    parser.add_argument("--no-memory", action="store_true", help="Skip memory lookup")
+    parser.add_argument("--reuse-memory", action="store_true", help="Return memory hits without solving")
+    parser.add_argument("--save-memory", action="store_true", help="Save solved problems to memory")
+    args = parser.parse_args(argv)
+
+    pipeline = MathPipeline(
+        use_rag=not args.no_rag,
+        use_memory=not args.no_memory,
+        reuse_memory=args.reuse_memory,
+        save_to_memory=args.save_memory,
+        retrieve_k=args.k,
+        solver_timeout=args.timeout
+    )
+
+    start = time.perf_counter()
+    pipeline.warm_up()
+    warm_up_s = time.perf_counter() - start
+
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    try:
+        start = time.perf_counter()
+        statuses = run_batch(pipeline, read_problems(args.input), out, args.workers)
+        elapsed = time.perf_counter() - start
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    total = sum(statuses.values())
+    print(
+        f"Processed {total} problems in {elapsed:.2f}s "
+        f"({total / elapsed if elapsed else 0:.1f}/s, warm-up {warm_up_s:.2f}s): "
+        + ", ".join(f"{k}={v}" for k, v in sorted(statuses.items())),
+        file=sys.stderr
+    )
+
+
+if __name__ == "__main__":
+    main()
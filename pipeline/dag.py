@@ -0,0 +1,247 @@
+"""
+Dependency-graph executor for the agent pipeline.
+
+A stage is a function of the run's context dict; its return value is
+stored in the context under the stage's name. A stage starts as soon as
+all of its dependencies have finished (or been skipped), so independent
+stages run concurrently on a shared thread pool. A lone ready stage runs
+on the calling thread, which keeps a straight chain free of thread hops.
+
+    when(ctx) -> False   skips the stage; its dependents still run
+    optional=True        an exception from the stage is recorded in
+                         DagRun.errors instead of ending the run; the
+                         stage is marked failed and its dependents skipped
+    raise StopPipeline   ends the run early: stages not started yet are
+                         skipped, running ones are marked cancelled and
+                         the run's cancel_event is set (the solver pool
+                         drops a cancelled task) without waiting for them
+
+Spans opened inside a stage nest under the caller's span / trace.
+"""
+import contextvars
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Iterable, Optional
+
+from utils.logging import span
+
+
+# Threads shared by every pipeline run in the process
+STAGE_WORKERS = 8
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=STAGE_WORKERS, thread_name_prefix="pipeline-stage")
+        return _executor
+
+
+class StopPipeline(Exception):
+    """
+    Raised by a stage to end the run with the given status; fields are
+    merged into the pipeline result.
+    """
+
+    def __init__(self, status: str, **fields):
+        super().__init__(status)
+        self.status = status
+        self.fields = fields
+
+
+class Stage:
+    def __init__(
+        self, name: str, fn: Callable, deps: Iterable[str] = (), when: Optional[Callable] = None,
+        optional: bool = False
+    ):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.when = when
+        self.optional = optional
+
+
+class DagRun:
+    """
+    Outcome of one run: the context, each stage's state (done, skipped,
+    cancelled, failed), start / end offsets in ms, the stop, if any, and
+    the exceptions of failed optional stages.
+    """
+
+    def __init__(self, graph: "StageGraph", context: dict):
+        self.graph = graph
+        self.context = context
+        self.state = {}
+        self.start_ms = {}
+        self.end_ms = {}
+        self.stop: Optional[StopPipeline] = None
+        self.errors = {}
+        self.cancel_event = threading.Event()
+        self._start = time.perf_counter()
+
+    def _now(self) -> float:
+        return round((time.perf_counter() - self._start) * 1000, 3)
+
+    @property
+    def timings(self) -> dict:
+        return {
+            name: round(self.end_ms[name] - self.start_ms[name], 3)
+            for name in self.graph.order if name in self.end_ms
+        }
+
+    def critical_path(self) -> dict:
+        """
+        The chain of finished stages that determined the run's latency:
+        from the stage that finished last, back through whichever
+        dependency finished last at each step.
+        """
+        finished = [name for name in self.graph.order if name in self.end_ms and self.state[name] != "cancelled"]
+        if not finished:
+            return {"stages": [], "ms": 0.0}
+
+        path = [max(finished, key=lambda n: self.end_ms[n])]
+        while True:
+            deps = [d for d in self.graph.stages[path[-1]].deps if d in finished]
+            if not deps:
+                break
+            path.append(max(deps, key=lambda n: self.end_ms[n]))
+        path.reverse()
+        return {"stages": path, "ms": self.end_ms[path[-1]]}
+
+
+class StageGraph:
+    """
+    A validated set of stages; run() executes it once per request.
+    """
+
+    def __init__(self, stages: Iterable[Stage]):
+        self.stages = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"Duplicate stage '{stage.name}'")
+            self.stages[stage.name] = stage
+
+        for stage in self.stages.values():
+            for dep in stage.deps:
+                if dep not in self.stages:
+                    raise ValueError(f"Stage '{stage.name}' depends on unknown stage '{dep}'")
+        self.order = self._topological_order()
+
+    def _topological_order(self) -> list:
+        order, done, visiting = [], set(), set()
+
+        def visit(name):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Stage dependency cycle through '{name}'")
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            done.add(name)
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    def run(self, context: dict) -> DagRun:
+        """
+        Runs every stage once. StopPipeline ends the run early (see
+        DagRun.stop); any other exception from a required stage cancels
+        the rest and is re-raised here (optional stages: DagRun.errors).
+        """
+        run = DagRun(self, context)
+        context["cancel_event"] = run.cancel_event
+        pending = list(self.order)
+        running = {}
+        error = None
+
+        while pending or running:
+            ready = [
+                name for name in pending
+                if all(run.state.get(dep) in ("done", "skipped", "failed") for dep in self.stages[name].deps)
+            ]
+            to_run = []
+            for name in ready:
+                pending.remove(name)
+                stage = self.stages[name]
+                # Only optional stages fail without ending the run
+                if any(run.state[dep] == "failed" for dep in stage.deps):
+                    run.state[name] = "skipped"
+                elif stage.when is not None and not stage.when(context):
+                    run.state[name] = "skipped"
+                else:
+                    to_run.append(stage)
+            if ready and not to_run:
+                # Skips only; they may have unblocked other stages
+                continue
+
+            for stage in to_run:
+                run.state[stage.name] = "running"
+                run.start_ms[stage.name] = run._now()
+                if len(to_run) == 1 and not running:
+                    error = self._finish(run, stage, self._call(stage, context))
+                else:
+                    # The stage's spans nest under the current span, like inline code
+                    future = _get_executor().submit(contextvars.copy_context().run, self._call, stage, context)
+                    running[future] = stage
+
+            if error is None and run.stop is None and running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    error = self._finish(run, running.pop(future), future.result()) or error
+            elif not to_run:
+                break
+            if error is not None or run.stop is not None:
+                break
+
+        if running or pending:
+            run.cancel_event.set()
+            for stage in running.values():
+                run.state[stage.name] = "cancelled"
+                run.end_ms[stage.name] = run._now()
+            for name in pending:
+                run.state[name] = "skipped"
+
+        if error is not None:
+            raise error
+        return run
+
+    @staticmethod
+    def _call(stage: Stage, context: dict) -> tuple:
+        # (value, exception): exceptions are handed back to the scheduler
+        try:
+            with span(f"stage.{stage.name}"):
+                try:
+                    return stage.fn(context), None
+                except StopPipeline as stop:
+                    return None, stop
+        except Exception as e:
+            return None, e
+
+    @staticmethod
+    def _finish(run: DagRun, stage: Stage, outcome: tuple):
+        name = stage.name
+        value, exc = outcome
+        run.end_ms[name] = run._now()
+        if exc is None:
+            run.state[name] = "done"
+            run.context[name] = value
+            return None
+        if isinstance(exc, StopPipeline):
+            run.state[name] = "done"
+            if run.stop is None:
+                run.stop = exc
+            return None
+        run.state[name] = "failed"
+        if stage.optional:
+            run.errors[name] = exc
+            return None
+        return exc
@@ -0,0 +1,199 @@
+from agents.parser_agent import build_parser_input, HumanInTheLoopRequired, ParserAgent
+from agents.router_agent import RouterAgent
+from agents.solver_agent import SolverAgent
+from agents.verifier_agent import VerifierAgent
+from memory.memory_store import MemoryStore
+from pipeline.dag import Stage, StageGraph, StopPipeline
+from utils.logging import start_trace
+from utils.model_registry import registry
+
+
+class MathPipeline:
+    """
+    The agent flow as a dependency graph (pipeline.dag): Parser → Router,
+    then RAG retrieval alongside Memory → Solver → Verifier. Used by
+    app.py, the API and the batch runner.
+
+    One instance is safe to share between threads; models come from the
+    process-wide registry and SymPy work runs in the solver pool.
+    """
+
+    def __init__(
+        self,
+        use_rag: bool = True,
+        use_memory: bool = True,
+        reuse_memory: bool = False,
+        save_to_memory: bool = False,
+        retrieve_k: int = 3,
+        solver_timeout: float = 10.0,
+        retriever=None
+    ):
+        self.use_rag = use_rag
+        self.use_memory = use_memory
+        self.reuse_memory = reuse_memory
+        self.save_to_memory = save_to_memory
+        self.retrieve_k = retrieve_k
+
+        self.parser = ParserAgent()
+        self.router = RouterAgent()
+        self.solver = SolverAgent(timeout=solver_timeout)
+        self.verifier = VerifierAgent()
+        self.memory = MemoryStore() if (use_memory or save_to_memory) else None
+        # Anything with retrieve(query, k, topic); defaults to a lazily built RAGRetriever
+        self._retriever = retriever
+        self.graph = self._build_graph()
+
+    def warm_up(self):
+        names = ["solver_pool"]
+        if self.use_rag or self.use_memory:
+            names.append("embeddings")
+        if self.use_rag:
+            names.append("vector_store")
+        registry.warm_up(names)
+        registry.get("solver_pool").warm_up()
+
+    @property
+    def retriever(self):
+        if self._retriever is None:
+            from rag.retriever import RAGRetriever
+
+            self._retriever = RAGRetriever()
+        return self._retriever
+
+    def run(self, problem_text: str, input_type: str = "text", confidence: float = 1.0, original_input=None) -> dict:
+        """
+        Runs one problem through the agents and returns a JSON-serializable
+        dict with the outputs of each stage, per-stage timings (ms), each
+        stage's state (done / skipped / cancelled), the critical path and
+        the span trace of the run.
+        """
+        with start_trace("pipeline.run", input_type=input_type) as trace:
+            result = self._run(problem_text, input_type, confidence, original_input)
+        result["trace"] = trace.to_dict()
+        return result
+
+    def _run(self, problem_text: str, input_type: str, confidence: float, original_input) -> dict:
+        result = {
+            "problem_text": problem_text,
+            "status": None,
+        }
+
+        run = self.graph.run({
+            "problem_text": problem_text,
+            "input_type": input_type,
+            "confidence": confidence,
+            "original_input": problem_text if original_input is None else original_input,
+        })
+        ctx = run.context
+
+        result["timings"] = run.timings
+        result["stages"] = dict(run.state)
+        result["critical_path"] = run.critical_path()
+        if run.errors:
+            result["errors"] = {name: f"{type(e).__name__}: {e}" for name, e in run.errors.items()}
+
+        if "parse" in ctx:
+            result["structured_problem"] = ctx["parse"]
+        result["retrieved_context"] = ctx.get("retrieve", [])
+        if "route" in ctx:
+            result["route"] = ctx["route"]
+        if self.use_memory and "memory_lookup" in ctx:
+            result["memory_match"] = ctx["memory_lookup"]
+
+        if run.stop is not None:
+            result["status"] = run.stop.status
+            result.update(run.stop.fields)
+            return result
+
+        solution, verification = ctx["solve"], ctx["verify"]
+        result["solution"] = solution
+        result["final_answer"] = solution["final_answer"]
+        result["verification"] = verification
+        result["status"] = "solved" if verification["is_valid"] else "verification_failed"
+        return result
+
+    # -------------------------------------------------
+    # STAGES
+    # -------------------------------------------------
+    def _build_graph(self) -> StageGraph:
+        """
+        parse → route → retrieve          (concurrent with the rest)
+                      → memory_lookup → solve → verify → memory_save
+
+        Routing is microseconds, so it runs before the expensive stages
+        and an unknown route stops the run before any retrieval. A memory
+        hit (with reuse_memory) stops it before solving. SolverAgent does
+        not read the retrieved context, so retrieval stays off the solve
+        path; the result still carries it. Retrieval is optional context:
+        if it fails (e.g. the RAG store is unavailable) the run goes on
+        with an empty context and the error is reported under "errors".
+        """
+        return StageGraph([
+            Stage("parse", self._parse),
+            Stage("route", self._route, deps=["parse"]),
+            Stage("retrieve", self._retrieve, deps=["route"], when=lambda ctx: self.use_rag, optional=True),
+            Stage("memory_lookup", self._memory_lookup, deps=["route"], when=lambda ctx: self.use_memory),
+            Stage("solve", self._solve, deps=["route", "memory_lookup"]),
+            Stage("verify", self._verify, deps=["solve"]),
+            Stage(
+                "memory_save", self._memory_save, deps=["verify"],
+                when=lambda ctx: self.save_to_memory and ctx["verify"]["is_valid"]
+            ),
+        ])
+
+    def _parse(self, ctx: dict) -> dict:
+        try:
+            parser_input = build_parser_input(
+                input_type=ctx["input_type"],
+                original_input=ctx["original_input"],
+                extracted_text=ctx["problem_text"],
+                confidence=ctx["confidence"],
+                user_confirmed=True
+            )
+            return self.parser.parse(parser_input)
+        except HumanInTheLoopRequired as e:
+            raise StopPipeline("needs_clarification", reason=str(e))
+
+    def _route(self, ctx: dict) -> str:
+        route = self.router.route(ctx["parse"])
+        if route == "unknown":
+            raise StopPipeline("unknown_route", route=route)
+        return route
+
+    def _retrieve(self, ctx: dict) -> list:
+        return self.retriever.retrieve(
+            ctx["parse"]["problem_text"],
+            k=self.retrieve_k,
+            topic=ctx["parse"].get("topic")
+        )
+
+    def _memory_lookup(self, ctx: dict):
+        past_solution = self.memory.find_similar(ctx["parse"]["problem_text"])
+        if past_solution and self.reuse_memory:
+            raise StopPipeline("memory_hit", memory_match=past_solution, final_answer=past_solution["final_answer"])
+        return past_solution
+
+    def _solve(self, ctx: dict) -> dict:
+        return self.solver.solve(
+            structured_problem=ctx["parse"],
+            rag_context=[],
+            route=ctx["route"],
+            cancel_event=ctx["cancel_event"]
+        )
+
+    def _verify(self, ctx: dict) -> dict:
+        return self.verifier.verify(
+            structured_problem=ctx["parse"],
+            solution=ctx["solve"]
+        )
+
+    def _memory_save(self, ctx: dict):
+        solution = ctx["solve"]
+        self.memory.save({
+            "problem_text": ctx["parse"]["problem_text"],
+            "route": ctx["route"],
+            "final_answer": solution["final_answer"],
+            "steps": solution["steps"],
+            "verified": True,
+            "user_feedback": "unknown"
+        })
@@ -0,0 +1,120 @@
+"""
+Index types for the RAG store.
+
+    flat   exact L2 search (default; fine up to ~1M chunks)
+    ivf    inverted lists over k-means cells; search tuned by nprobe
+    hnsw   graph index; search tuned by efSearch, no training needed
+    pq     IVF + product quantization (~8x smaller than float32)
+    sq8    8-bit scalar quantization of a flat index (4x smaller)
+
+All types use L2 distance, so scores stay comparable with the flat index.
+Types that need training are trained on a random sample of the vectors;
+if the corpus is too small to train them, the flat index is used instead.
+"""
+import math
+
+import numpy as np
+
+
+INDEX_TYPES = ("flat", "ivf", "hnsw", "pq", "sq8")
+TRAIN_SIZE = 100_000
+ADD_BATCH = 65_536
+
+# Minimum vectors needed to train: IVF wants ~39 points per cell and PQ
+# learns 256 centroids per sub-quantizer
+_MIN_POINTS_PER_LIST = 39
+_PQ_CENTROIDS = 256
+
+
+def default_nlist(n: int) -> int:
+    return max(1, min(int(4 * math.sqrt(n)), n // _MIN_POINTS_PER_LIST))
+
+
+def default_pq_m(dim: int) -> int:
+    """
+    Largest sub-quantizer count giving >= 8 dims per sub-vector.
+    """
+    for m in range(max(1, dim // 8), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def resolve_config(index_type: str, n: int, dim: int, nlist: int = None, hnsw_m: int = 32,
+                   pq_m: int = None, nprobe: int = None, ef_search: int = None) -> dict:
+    """
+    Turns a requested index type into a concrete FAISS factory string and
+    search parameters for a corpus of n vectors of size dim. Recorded in
+    the build manifest as "index".
+    """
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type '{index_type}', expected one of {INDEX_TYPES}")
+
+    nlist = min(nlist or default_nlist(n), max(n, 1))
+    trainable = n >= _MIN_POINTS_PER_LIST * nlist and nlist > 1
+
+    if index_type == "ivf" and trainable:
+        return {
+            "type": "ivf",
+            "factory": f"IVF{nlist},Flat",
+            "search": {"nprobe": nprobe or max(1, nlist // 16)},
+        }
+
+    if index_type == "pq" and trainable and n >= _PQ_CENTROIDS:
+        m = pq_m or default_pq_m(dim)
+        return {
+            "type": "pq",
+            "factory": f"IVF{nlist},PQ{m}",
+            "search": {"nprobe": nprobe or max(1, nlist // 16)},
+        }
+
+    if index_type == "hnsw":
+        return {
+            "type": "hnsw",
+            "factory": f"HNSW{hnsw_m}",
+            "search": {"efSearch": ef_search or 64},
+        }
+
+    if index_type == "sq8":
+        return {"type": "sq8", "factory": "SQ8", "search": {}}
+
+    config = {"type": "flat", "factory": "Flat", "search": {}}
+    if index_type != "flat":
+        config["requested"] = index_type
+    return config
+
+
+def build_index(vectors: np.ndarray, config: dict, train_size: int = TRAIN_SIZE, seed: int = 0,
+                rows: np.ndarray = None):
+    """
+    Builds a FAISS index for vectors (may be a np.memmap): trains on a
+    random sample when needed, then adds vectors in batches so only one
+    batch is paged in at a time. rows (sorted positions) restricts the
+    index to those vectors, in that order, without copying them out first.
+    """
+    import faiss
+
+    n, dim = vectors.shape if rows is None else (len(rows), vectors.shape[1])
+    index = faiss.index_factory(dim, config["factory"], faiss.METRIC_L2)
+
+    def take(positions):
+        return np.ascontiguousarray(vectors[positions if rows is None else rows[positions]], dtype=np.float32)
+
+    if not index.is_trained:
+        rng = np.random.default_rng(seed)
+        sample = np.sort(rng.choice(n, size=min(n, train_size), replace=False))
+        index.train(take(sample))
+
+    for start in range(0, n, ADD_BATCH):
+        index.add(take(slice(start, start + ADD_BATCH)))
+
+    apply_search_params(index, config.get("search", {}))
+    return index
+
+
+def apply_search_params(index, params: dict):
+    import faiss
+
+    space = faiss.ParameterSpace()
+    for name, value in params.items():
+        space.set_index_parameter(index, name, value)
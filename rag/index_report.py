@@ -0,0 +1,131 @@
+"""
+Recall-vs-latency report for the RAG index types, measured against the
+exact (flat) index over the live store's vectors.
+
+    python -m rag.index_report --types flat,ivf,hnsw,pq,sq8 --k 5
+    python -m rag.index_report --query-file queries.txt --json report.json
+
+Queries are either lines of a text file (embedded with the RAG model) or,
+by default, stored vectors with Gaussian noise added, so the report can
+run without loading the embedding model.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from rag.ann import INDEX_TYPES, build_index, resolve_config
+from rag.index_store import IndexStore
+from rag.store import current_store_dir
+from utils.model_registry import VECTOR_STORE_PATH
+
+
+SWEEPS = {
+    "ivf": ("nprobe", [1, 2, 4, 8, 16, 32, 64, 128]),
+    "pq": ("nprobe", [1, 2, 4, 8, 16, 32, 64, 128]),
+    "hnsw": ("efSearch", [16, 32, 64, 128, 256]),
+}
+
+
+def load_vectors(store: IndexStore) -> np.ndarray:
+    return np.ascontiguousarray(store.get_vectors(np.arange(len(store))), dtype=np.float32)
+
+
+def make_queries(vectors: np.ndarray, n: int, query_file: str = None, seed: int = 0) -> np.ndarray:
+    if query_file:
+        from utils.model_registry import registry
+
+        with open(query_file, "r", encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+        return np.asarray(registry.get("embeddings").embed_documents(texts), dtype=np.float32)
+
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(vectors), size=min(n, len(vectors)), replace=False)
+    scale = float(np.std(vectors)) * 0.5
+    return (vectors[picks] + rng.normal(0, scale, size=(len(picks), vectors.shape[1]))).astype(np.float32)
+
+
+def measure(index, queries: np.ndarray, truth: np.ndarray, k: int) -> dict:
+    # Per-query latency, as the retriever sees it for a single request
+    timings = []
+    found = np.empty((len(queries), k), dtype=np.int64)
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        _, ids = index.search(query[None, :], k)
+        timings.append(time.perf_counter() - start)
+        found[i] = ids[0]
+
+    hits = [len(set(f) & set(t)) for f, t in zip(found, truth)]
+    timings = np.asarray(timings) * 1000
+    return {
+        f"recall@{k}": round(float(np.sum(hits)) / truth.size, 4),
+        "mean_ms": round(float(timings.mean()), 4),
+        "p95_ms": round(float(np.percentile(timings, 95)), 4),
+    }
+
+
+def report(types: list, k: int = 5, n_queries: int = 200, query_file: str = None) -> list:
+    import faiss
+    from rag.ann import apply_search_params
+
+    store = IndexStore(current_store_dir(VECTOR_STORE_PATH))
+    vectors = load_vectors(store)
+    queries = make_queries(vectors, n_queries, query_file)
+    k = min(k, len(vectors))
+
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, k)
+
+    rows = []
+    for index_type in types:
+        config = resolve_config(index_type, len(vectors), vectors.shape[1])
+        start = time.perf_counter()
+        index = build_index(vectors, config)
+        build_s = time.perf_counter() - start
+
+        param, values = SWEEPS.get(config["type"], (None, [None]))
+        for value in values:
+            if param == "nprobe" and value > index.nlist:
+                break
+            if param:
+                apply_search_params(index, {param: value})
+            row = {
+                "type": config["type"],
+                "factory": config["factory"],
+                "param": f"{param}={value}" if param else "",
+                "build_s": round(build_s, 3),
+            }
+            row.update(measure(index, queries, truth, k))
+            rows.append(row)
+
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall vs latency of RAG index types.")
+    parser.add_argument("--types", default=",".join(INDEX_TYPES))
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200, help="Synthetic queries to sample")
+    parser.add_argument("--query-file", default=None, help="Text queries, one per line")
+    parser.add_argument("--json", default=None, help="Also write the rows to this file")
+    args = parser.parse_args()
+
+    rows = report(args.types.split(","), args.k, args.queries, args.query_file)
+
+    recall_key = next(key for key in rows[0] if key.startswith("recall@"))
+    print(f"{'type':<6} {'factory':<16} {'param':<14} {recall_key:>9} {'mean_ms':>9} {'p95_ms':>9} {'build_s':>8}")
+    for row in rows:
+        print(
+            f"{row['type']:<6} {row['factory']:<16} {row['param']:<14} "
+            f"{row[recall_key]:>9.3f} {row['mean_ms']:>9.3f} {row['p95_ms']:>9.3f} {row['build_s']:>8.2f}"
+        )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
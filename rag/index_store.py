@@ -0,0 +1,316 @@
+"""
+Pickle-free on-disk format for the RAG store.
+
+A build directory contains:
+    index.faiss           FAISS index; vector i belongs to chunk i
+    chunks.bin            UTF-8 chunk texts, concatenated
+    chunks.offsets.npy    int64[N + 1] byte offsets into chunks.bin
+    chunks.hashes.npy     S64[N] content hash of each chunk
+    chunks.sources.npy    int32[N] index into manifest.json "sources"
+    chunks.topics.npy     int16[N] index into manifest.json "topics"
+    vectors.f32           float32[N, dim] raw embeddings
+    topics/<topic>.faiss  per-topic sub-index over that topic's chunks
+    topics/<topic>.ids.npy  int64 chunk positions of the sub-index entries
+    bm25.*                lexical index (see rag/lexical.py)
+    manifest.json         build parameters, index type, sources and topics
+
+Builds from before topics / raw vectors existed (format 2) still load;
+they simply search the global index only.
+
+Everything except manifest.json is memory-mapped on load, so opening a
+store costs a few page faults rather than a full deserialization, chunk
+text is paged in only when a search returns it, and every process that
+opens the same build shares one copy in the page cache.
+
+To convert a store written by LangChain's FAISS.save_local (index.pkl):
+
+    python -m rag.index_store --migrate rag/vector_store
+"""
+import argparse
+import json
+import mmap
+import os
+import threading
+
+import numpy as np
+
+from utils.logging import span
+
+
+INDEX_FILE = "index.faiss"
+TEXT_FILE = "chunks.bin"
+OFFSETS_FILE = "chunks.offsets.npy"
+HASHES_FILE = "chunks.hashes.npy"
+SOURCES_FILE = "chunks.sources.npy"
+TOPICS_FILE = "chunks.topics.npy"
+VECTORS_FILE = "vectors.f32"
+TOPICS_DIR = "topics"
+MANIFEST_FILE = "manifest.json"
+FORMAT_VERSION = 3
+READABLE_FORMATS = (2, 3)
+
+
+class ChunkStore:
+    """
+    Read-only, memory-mapped chunk texts and metadata.
+    """
+
+    def __init__(self, path: str, sources: list, topics: list = None):
+        self.path = path
+        self.sources = sources
+        self.topics = topics or []
+        self.offsets = np.load(os.path.join(path, OFFSETS_FILE), mmap_mode="r")
+        self.hashes = np.load(os.path.join(path, HASHES_FILE), mmap_mode="r")
+        self.source_ids = np.load(os.path.join(path, SOURCES_FILE), mmap_mode="r")
+        topics_path = os.path.join(path, TOPICS_FILE)
+        self.topic_ids = np.load(topics_path, mmap_mode="r") if os.path.exists(topics_path) else None
+        self._masks = {}
+
+        self._file = open(os.path.join(path, TEXT_FILE), "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        # mmap cannot map an empty file
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def text(self, i: int) -> str:
+        return self._data[self.offsets[i]:self.offsets[i + 1]].decode("utf-8")
+
+    def hash(self, i: int) -> str:
+        return self.hashes[i].decode("ascii")
+
+    def source(self, i: int) -> str:
+        return self.sources[self.source_ids[i]]
+
+    def texts(self):
+        for i in range(len(self)):
+            yield self.text(i)
+
+    def topic_mask(self, topic: str):
+        """
+        Boolean mask of the chunks in topic, or None if the build has no
+        such topic.
+        """
+        if self.topic_ids is None or topic not in self.topics:
+            return None
+        if topic not in self._masks:
+            self._masks[topic] = np.asarray(self.topic_ids) == self.topics.index(topic)
+        return self._masks[topic]
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+
+class ChunkStoreWriter:
+    """
+    Streams chunks to a build directory; only the offsets, hashes and
+    source ids (a few bytes per chunk) are held in memory.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._text = open(os.path.join(path, TEXT_FILE), "wb")
+        self._offsets = [0]
+        self._hashes = []
+        self._source_ids = []
+        self._sources = {}
+        self._topic_ids = []
+        self._topics = {}
+
+    def add(self, chunk_hash: str, source: str, text: str, topic: str = ""):
+        data = text.encode("utf-8")
+        self._text.write(data)
+        self._offsets.append(self._offsets[-1] + len(data))
+        self._hashes.append(chunk_hash)
+        self._source_ids.append(self._sources.setdefault(source, len(self._sources)))
+        self._topic_ids.append(self._topics.setdefault(topic, len(self._topics)))
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def close(self) -> dict:
+        """
+        Finishes the files and returns the source and topic lists for the
+        manifest.
+        """
+        self._text.close()
+        np.save(os.path.join(self.path, OFFSETS_FILE), np.asarray(self._offsets, dtype=np.int64))
+        np.save(os.path.join(self.path, HASHES_FILE), np.asarray(self._hashes, dtype="S64"))
+        np.save(os.path.join(self.path, SOURCES_FILE), np.asarray(self._source_ids, dtype=np.int32))
+        np.save(os.path.join(self.path, TOPICS_FILE), np.asarray(self._topic_ids, dtype=np.int16))
+        return {
+            "sources": sorted(self._sources, key=self._sources.get),
+            "topics": sorted(self._topics, key=self._topics.get),
+        }
+
+
+class IndexStore:
+    """
+    A FAISS index plus its ChunkStore, loaded from a build directory.
+    """
+
+    def __init__(self, path: str, search_params: dict = None):
+        import faiss
+        from rag.ann import apply_search_params
+        from rag.lexical import BM25Index
+
+        if not os.path.exists(os.path.join(path, MANIFEST_FILE)):
+            if os.path.exists(os.path.join(path, "index.pkl")):
+                raise RuntimeError(
+                    f"{path} is a legacy pickle store; convert it with "
+                    f"'python -m rag.index_store --migrate {path}' or re-run 'python -m rag.ingest --full'"
+                )
+            raise FileNotFoundError(f"No vector store found in {path}")
+
+        self.path = path
+        self.manifest = read_manifest(path)
+        # Memory-mapped where FAISS supports it (flat indexes), so
+        # processes share the vectors through the page cache
+        try:
+            self.index = faiss.read_index(os.path.join(path, INDEX_FILE), faiss.IO_FLAG_MMAP)
+        except RuntimeError:
+            self.index = faiss.read_index(os.path.join(path, INDEX_FILE))
+        self.chunks = ChunkStore(path, self.manifest["sources"], self.manifest.get("topics"))
+        self.bm25 = BM25Index(path) if BM25Index.exists(path) else None
+        self._topic_indexes = {}
+        self._topic_lock = threading.Lock()
+
+        # nprobe / efSearch recorded at build time, optionally overridden
+        self.search_params = dict(self.manifest.get("index", {}).get("search", {}))
+        self.search_params.update(search_params or {})
+        apply_search_params(self.index, self.search_params)
+
+        vectors_path = os.path.join(path, VECTORS_FILE)
+        self.vectors = None
+        if os.path.exists(vectors_path) and self.index.ntotal:
+            self.vectors = np.memmap(
+                vectors_path, dtype=np.float32, mode="r",
+                shape=(self.index.ntotal, self.index.d)
+            )
+
+    def __len__(self):
+        return self.index.ntotal
+
+    def get_vectors(self, positions: np.ndarray) -> np.ndarray:
+        """
+        Exact stored embeddings. Builds without vectors.f32 fall back to
+        reconstructing from the index (exact only for flat indexes).
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        if self.vectors is not None:
+            return np.asarray(self.vectors[positions])
+        return self.index.reconstruct_batch(positions)
+
+    def search(self, vectors: np.ndarray, k: int, topic: str = None):
+        """
+        Batched vector search. With a topic that has a sub-index, only that
+        topic's chunks are searched; returned positions are always global
+        chunk positions (-1 for padding).
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        sub = self.topic_index(topic) if topic else None
+        with span("faiss.search", queries=len(vectors), k=k, topic=topic if sub else "*") as s:
+            if sub is None:
+                s.set(index_size=self.index.ntotal)
+                return self.index.search(vectors, k)
+
+            index, ids = sub
+            s.set(index_size=index.ntotal)
+            scores, local = index.search(vectors, k)
+            return scores, np.where(local >= 0, ids[np.maximum(local, 0)], -1)
+
+    def topic_index(self, topic: str):
+        """
+        (faiss index, global ids) for topic, loaded on first use; None if
+        this build has no sub-index for it.
+        """
+        if topic not in self._topic_indexes:
+            with self._topic_lock:
+                if topic not in self._topic_indexes:
+                    self._topic_indexes[topic] = self._load_topic_index(topic)
+        return self._topic_indexes[topic]
+
+    def _load_topic_index(self, topic: str):
+        import faiss
+        from rag.ann import apply_search_params
+
+        base = os.path.join(self.path, TOPICS_DIR, topic)
+        if topic not in self.manifest.get("topic_indexes", {}) or not os.path.exists(base + ".faiss"):
+            return None
+
+        index = faiss.read_index(base + ".faiss")
+        params = self.manifest["topic_indexes"][topic].get("search", {})
+        apply_search_params(index, params)
+        return index, np.load(base + ".ids.npy", mmap_mode="r")
+
+
+def read_manifest(path: str) -> dict:
+    with open(os.path.join(path, MANIFEST_FILE), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_manifest(path: str, manifest: dict):
+    with open(os.path.join(path, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def migrate_legacy(root: str):
+    """
+    Converts a LangChain FAISS.save_local store (index.faiss + index.pkl)
+    in root into a new pickle-free build and publishes it. Vectors are
+    copied, not re-embedded. Chunk sources are recovered by matching
+    texts against the current knowledge base split.
+
+    This unpickles index.pkl once, so only run it on a store you built.
+    """
+    import pickle
+    import shutil
+    import time
+
+    from rag.ingest import CHUNK_OVERLAP, CHUNK_SIZE, chunk_hash, iter_chunks
+    from rag.store import new_build_dir, publish_build
+    from utils.model_registry import EMBEDDING_MODEL
+
+    with open(os.path.join(root, "index.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+
+    known_sources = {text: source for _, source, text in iter_chunks(workers=1)}
+
+    build_dir = new_build_dir(root)
+    shutil.copyfile(os.path.join(root, "index.faiss"), os.path.join(build_dir, INDEX_FILE))
+
+    writer = ChunkStoreWriter(build_dir)
+    for i in range(len(index_to_docstore_id)):
+        text = docstore.search(index_to_docstore_id[i]).page_content
+        source = known_sources.get(text, "")
+        writer.add(chunk_hash(source, text), source, text)
+    sources = writer.close()["sources"]
+
+    write_manifest(build_dir, {
+        "format": 2,
+        "build": os.path.basename(build_dir),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "params": {
+            "chunk_size": CHUNK_SIZE,
+            "chunk_overlap": CHUNK_OVERLAP,
+            "embedding_model": EMBEDDING_MODEL,
+        },
+        "count": len(writer),
+        "sources": sources,
+    })
+    publish_build(root, build_dir)
+    print(f"Migrated {len(writer)} chunks to {build_dir}")
+    print("Run 'python -m rag.ingest' to add topic and lexical indexes (no re-embedding needed)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RAG index store utilities.")
+    parser.add_argument("--migrate", metavar="DIR", help="Convert a legacy pickle store in DIR")
+    args = parser.parse_args()
+    if args.migrate:
+        migrate_legacy(args.migrate)
+    else:
+        parser.print_help()
@@ -1,45 +1,366 @@
+"""
+Builds / updates the RAG vector store from rag/knowledge_base.
+
+    python -m rag.ingest                          # incremental
+    python -m rag.ingest --full                   # rebuild from scratch
+    python -m rag.ingest --workers 8 --batch-size 256
+    python -m rag.ingest --index-type hnsw        # see rag/ann.py
+
+Every chunk is identified by a hash of its source file and text. Only new
+chunks are embedded, chunks that disappeared are deleted, and the result
+is written to a fresh build directory that is swapped in atomically
+(see rag/store.py). The build's manifest.json records the chunking
+parameters and embedding model; if they change, the store is rebuilt.
+Builds use the pickle-free format in rag/index_store.py; vectors of
+unchanged chunks are copied from the previous build.
+
+Ingestion streams: files are read and split one at a time in a process
+pool, and new chunks are embedded and added to the index in fixed-size
+batches, so memory use does not grow with the corpus being read.
+"""
+import argparse
+import hashlib
+import multiprocessing as mp
 import os
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
+import shutil
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import numpy as np
+
+from rag.ann import INDEX_TYPES, TRAIN_SIZE, build_index, resolve_config
+from rag.index_store import (
+    ChunkStore, ChunkStoreWriter, IndexStore, FORMAT_VERSION, INDEX_FILE, READABLE_FORMATS,
+    TOPICS_DIR, TOPICS_FILE, VECTORS_FILE, write_manifest
+)
+from rag.lexical import build_bm25
+from rag.store import current_store_dir, new_build_dir, publish_build
+from utils.model_registry import registry, EMBEDDING_MODEL
 
 kb_path = "rag/knowledge_base"
 db_path = "rag/vector_store"
 
-def ingest():
-    docs = []
+CHUNK_SIZE = 400
+CHUNK_OVERLAP = 50
+BATCH_SIZE = 128
+# Files split ahead of the consumer, per worker
+PREFETCH_PER_WORKER = 2
+INDEX_TYPE = "flat"
+FLAT_CONFIG = {"type": "flat", "factory": "Flat", "search": {}}
+
+
+def chunk_hash(source: str, text: str) -> str:
+    return hashlib.sha256(f"{source}\0{text}".encode("utf-8")).hexdigest()
+
+
+def topic_for_source(source: str) -> str:
+    """
+    Topic partition of a knowledge-base file: its top-level directory, or
+    its file name for top-level files (algebra.txt -> algebra). These match
+    the topics ParserAgent detects.
+    """
+    head = source.split("/", 1)[0]
+    return os.path.splitext(head)[0] if "/" not in source else head
+
+
+def iter_files():
+    """
+    Yields knowledge-base files (paths relative to kb_path) in a stable order.
+    """
+    for root, dirs, files in os.walk(kb_path):
+        dirs.sort()
+        for file in sorted(files):
+            yield os.path.relpath(os.path.join(root, file), kb_path).replace(os.sep, "/")
 
-    for file in os.listdir(kb_path):
-        with open(os.path.join(kb_path, file), "r", encoding = "utf-8") as f:
-            docs.append(f.read())
+
+def split_file(source: str) -> list:
+    """
+    Reads and splits one file; returns [(hash, source, text), ...].
+    Runs in the worker processes.
+    """
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
 
     splitter = RecursiveCharacterTextSplitter(
-        chunk_size = 400,
-        chunk_overlap = 50
+        chunk_size = CHUNK_SIZE,
+        chunk_overlap = CHUNK_OVERLAP
     )
 
-    chunks = splitter.create_documents(docs)
+    with open(os.path.join(kb_path, source), "r", encoding = "utf-8") as f:
+        text = f.read()
 
-    embeddings = HuggingFaceEmbeddings(
-        model_name = "sentence-transformers/all-MiniLM-L6-v2"
-    )
+    return [(chunk_hash(source, chunk), source, chunk) for chunk in splitter.split_text(text)]
 
-    vectorstore = FAISS.from_documents(chunks, embeddings)
-    vectorstore.save_local(db_path)
 
-    print("RAG ingestion complete")
+def iter_chunks(workers: int):
+    """
+    Streams (hash, source, text) for the whole knowledge base, splitting
+    files in parallel while keeping the file order. At most
+    PREFETCH_PER_WORKER files per worker are in flight, so split files
+    do not pile up when embedding is the slower side.
+    """
+    if workers <= 1:
+        for source in iter_files():
+            yield from split_file(source)
+        return
+
+    files = iter_files()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn")) as pool:
+        pending = deque(pool.submit(split_file, source) for source in islice(files, workers * PREFETCH_PER_WORKER))
+        while pending:
+            chunks = pending.popleft().result()
+            for source in islice(files, 1):
+                pending.append(pool.submit(split_file, source))
+            yield from chunks
+
+
+class _Progress:
+
+    def __init__(self, every: float = 2.0):
+        self.every = every
+        self.start = time.perf_counter()
+        self.last = self.start
+        self.chunks = 0
+        self.embedded = 0
+        self._reported = None
+
+    def update(self, chunks: int = 0, embedded: int = 0, force: bool = False):
+        self.chunks += chunks
+        self.embedded += embedded
+        now = time.perf_counter()
+        due = force or now - self.last >= self.every
+        if due and self._reported != (self.chunks, self.embedded):
+            self.last = now
+            self._reported = (self.chunks, self.embedded)
+            elapsed = now - self.start
+            print(
+                f"  {self.chunks} chunks scanned, {self.embedded} embedded "
+                f"({self.chunks / elapsed:.0f} chunks/s, {self.embedded / elapsed:.0f} embeddings/s)",
+                flush=True
+            )
+
+
+def open_previous(params: dict, full: bool):
+    """
+    The live store if it can be updated incrementally, else None.
+    Legacy pickle stores are never loaded here; they are rebuilt.
+    """
+    if full:
+        return None
+    try:
+        store = IndexStore(current_store_dir(db_path))
+    except (RuntimeError, FileNotFoundError):
+        return None
+
+    manifest = store.manifest
+    if manifest.get("format") not in READABLE_FORMATS or manifest.get("params") != params:
+        return None
+    return store
 
-if __name__ == "__main__":
-    ingest()
 
+class _HashLookup:
+    """
+    Maps chunk hashes to their position in a previous build with a
+    vectorized binary search over its (memory-mapped) hash column.
+    """
 
+    def __init__(self, store: IndexStore):
+        hashes = np.asarray(store.chunks.hashes)
+        self.order = np.argsort(hashes)
+        self.sorted = hashes[self.order]
 
+    def find(self, hashes: list) -> np.ndarray:
+        if len(self.sorted) == 0:
+            return np.full(len(hashes), -1, dtype=np.int64)
+        query = np.asarray(hashes, dtype="S64")
+        pos = np.minimum(np.searchsorted(self.sorted, query), len(self.sorted) - 1)
+        return np.where(self.sorted[pos] == query, self.order[pos], -1)
 
 
+def ingest(
+    full: bool = False,
+    workers: int = None,
+    batch_size: int = BATCH_SIZE,
+    index_type: str = INDEX_TYPE,
+    **index_options
+):
+    """
+    index_options are passed to rag.ann.resolve_config (nlist, hnsw_m,
+    pq_m, nprobe, ef_search); train_size sets the training sample size.
+    """
+    import faiss
 
+    train_size = index_options.pop("train_size", TRAIN_SIZE)
+    workers = workers or os.cpu_count() or 1
+    params = {
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "embedding_model": EMBEDDING_MODEL,
+    }
 
+    previous = open_previous(params, full)
+    lookup = _HashLookup(previous) if previous is not None else None
 
+    build_dir = new_build_dir(db_path)
+    writer = ChunkStoreWriter(build_dir)
+    # Raw vectors are streamed to disk; the index is built from them at the
+    # end, once the sample for training-based index types is available
+    vectors_file = open(os.path.join(build_dir, VECTORS_FILE), "wb")
+    dim = None
+    batch = []
+    progress = _Progress()
+    reused = 0
+    unchanged_order = True
 
+    def flush():
+        nonlocal dim, reused, unchanged_order
 
+        positions = (
+            lookup.find([h for h, _, _ in batch])
+            if lookup is not None else np.full(len(batch), -1)
+        )
+        new = np.flatnonzero(positions < 0)
+        old = np.flatnonzero(positions >= 0)
 
-    
\ No newline at end of file
+        vectors = [None] * len(batch)
+        if len(new):
+            # Loaded only when something actually needs embedding
+            embeddings = registry.get("embeddings")
+            computed = np.asarray(
+                embeddings.embed_documents([batch[i][2] for i in new]), dtype=np.float32
+            )
+            for i, vector in zip(new, computed):
+                vectors[i] = vector
+        if len(old):
+            # Unchanged chunks keep their vectors; no re-embedding
+            copied = previous.get_vectors(positions[old])
+            for i, vector in zip(old, copied):
+                vectors[i] = vector
+            expected = np.arange(reused, reused + len(old))
+            unchanged_order = unchanged_order and np.array_equal(positions[old], expected)
+            reused += len(old)
+
+        vectors = np.vstack(vectors).astype(np.float32)
+        dim = vectors.shape[1]
+        vectors_file.write(vectors.tobytes())
+
+        for h, source, text in batch:
+            writer.add(h, source, text, topic_for_source(source))
+
+        progress.update(embedded=len(new))
+        batch.clear()
+
+    for chunk in iter_chunks(workers):
+        batch.append(chunk)
+        progress.update(chunks=1)
+        if len(batch) >= batch_size:
+            flush()
+
+    if batch:
+        flush()
+    progress.update(force=True)
+    lists = writer.close()
+    vectors_file.close()
+
+    added = progress.embedded
+    removed = len(previous) - reused if previous is not None else 0
+
+    if dim is None:
+        shutil.rmtree(build_dir, ignore_errors=True)
+        print("Knowledge base is empty; nothing to ingest")
+        return
+
+    config = resolve_config(index_type, len(writer), dim, **index_options)
+    previous_config = previous.manifest.get("index", FLAT_CONFIG) if previous is not None else None
+
+    if (
+        previous is not None and not added and not removed and unchanged_order
+        and previous_config == config and previous.manifest["format"] == FORMAT_VERSION
+    ):
+        shutil.rmtree(build_dir, ignore_errors=True)
+        print("RAG store is up to date")
+        return
+
+    if config.get("requested"):
+        print(f"  Too few chunks to train a '{config['requested']}' index; using a flat index")
+
+    vectors = np.memmap(
+        os.path.join(build_dir, VECTORS_FILE), dtype=np.float32, mode="r",
+        shape=(len(writer), dim)
+    )
+    start = time.perf_counter()
+    index = build_index(vectors, config, train_size=train_size)
+    print(f"  Built {config['factory']} index in {time.perf_counter() - start:.1f}s")
+
+    faiss.write_index(index, os.path.join(build_dir, INDEX_FILE))
+    del index
+
+    # -------- TOPIC SUB-INDEXES --------
+    start = time.perf_counter()
+    topic_ids = np.load(os.path.join(build_dir, TOPICS_FILE))
+    topic_indexes = {}
+    os.makedirs(os.path.join(build_dir, TOPICS_DIR))
+    for t, topic in enumerate(lists["topics"]):
+        if not topic:
+            continue
+        positions = np.flatnonzero(topic_ids == t)
+        topic_config = resolve_config(index_type, len(positions), dim, **index_options)
+        topic_index = build_index(vectors, topic_config, train_size=train_size, rows=positions)
+        base = os.path.join(build_dir, TOPICS_DIR, topic)
+        faiss.write_index(topic_index, base + ".faiss")
+        np.save(base + ".ids.npy", positions.astype(np.int64))
+        topic_indexes[topic] = {**topic_config, "count": int(len(positions))}
+    del vectors
+
+    # -------- LEXICAL INDEX --------
+    build_bm25(ChunkStore(build_dir, lists["sources"]).texts(), build_dir)
+    print(f"  Built {len(topic_indexes)} topic indexes and BM25 in {time.perf_counter() - start:.1f}s")
+    write_manifest(build_dir, {
+        "format": FORMAT_VERSION,
+        "build": os.path.basename(build_dir),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "params": params,
+        "index": config,
+        "dim": dim,
+        "count": len(writer),
+        "sources": lists["sources"],
+        "topics": lists["topics"],
+        "topic_indexes": topic_indexes,
+    })
+
+    publish_build(db_path, build_dir)
+    registry.reset("vector_store")
+
+    elapsed = time.perf_counter() - progress.start
+    print(
+        f"RAG ingestion complete in {elapsed:.1f}s: {added} added, {removed} removed, "
+        f"{len(writer)} total ({len(writer) / elapsed:.0f} chunks/s)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest the RAG knowledge base.")
+    parser.add_argument("--full", action="store_true", help="Rebuild the store from scratch")
+    parser.add_argument("--workers", type=int, default=None, help="Processes used for splitting")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Chunks per embedding batch")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default=INDEX_TYPE)
+    parser.add_argument("--nlist", type=int, default=None, help="IVF cells (ivf, pq)")
+    parser.add_argument("--nprobe", type=int, default=None, help="IVF cells searched (ivf, pq)")
+    parser.add_argument("--hnsw-m", type=int, default=32, help="HNSW graph degree")
+    parser.add_argument("--ef-search", type=int, default=None, help="HNSW search depth")
+    parser.add_argument("--pq-m", type=int, default=None, help="PQ sub-quantizers")
+    parser.add_argument("--train-size", type=int, default=TRAIN_SIZE, help="Training sample size")
+    args = parser.parse_args()
+    ingest(
+        full=args.full,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        index_type=args.index_type,
+        nlist=args.nlist,
+        nprobe=args.nprobe,
+        hnsw_m=args.hnsw_m,
+        ef_search=args.ef_search,
+        pq_m=args.pq_m,
+        train_size=args.train_size
+    )
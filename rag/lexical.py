@@ -0,0 +1,224 @@
+"""
+BM25 inverted index over math-aware tokens.
+
+MiniLM embeds symbols poorly ("x^2", "∫", "det" all look alike to it),
+so the tokenizer keeps them as terms: powers are normalized to "x^2"
+whatever the spelling (x**2, x²), operator symbols are single tokens,
+and words / numbers are lowercased as usual.
+
+On disk (inside a build directory), all memory-mapped except the vocab:
+    bm25.vocab.json     {term: term id}, plus N and avgdl
+    bm25.indptr.npy     int64[V + 1] posting list boundaries
+    bm25.docs.npy       int32[P] chunk positions, grouped by term
+    bm25.tf.npy         uint16[P] term frequencies
+    bm25.doclen.npy     int32[N] tokens per chunk
+
+Building is bounded in memory too: postings are spilled to temporary
+run files in blocks and scattered into the memory-mapped arrays one run
+at a time, so only the vocabulary is held in full.
+"""
+import json
+import math
+import os
+import re
+import shutil
+import tempfile
+from array import array
+from collections import Counter
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from utils.logging import traced
+
+
+VOCAB_FILE = "bm25.vocab.json"
+INDPTR_FILE = "bm25.indptr.npy"
+DOCS_FILE = "bm25.docs.npy"
+TF_FILE = "bm25.tf.npy"
+DOCLEN_FILE = "bm25.doclen.npy"
+
+K1 = 1.5
+B = 0.75
+# Postings held in memory before they are spilled to a run file
+BLOCK_POSTINGS = 1_000_000
+
+_SUPERSCRIPTS = {"²": "^2", "³": "^3", "⁴": "^4"}
+_TOKEN_RE = re.compile(
+    r"[a-z]\^\d+"                  # powers: x^2
+    r"|[a-z]+'+"                   # derivatives: f'
+    r"|[a-z]+"                     # words, variables, det, sin, log
+    r"|\d+(?:\.\d+)?"              # numbers
+    r"|[∫√πΣ∑∏∂∞≤≥≠±→λθ∈]"         # math symbols
+)
+
+
+def tokenize(text: str) -> List[str]:
+    text = text.lower().replace("**", "^")
+    for k, v in _SUPERSCRIPTS.items():
+        text = text.replace(k, v)
+    text = re.sub(r"([a-z])\s*\^\s*(\d)", r"\1^\2", text)
+    return _TOKEN_RE.findall(text)
+
+
+def build_bm25(texts: Iterable[str], path: str, block_postings: int = BLOCK_POSTINGS):
+    """
+    Builds and writes the index for texts (in chunk order).
+    """
+    runs_dir = tempfile.mkdtemp(prefix="bm25-runs-", dir=path)
+    try:
+        term_ids, df, runs = _spill_runs(texts, runs_dir, block_postings)
+        _merge_runs(term_ids, df, runs, path)
+    finally:
+        shutil.rmtree(runs_dir, ignore_errors=True)
+
+
+def _spill_runs(texts: Iterable[str], runs_dir: str, block_postings: int) -> tuple:
+    """
+    Tokenizes texts into run files of at most block_postings postings
+    (provisional term id, chunk position, tf), in chunk order. Returns
+    ({term: provisional id}, document frequency per provisional id,
+    [run file prefixes]).
+    """
+    term_ids, df, runs = {}, [], []
+    terms, docs, tfs, doclens = array("i"), array("i"), array("H"), array("i")
+
+    def spill():
+        prefix = os.path.join(runs_dir, f"run{len(runs):05d}")
+        for name, values, dtype in (
+            ("terms", terms, np.int32), ("docs", docs, np.int32),
+            ("tf", tfs, np.uint16), ("doclen", doclens, np.int32),
+        ):
+            np.save(f"{prefix}.{name}.npy", np.frombuffer(values, dtype=dtype) if len(values) else np.empty(0, dtype))
+            del values[:]
+        runs.append(prefix)
+
+    for doc, text in enumerate(texts):
+        counts = Counter(tokenize(text))
+        doclens.append(sum(counts.values()))
+        for term, tf in counts.items():
+            i = term_ids.setdefault(term, len(term_ids))
+            if i == len(df):
+                df.append(0)
+            df[i] += 1
+            terms.append(i)
+            docs.append(doc)
+            tfs.append(min(tf, 65535))
+        if len(terms) >= block_postings:
+            spill()
+
+    if doclens or not runs:
+        spill()
+    return term_ids, df, runs
+
+
+def _merge_runs(term_ids: dict, df: list, runs: list, path: str):
+    """
+    Writes the final arrays: term ids follow sorted term order, and each
+    run's postings are scattered to their term's slice. Runs are in
+    chunk order, so every posting list ends up sorted by chunk.
+    """
+    final = np.empty(len(term_ids), dtype=np.int64)
+    vocab = {}
+    for rank, term in enumerate(sorted(term_ids)):
+        final[term_ids[term]] = rank
+        vocab[term] = rank
+
+    indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+    indptr[1:][final] = np.asarray(df, dtype=np.int64)
+    np.cumsum(indptr, out=indptr)
+
+    n = sum(int(np.load(f"{prefix}.doclen.npy", mmap_mode="r").shape[0]) for prefix in runs)
+    docs_out = _output(os.path.join(path, DOCS_FILE), np.int32, int(indptr[-1]))
+    tfs_out = _output(os.path.join(path, TF_FILE), np.uint16, int(indptr[-1]))
+    doclens_out = _output(os.path.join(path, DOCLEN_FILE), np.int32, n)
+
+    fill = indptr[:-1].copy()
+    first_doc, total_len = 0, 0
+    for prefix in runs:
+        ids = final[np.load(f"{prefix}.terms.npy")]
+        order = np.argsort(ids, kind="stable")
+        ids = ids[order]
+        unique, first, counts = np.unique(ids, return_index=True, return_counts=True)
+        slots = fill[ids] + np.arange(len(ids)) - np.repeat(first, counts)
+        docs_out[slots] = np.load(f"{prefix}.docs.npy")[order]
+        tfs_out[slots] = np.load(f"{prefix}.tf.npy")[order]
+        fill[unique] += counts
+
+        doclens = np.load(f"{prefix}.doclen.npy")
+        doclens_out[first_doc:first_doc + len(doclens)] = doclens
+        first_doc += len(doclens)
+        total_len += int(doclens.sum())
+
+    for out in (docs_out, tfs_out, doclens_out):
+        if isinstance(out, np.memmap):
+            out.flush()
+    del docs_out, tfs_out, doclens_out
+
+    with open(os.path.join(path, VOCAB_FILE), "w", encoding="utf-8") as f:
+        json.dump({
+            "n": n,
+            "avgdl": total_len / n if n else 0.0,
+            "terms": vocab,
+        }, f)
+    np.save(os.path.join(path, INDPTR_FILE), indptr)
+
+
+def _output(file: str, dtype, size: int) -> np.ndarray:
+    # A zero-length file cannot be memory-mapped
+    if not size:
+        np.save(file, np.empty(0, dtype=dtype))
+        return np.empty(0, dtype=dtype)
+    return np.lib.format.open_memmap(file, mode="w+", dtype=dtype, shape=(size,))
+
+
+class BM25Index:
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, VOCAB_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.n = meta["n"]
+        self.avgdl = meta["avgdl"] or 1.0
+        self.vocab = meta["terms"]
+        self.indptr = np.load(os.path.join(path, INDPTR_FILE), mmap_mode="r")
+        self.docs = np.load(os.path.join(path, DOCS_FILE), mmap_mode="r")
+        self.tfs = np.load(os.path.join(path, TF_FILE), mmap_mode="r")
+        self.doclens = np.load(os.path.join(path, DOCLEN_FILE), mmap_mode="r")
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(os.path.join(path, VOCAB_FILE))
+
+    @traced("bm25.search")
+    def search(self, query: str, k: int, allowed: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """
+        Top-k (chunk position, BM25 score). Work is proportional to the
+        postings of the query terms, not to the corpus size. allowed is an
+        optional boolean mask over chunks (topic pruning).
+        """
+        docs_parts, score_parts = [], []
+        for term in set(tokenize(query)):
+            i = self.vocab.get(term)
+            if i is None:
+                continue
+            docs = np.asarray(self.docs[self.indptr[i]:self.indptr[i + 1]])
+            tfs = np.asarray(self.tfs[self.indptr[i]:self.indptr[i + 1]], dtype=np.float32)
+            if allowed is not None:
+                keep = allowed[docs]
+                docs, tfs = docs[keep], tfs[keep]
+            if not len(docs):
+                continue
+
+            df = self.indptr[i + 1] - self.indptr[i]
+            idf = math.log(1 + (self.n - df + 0.5) / (df + 0.5))
+            norm = K1 * (1 - B + B * self.doclens[docs] / self.avgdl)
+            docs_parts.append(docs)
+            score_parts.append(idf * tfs * (K1 + 1) / (tfs + norm))
+
+        if not docs_parts:
+            return []
+
+        unique, inverse = np.unique(np.concatenate(docs_parts), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(score_parts))
+        top = np.argsort(-scores)[:k]
+        return [(int(unique[j]), float(scores[j])) for j in top]
@@ -1,25 +1,186 @@
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
+import hashlib
+import threading
+from typing import List, Optional, Tuple
 
-db_path = "rag/vector_store"
+import numpy as np
 
-class RAGRetriever:
+from rag.store import store_version
+from utils.cache import LRUCache
+from utils.logging import span
+from utils.model_registry import registry, VECTOR_STORE_PATH
+
+
+# Reciprocal rank fusion constant (Cormack et al.); 60 is the usual choice
+RRF_K = 60
+# Candidates taken from each ranker before fusion, per requested result
+CANDIDATES_PER_RESULT = 4
+
+# Shared across retrievers: normalized query -> embedding, and
+# (store version, embedding hash, k, topic, mode) -> results
+_embedding_cache = LRUCache(maxsize=4096)
+_result_cache = LRUCache(maxsize=4096)
+_loaded_version = None
+_version_lock = threading.Lock()
 
-    def __init__(self):
-        embeddings = HuggingFaceEmbeddings(
-            model_name="sentence-transformers/all-MiniLM-L6-v2"
-        )
 
-        self.db = FAISS.load_local(
-            db_path,
-            embeddings,
-            allow_dangerous_deserialization = True
-        )
+class RAGRetriever:
+    """
+    Hybrid retriever: FAISS vector search fused with BM25 over math tokens
+    (reciprocal rank fusion). When a topic is given and the store has a
+    sub-index for it, both rankers only look at that topic's chunks.
+    """
+
+    def __init__(self, hybrid: bool = True):
+        # Embedder and FAISS index are loaded once per process and shared
+        self.hybrid = hybrid
+        self.embeddings = registry.get("embeddings")
+        self._sync_store()
 
-    def retrieve(self, query: str, k: int = 3):
-        results = self.db.similarity_search(query, k=k)
+    def retrieve(self, query: str, k: int = 3, topic: Optional[str] = None):
+        results = self.retrieve_many([query], k=k, topics=[topic])[0]
 
         if not results:
             return []
         
-        return [doc.page_content for doc in results]
\ No newline at end of file
+        return [content for content, _ in results]
+
+    def retrieve_many(
+        self,
+        queries: List[str],
+        k: int = 3,
+        topics: Optional[List[Optional[str]]] = None
+    ) -> List[List[Tuple[str, float]]]:
+        """
+        Embeds all queries in one forward pass and runs batched FAISS
+        searches (one per topic). Returns, per query, (page_content, score)
+        pairs best first. The score is the fused RRF score (higher is
+        better) in hybrid mode, otherwise the L2 distance (lower is closer).
+
+        Embeddings and results are cached; only queries missing from the
+        caches reach the model / index.
+        """
+        if not queries:
+            return []
+
+        with span("rag.retrieve", queries=len(queries), k=k) as s:
+            results, cache_hits = self._retrieve_many(queries, k, topics)
+            s.set(mode=self.mode, cache_hits=cache_hits)
+            if len(queries) == 1:
+                s.set(cache_hit=cache_hits == 1)
+            return results
+
+    def _retrieve_many(self, queries, k, topics):
+        topics = list(topics) if topics is not None else [None] * len(queries)
+        self._sync_store()
+        normalized = [_normalize_query(q) for q in queries]
+        vectors = self._embed_cached(normalized)
+        mode = self.mode
+        keys = [
+            (self.version, hashlib.sha1(vector.tobytes()).hexdigest(), k, topic, mode)
+            for vector, topic in zip(vectors, topics)
+        ]
+
+        results = [_result_cache.get(key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+
+        # One batched vector search per topic among the cache misses
+        by_topic = {}
+        for i in missing:
+            by_topic.setdefault(topics[i], []).append(i)
+
+        for topic, indices in by_topic.items():
+            if mode == "hybrid":
+                searched = self._search_hybrid(
+                    [normalized[i] for i in indices], vectors[indices], k, topic
+                )
+            else:
+                searched = self._search_vector(vectors[indices], k, topic)
+
+            for i, hits in zip(indices, searched):
+                _result_cache.set(keys[i], hits)
+                results[i] = hits
+
+        return [list(hits) for hits in results], len(queries) - len(missing)
+
+    @property
+    def mode(self) -> str:
+        return "hybrid" if self.hybrid and self.db.bm25 is not None else "vector"
+
+    @staticmethod
+    def cache_stats() -> dict:
+        return {
+            "store_version": store_version(VECTOR_STORE_PATH),
+            "embeddings": _embedding_cache.stats(),
+            "results": _result_cache.stats(),
+        }
+
+    def _embed_cached(self, texts: List[str]) -> np.ndarray:
+        vectors = [_embedding_cache.get(text) for text in texts]
+        missing = sorted({text for text, vector in zip(texts, vectors) if vector is None})
+
+        if missing:
+            with span("rag.embed", texts=len(missing), cache_hits=len(texts) - len(missing)):
+                computed = np.asarray(self.embeddings.embed_documents(missing), dtype=np.float32)
+            for text, vector in zip(missing, computed):
+                _embedding_cache.set(text, vector)
+            lookup = dict(zip(missing, computed))
+            vectors = [lookup[text] if vector is None else vector for text, vector in zip(texts, vectors)]
+
+        return np.stack(vectors)
+
+    def _vector_ranking(self, vectors: np.ndarray, k: int, topic: Optional[str]):
+        scores, indices = self.db.search(vectors, k, topic=topic)
+        # FAISS pads with -1 when the index holds fewer than k vectors
+        return [
+            [(int(i), float(s)) for s, i in zip(row_scores, row_indices) if i != -1]
+            for row_scores, row_indices in zip(scores, indices)
+        ]
+
+    def _search_vector(self, vectors: np.ndarray, k: int, topic: Optional[str]):
+        return [
+            [(self.db.chunks.text(i), score) for i, score in ranking]
+            for ranking in self._vector_ranking(vectors, k, topic)
+        ]
+
+    def _search_hybrid(self, queries: List[str], vectors: np.ndarray, k: int, topic: Optional[str]):
+        n_candidates = k * CANDIDATES_PER_RESULT
+        vector_rankings = self._vector_ranking(vectors, n_candidates, topic)
+        # Topics without a sub-index (e.g. an empty knowledge-base file)
+        # fall back to searching everything in both rankers
+        allowed = self.db.chunks.topic_mask(topic) if topic and self.db.topic_index(topic) else None
+
+        results = []
+        for query, vector_ranking in zip(queries, vector_rankings):
+            lexical_ranking = self.db.bm25.search(query, n_candidates, allowed=allowed)
+
+            fused = {}
+            for ranking in (vector_ranking, lexical_ranking):
+                for rank, (i, _) in enumerate(ranking):
+                    fused[i] = fused.get(i, 0.0) + 1.0 / (RRF_K + rank + 1)
+
+            top = sorted(fused.items(), key=lambda item: -item[1])[:k]
+            results.append([(self.db.chunks.text(i), score) for i, score in top])
+
+        return results
+
+    def _sync_store(self):
+        """
+        Reloads the shared vector store when the files on disk changed
+        since it was loaded. Old cache entries become unreachable because
+        result keys include the store version; LRU eviction drops them.
+        """
+        global _loaded_version
+        version = store_version(VECTOR_STORE_PATH)
+        with _version_lock:
+            if _loaded_version is not None and _loaded_version != version:
+                registry.reset("vector_store")
+            _loaded_version = version
+
+        self.version = version
+        self.db = registry.get("vector_store")
+
+
+def _normalize_query(query: str) -> str:
+    # all-MiniLM-L6-v2 is uncased and ignores runs of whitespace, so this
+    # never changes the embedding, only the hit rate
+    return " ".join(query.lower().split())
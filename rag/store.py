@@ -0,0 +1,70 @@
+import hashlib
+import os
+import shutil
+import time
+import uuid
+
+
+CURRENT_FILE = "CURRENT"
+BUILDS_DIR = "builds"
+KEEP_BUILDS = 2
+
+
+def current_store_dir(root: str) -> str:
+    """
+    Directory holding the live index.
+
+    Builds live in <root>/builds/<id>/ and <root>/CURRENT names the live
+    one. Stores created before builds existed keep their files directly
+    in <root>.
+    """
+    pointer = os.path.join(root, CURRENT_FILE)
+    if os.path.exists(pointer):
+        with open(pointer, "r", encoding="utf-8") as f:
+            return os.path.join(root, f.read().strip())
+    return root
+
+
+def store_version(root: str) -> str:
+    """
+    Cheap identifier of the live build, used to invalidate caches.
+    """
+    pointer = os.path.join(root, CURRENT_FILE)
+    if os.path.exists(pointer):
+        with open(pointer, "r", encoding="utf-8") as f:
+            return f.read().strip()
+
+    parts = []
+    for name in sorted(os.listdir(root)) if os.path.isdir(root) else []:
+        stat = os.stat(os.path.join(root, name))
+        parts.append(f"{name}:{stat.st_size}:{stat.st_mtime_ns}")
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()[:16]
+
+
+def new_build_dir(root: str) -> str:
+    # Sortable by creation time, down to the nanosecond
+    now = time.time_ns()
+    build_id = time.strftime("%Y%m%d-%H%M%S", time.localtime(now // 10**9)) + f"-{now % 10**9:09d}"
+    path = os.path.join(root, BUILDS_DIR, build_id)
+    os.makedirs(path)
+    return path
+
+
+def publish_build(root: str, build_dir: str):
+    """
+    Atomically makes build_dir the live store: readers see either the old
+    or the new build, never a half-written one. Older builds beyond
+    KEEP_BUILDS are removed (the previous one is kept for readers that
+    are still loading it).
+    """
+    relative = os.path.relpath(build_dir, root).replace(os.sep, "/")
+    tmp_pointer = os.path.join(root, f".{CURRENT_FILE}.{uuid.uuid4().hex}")
+    with open(tmp_pointer, "w", encoding="utf-8") as f:
+        f.write(relative)
+    os.replace(tmp_pointer, os.path.join(root, CURRENT_FILE))
+
+    builds = sorted(os.listdir(os.path.join(root, BUILDS_DIR)))
+    live = os.path.basename(build_dir)
+    previous = [b for b in builds if b != live]
+    for build in previous[:max(len(previous) - (KEEP_BUILDS - 1), 0)]:
+        shutil.rmtree(os.path.join(root, BUILDS_DIR, build), ignore_errors=True)
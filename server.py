@@ -0,0 +1,365 @@
+"""
+Async HTTP API over the agent pipeline.
+
+    python server.py --host 0.0.0.0 --port 8080
+
+Endpoints (JSON in / JSON out unless noted):
+    POST /solve       {"problem_text": "..."}
+    POST /retrieve    {"query": "...", "k": 3, "topic": "algebra"}
+    POST /ocr         raw image bytes (png/jpg); ?raw=1 skips pre-processing
+    POST /transcribe  raw audio bytes (wav/mp3/m4a); ?stream=1 answers with
+                      one JSON line per partial transcript (NDJSON)
+    GET  /health, GET /stats
+    GET  /metrics     Prometheus text format
+
+Blocking work (SymPy, OCR, ASR, embeddings) never runs on the event
+loop: it goes to a thread pool (SymPy further into the solver process
+pool), and each stage has its own concurrency limit. Retrieval queries
+arriving within a few milliseconds of each other are embedded together,
+on a thread of their own: /solve threads block waiting for those
+batches, so sharing their pool could leave no thread to run them.
+"""
+import argparse
+import asyncio
+import contextvars
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+
+from agents.solver_agent import SolverAgent
+from pipeline.math_pipeline import MathPipeline
+from rag.retriever import RAGRetriever
+from utils.logging import METRICS, configure_logging, span
+from utils.model_registry import registry
+
+
+STAGE_LIMITS = {
+    "solve": os.cpu_count() or 1,
+    "retrieve": 64,
+    "ocr": 1,
+    "transcribe": 1,
+}
+
+
+class EmbeddingBatcher:
+    """
+    Collects concurrent retrieval requests and serves them with one
+    embedding forward pass per batch (up to max_batch queries, waiting
+    at most max_wait_ms for the batch to fill).
+    """
+
+    def __init__(self, executor, max_batch: int = 32, max_wait_ms: float = 5.0):
+        self.executor = executor
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue = None
+        self._task = None
+        self.batches = 0
+        self.queries = 0
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    async def retrieve(self, query: str, k: int = 3, topic: str = None) -> list:
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((query, k, topic, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            self.batches += 1
+            self.queries += len(batch)
+            try:
+                results = await loop.run_in_executor(
+                    self.executor, _retrieve_batch, [request[:3] for request in batch]
+                )
+            except Exception as e:
+                for *_, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (*_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "batches": self.batches,
+            "queries": self.queries,
+            "avg_batch_size": self.queries / self.batches if self.batches else 0.0,
+        }
+
+
+def _retrieve_batch(requests: list) -> list:
+    # One forward pass and one FAISS search per topic for the whole batch,
+    # at the largest k requested; each caller gets its own top-k back
+    max_k = max(k for _, k, _ in requests)
+    results = RAGRetriever().retrieve_many(
+        [q for q, _, _ in requests], k=max_k, topics=[topic for _, _, topic in requests]
+    )
+    return [hits[:k] for hits, (_, k, _) in zip(results, requests)]
+
+
+class _BatchedRetriever:
+    """
+    Lets the synchronous MathPipeline (running in a worker thread) use
+    the event loop's EmbeddingBatcher.
+    """
+
+    def __init__(self, batcher: EmbeddingBatcher, loop):
+        self.batcher = batcher
+        self.loop = loop
+
+    def retrieve(self, query: str, k: int = 3, topic: str = None) -> list:
+        hits = asyncio.run_coroutine_threadsafe(
+            self.batcher.retrieve(query, k, topic), self.loop
+        ).result()
+        return [content for content, _ in hits]
+
+
+# -------------------------------------------------
+# HANDLERS
+# -------------------------------------------------
+async def solve(request: web.Request):
+    app = request.app
+    body = await _json_body(request)
+    problem_text = body.get("problem_text") or body.get("text")
+    if not problem_text:
+        raise web.HTTPBadRequest(reason="problem_text is required")
+
+    async with app["limits"]["solve"]:
+        result = await _off_loop(app, app["pipeline"].run, problem_text)
+    return web.json_response(result, dumps=_dumps)
+
+
+async def retrieve(request: web.Request):
+    app = request.app
+    body = await _json_body(request)
+    query = body.get("query")
+    if not query:
+        raise web.HTTPBadRequest(reason="query is required")
+    try:
+        k = int(body.get("k", 3))
+    except (TypeError, ValueError):
+        raise web.HTTPBadRequest(reason="k must be an integer")
+
+    async with app["limits"]["retrieve"]:
+        hits = await app["batcher"].retrieve(query, k, body.get("topic"))
+    results = [{"content": content, "score": score} for content, score in hits]
+    return web.json_response({"query": query, "results": results})
+
+
+async def ocr(request: web.Request):
+    app = request.app
+    data = await request.read()
+    if not data:
+        raise web.HTTPBadRequest(reason="Image bytes are required")
+
+    from multimodal.ocr import is_available, run_ocr
+
+    if not is_available():
+        raise web.HTTPServiceUnavailable(reason="OCR is unavailable")
+
+    async with app["limits"]["ocr"]:
+        text, confidence = await _off_loop(app, _ocr_bytes, run_ocr, data, request.query.get("raw") != "1")
+    return web.json_response({"text": text, "confidence": confidence})
+
+
+async def transcribe(request: web.Request):
+    app = request.app
+    data = await request.read()
+    if not data:
+        raise web.HTTPBadRequest(reason="Audio bytes are required")
+
+    from multimodal.asr import is_available, iter_transcribe, transcribe as transcribe_audio
+
+    if not is_available():
+        raise web.HTTPServiceUnavailable(reason="Audio transcription is unavailable")
+
+    if request.query.get("stream") != "1":
+        async with app["limits"]["transcribe"]:
+            try:
+                result = await _off_loop(app, transcribe_audio, data)
+            except ValueError as e:
+                raise web.HTTPBadRequest(reason=str(e))
+        return web.json_response({k: result[k] for k in ("text", "confidence", "segments")})
+
+    response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+    await response.prepare(request)
+    async with app["limits"]["transcribe"]:
+        try:
+            async for partial in _iter_off_loop(app, iter_transcribe, data):
+                await response.write((_dumps(partial) + "\n").encode("utf-8"))
+        except ValueError as e:
+            # Headers are already sent; report the failure in-band
+            await response.write((_dumps({"error": str(e), "done": True}) + "\n").encode("utf-8"))
+    await response.write_eof()
+    return response
+
+
+async def health(request: web.Request):
+    return web.json_response({"status": "ok"})
+
+
+async def stats(request: web.Request):
+    app = request.app
+    return web.json_response({
+        "models": registry.stats(),
+        "solve_cache": SolverAgent.cache.stats(),
+        "retrieval_cache": RAGRetriever.cache_stats(),
+        "retrieval_batching": app["batcher"].stats(),
+        "metrics": METRICS.snapshot(),
+    })
+
+
+async def metrics(request: web.Request):
+    return web.Response(
+        text=METRICS.render_prometheus(),
+        content_type="text/plain",
+        charset="utf-8",
+        headers={"X-Prometheus-Format": "0.0.4"}
+    )
+
+
+@web.middleware
+async def trace_requests(request: web.Request, handler):
+    # One span per request, named after the route (not the raw path, to
+    # keep metric cardinality bounded)
+    resource = request.match_info.route.resource
+    name = "http." + (resource.canonical.strip("/") if resource is not None else "unmatched")
+    with span(name, method=request.method) as s:
+        response = await handler(request)
+        s.set(status=response.status)
+        return response
+
+
+async def _json_body(request: web.Request) -> dict:
+    try:
+        body = await request.json()
+    except ValueError:
+        raise web.HTTPBadRequest(reason="Request body is not valid JSON")
+    if not isinstance(body, dict):
+        raise web.HTTPBadRequest(reason="Request body must be a JSON object")
+    return body
+
+
+def _ocr_bytes(run_ocr, data: bytes, preprocess: bool = True):
+    import numpy as np
+    from PIL import Image
+
+    image = Image.open(io.BytesIO(data)).convert("RGB")
+    return run_ocr(np.asarray(image), preprocess=preprocess)
+
+
+async def _off_loop(app: web.Application, fn, *args):
+    # Executor threads do not inherit contextvars; carry the request's
+    # span context over so work done there nests under it
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(app["executor"], context.run, fn, *args)
+
+
+async def _iter_off_loop(app: web.Application, fn, *args):
+    # Runs a blocking generator on the executor and hands its items to
+    # the event loop as they are produced
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    done = object()
+
+    def produce():
+        try:
+            for item in fn(*args):
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, done)
+
+    producer = loop.run_in_executor(app["executor"], contextvars.copy_context().run, produce)
+    while True:
+        item = await queue.get()
+        if item is done:
+            break
+        if isinstance(item, Exception):
+            raise item
+        yield item
+    await producer
+
+
+def _dumps(obj) -> str:
+    import json
+
+    return json.dumps(obj, default=str)
+
+
+# -------------------------------------------------
+# APP
+# -------------------------------------------------
+def create_app(workers: int = 32, warm_up: bool = True) -> web.Application:
+    app = web.Application(middlewares=[trace_requests])
+    app["executor"] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api")
+    # Batches run one at a time, so one thread is enough
+    app["retrieve_executor"] = ThreadPoolExecutor(max_workers=1, thread_name_prefix="api-retrieve")
+    app["batcher"] = EmbeddingBatcher(app["retrieve_executor"])
+
+    async def on_startup(app):
+        loop = asyncio.get_running_loop()
+        app["limits"] = {name: asyncio.Semaphore(n) for name, n in STAGE_LIMITS.items()}
+        app["batcher"].start()
+        app["pipeline"] = MathPipeline(retriever=_BatchedRetriever(app["batcher"], loop))
+        if warm_up:
+            await loop.run_in_executor(app["executor"], app["pipeline"].warm_up)
+
+    async def on_cleanup(app):
+        await app["batcher"].stop()
+        app["executor"].shutdown(wait=False)
+        app["retrieve_executor"].shutdown(wait=False)
+
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+
+    app.router.add_post("/solve", solve)
+    app.router.add_post("/retrieve", retrieve)
+    app.router.add_post("/ocr", ocr)
+    app.router.add_post("/transcribe", transcribe)
+    app.router.add_get("/health", health)
+    app.router.add_get("/stats", stats)
+    app.router.add_get("/metrics", metrics)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AI Math Mentor HTTP API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=32, help="Threads for blocking work")
+    parser.add_argument("--log-json", action="store_true", help="Log every span as a JSON line on stderr")
+    args = parser.parse_args()
+
+    if args.log_json:
+        configure_logging()
+
+    web.run_app(create_app(workers=args.workers), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
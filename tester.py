@@ -1,6 +1,6 @@
-from rag.retriever import RagRetriever
+from rag.retriever import RAGRetriever
 
-r = RagRetriever()
+r = RAGRetriever()
 context = r.retrieve("minimum value of quadratic function")
 
 for c in context:
@@ -0,0 +1,29 @@
+import sqlite3
+import time
+
+from utils.cache import DiskCache
+
+
+def rows(path) -> int:
+    return sqlite3.connect(path).execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+
+def test_expired_row_deleted_on_get(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = DiskCache(path, ttl=0.05, purge_interval=3600)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    time.sleep(0.1)
+    assert cache.get("a") is None
+    assert rows(path) == 0
+
+
+def test_set_purges_expired_rows(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = DiskCache(path, ttl=0.05, purge_interval=0)
+    for i in range(10):
+        cache.set(f"old{i}", i)
+    time.sleep(0.1)
+    cache.set("new", 1)
+    assert rows(path) == 1
+    assert cache.get("new") == 1
@@ -0,0 +1,30 @@
+import pytest
+
+from pipeline.dag import Stage, StageGraph
+
+
+def fail(ctx):
+    raise RuntimeError("store unavailable")
+
+
+def test_optional_stage_failure_does_not_stop_run():
+    graph = StageGraph([
+        Stage("a", lambda ctx: 1),
+        Stage("optional", fail, deps=["a"], optional=True),
+        Stage("after_optional", lambda ctx: ctx["optional"], deps=["optional"]),
+        Stage("b", lambda ctx: ctx["a"] + 1, deps=["a"]),
+        Stage("c", lambda ctx: ctx["b"] + 1, deps=["b"]),
+    ])
+    run = graph.run({})
+
+    assert run.context["c"] == 3
+    assert run.state["optional"] == "failed"
+    assert run.state["after_optional"] == "skipped"
+    assert isinstance(run.errors["optional"], RuntimeError)
+    assert not run.cancel_event.is_set()
+
+
+def test_required_stage_failure_is_raised():
+    graph = StageGraph([Stage("a", lambda ctx: 1), Stage("b", fail, deps=["a"])])
+    with pytest.raises(RuntimeError):
+        graph.run({})
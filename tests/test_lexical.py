@@ -0,0 +1,29 @@
+import numpy as np
+
+from rag.lexical import BM25Index, DOCS_FILE, TF_FILE, build_bm25
+
+TEXTS = [
+    "solve x^2 - 4 = 0 by factoring",
+    "the determinant det of a 2x2 matrix",
+    "",
+    "integral ∫ x^2 dx and the derivative f' of x^2",
+    "factoring a quadratic: x^2 + 5x + 6",
+]
+
+
+def test_spilled_runs_match_single_block(tmp_path):
+    one, many = tmp_path / "one", tmp_path / "many"
+    one.mkdir()
+    many.mkdir()
+    build_bm25(TEXTS, str(one))
+    build_bm25(TEXTS, str(many), block_postings=2)
+
+    for name in (DOCS_FILE, TF_FILE):
+        assert np.array_equal(np.load(one / name), np.load(many / name))
+    assert BM25Index(str(many)).search("x^2 factoring", 2) == BM25Index(str(one)).search("x^2 factoring", 2)
+    assert sorted(p.name for p in many.iterdir()) == sorted(p.name for p in one.iterdir())
+
+
+def test_empty_corpus(tmp_path):
+    build_bm25([], str(tmp_path))
+    assert BM25Index(str(tmp_path)).search("x", 3) == []
@@ -0,0 +1,36 @@
+import json
+import multiprocessing as mp
+import sqlite3
+
+from memory.memory_store import SCHEMA_VERSION, MemoryStore
+
+
+def _open(paths):
+    path, legacy_path = paths
+    MemoryStore(path=path, legacy_path=legacy_path).close()
+
+
+def test_concurrent_open_migrates_once(tmp_path):
+    path, legacy_path = str(tmp_path / "memory.db"), str(tmp_path / "memory.json")
+    with open(legacy_path, "w") as f:
+        json.dump([{"problem_text": f"x^2 - {i} = 0", "final_answer": "?"} for i in range(20)], f)
+
+    with mp.get_context("spawn").Pool(4) as pool:
+        pool.map(_open, [(path, legacy_path)] * 4)
+
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT COUNT(*) FROM records").fetchone()[0] == 20
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+
+
+def test_feedback_counters_accumulate(tmp_path):
+    store = MemoryStore(path=str(tmp_path / "memory.db"), legacy_path=None)
+    record = {"problem_text": "x^2 - 4 = 0", "final_answer": "x = -2, 2", "steps": [], "verified": True}
+    store.save({**record, "user_feedback": "correct"})
+    store.save({**record, "user_feedback": "correct"})
+    store.save({**record, "user_feedback": "incorrect", "correction": "check the sign"})
+
+    saved = store._find_exact("x^2 - 4 = 0")
+    assert saved["feedback"] == {"correct": 2, "incorrect": 1}
+    assert saved["correction"] == "check the sign"
+    store.close()
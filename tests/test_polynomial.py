@@ -0,0 +1,52 @@
+import sympy as sp
+
+from utils.polynomial import solve_polynomial
+
+x = sp.Symbol("x")
+
+
+def numeric(roots):
+    return sorted((complex(sp.N(r)) for r in roots), key=lambda c: (round(c.real, 6), round(c.imag, 6)))
+
+
+def test_repeated_roots_stay_exact():
+    roots, tier = solve_polynomial(x**4 - 4 * x**2 + 4, x)
+    assert roots == [-sp.sqrt(2), sp.sqrt(2)]
+    assert tier == "numpy"
+
+
+def test_repeated_rational_root_listed_once():
+    roots, _ = solve_polynomial(x * (x - 1) ** 3 * (x + 2), x)
+    assert roots == [-2, 0, 1]
+
+
+def test_irrational_roots_are_radicals():
+    roots, _ = solve_polynomial(x**4 - 2, x)
+    root = sp.Integer(2) ** sp.Rational(1, 4)
+    assert set(roots) == {-root, root, -root * sp.I, root * sp.I}
+
+
+def test_purely_imaginary_roots():
+    roots, _ = solve_polynomial(x**4 + 4 * x**2 + 4, x)
+    assert roots == [-sp.sqrt(2) * sp.I, sp.sqrt(2) * sp.I]
+
+
+def test_float_coefficients_have_no_rounding_noise():
+    roots, tier = solve_polynomial(x**4 + sp.Float(1.5) * x**2 + sp.Float(0.5), x)
+    assert tier == "numpy"
+    assert all(sp.re(r) == 0 for r in roots)
+    expected = numeric([-sp.I, -sp.sqrt(2) / 2 * sp.I, sp.sqrt(2) / 2 * sp.I, sp.I])
+    assert all(abs(a - b) < 1e-9 for a, b in zip(numeric(roots), expected))
+
+
+def test_float_repeated_roots_merge():
+    roots, _ = solve_polynomial(sp.Float(1.0) * x**4 - sp.Float(4.0) * x**2 + sp.Float(4.0), x)
+    assert len(roots) == 2
+    assert all(r.is_real for r in roots)
+
+
+def test_float_double_root_in_closed_form():
+    roots, tier = solve_polynomial(x**2 - sp.Float(0.2) * x + sp.Float(0.01), x)
+    assert tier == "closed_form"
+    assert len(roots) == 1
+    assert abs(roots[0] - 0.1) < 1e-12
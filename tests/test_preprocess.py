@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+
+from multimodal.preprocess import _skew_angle
+
+
+def lines(height: int = 400, width: int = 600) -> np.ndarray:
+    image = np.full((height, width), 255, dtype=np.uint8)
+    for y in range(40, height - 20, 30):
+        cv2.putText(image, "x^2 + 3x - 4 = 0 solve", (20, y), cv2.FONT_HERSHEY_SIMPLEX, 0.7, 0, 2)
+    return image
+
+
+def rotated(image: np.ndarray, angle: float) -> np.ndarray:
+    height, width = image.shape
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    return cv2.warpAffine(image, matrix, (width, height), borderValue=255)
+
+
+def test_blank_image_is_not_rotated():
+    assert _skew_angle(np.full((400, 600), 255, dtype=np.uint8), 10.0, 0.5) == 0.0
+
+
+def test_skew_is_recovered():
+    assert _skew_angle(rotated(lines(), 5), 10.0, 0.5) == pytest.approx(-5.0)
+
+
+def test_angle_stays_within_max_skew():
+    assert abs(_skew_angle(rotated(lines(), 5), 3.0, 0.5)) <= 3.0
@@ -0,0 +1,59 @@
+from agents.problem_ir import build_ir
+from agents.router_agent import RouterAgent
+from agents.solver_agent import SolverAgent
+from utils.answer_validator import AnswerValidator
+from utils.cache import LRUCache, TieredCache
+
+
+def solve(text: str, route: str) -> dict:
+    SolverAgent.cache = TieredCache(LRUCache())
+    return SolverAgent(isolate=False).solve({"problem_text": text, "ir": build_ir(text)}, [], route)
+
+
+def test_answer_labelled_with_ir_parameter():
+    result = solve("f(x) = x^2 - 6x + c, minimum value = 0, find c", "quadratic_optimization")
+    assert result["final_answer"] == "c = 9"
+    assert not result.get("error")
+
+
+def test_equation_in_y_passes_validation():
+    result = solve("y^2 - 4 = 0", "quadratic_equation")
+    assert result["final_answer"] == "y = -2, 2"
+    assert not result.get("error")
+
+
+def test_validator_uses_ir_variable():
+    ir = build_ir("t^2 - 1 = 0")
+    assert AnswerValidator.validate("quadratic_equation", "t = -1, 1", ir)
+    assert not AnswerValidator.validate("quadratic_equation", "x = -1, 1", ir)
+
+
+def test_canonical_key_separates_objectives():
+    agent = SolverAgent(isolate=False)
+    keys = {
+        agent._canonical_key({"ir": build_ir(f"f(x) = x^3 - 3x, find the {objective}")}, "quadratic_optimization")
+        for objective in ("minimum", "maximum")
+    }
+    assert len(keys) == 2
+
+
+def test_cubic_minimum_uses_local_minimum():
+    result = solve("f(x) = x^3 - 3x, find the minimum", "quadratic_optimization")
+    assert result["final_answer"] == "Minimum value = -2"
+
+
+def test_prose_before_definition_routes_to_optimization():
+    text = "Find the minimum value of f(x) = x^2 - 4x + 3"
+    ir = build_ir(text)
+    assert ir["kind"] == "function"
+    route = RouterAgent().route({"problem_text": text, "ir": ir})
+    assert route == "quadratic_optimization"
+
+    result = solve(text, route)
+    assert result["final_answer"] == "Minimum value = -1"
+    assert not result.get("error")
+
+
+def test_run_together_words_are_not_a_function():
+    ir = build_ir("Findtheminimumvalueoff(x) = x^2")
+    assert ir["kind"] == "text"
@@ -0,0 +1,37 @@
+import sympy as sp
+
+from agents.problem_ir import build_ir
+from agents.verifier_agent import VerifierAgent
+
+
+def problem(text: str) -> dict:
+    return {"problem_text": text, "ir": build_ir(text)}
+
+
+def test_local_maximum_rejected_as_minimum():
+    values = {"vertex": sp.srepr(sp.Integer(-1)), "extremum": sp.srepr(sp.Integer(2))}
+    verdict = VerifierAgent(isolate=False).verify(
+        problem("f(x) = x^3 - 3x, find the minimum"),
+        {"final_answer": "Minimum value = 2", "values": values},
+    )
+    assert not verdict["is_valid"]
+
+
+def test_local_minimum_accepted():
+    values = {"vertex": sp.srepr(sp.Integer(1)), "extremum": sp.srepr(sp.Integer(-2))}
+    verdict = VerifierAgent(isolate=False).verify(
+        problem("f(x) = x^3 - 3x, find the minimum"),
+        {"final_answer": "Minimum value = -2", "values": values},
+    )
+    assert verdict["is_valid"]
+
+
+def test_solver_error_rejected():
+    verdict = VerifierAgent(isolate=False).verify(
+        problem("x^2 - 4 = 0"),
+        {
+            "final_answer": "The computed result does not match the expected answer type for this problem.",
+            "error": "Answer-type validation failed",
+        },
+    )
+    assert not verdict["is_valid"]
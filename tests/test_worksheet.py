@@ -0,0 +1,35 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from multimodal.worksheet import _completion_order, detect_regions
+
+
+def test_blank_page_falls_back_to_whole_page():
+    page = np.full((120, 90, 3), 255, dtype=np.uint8)
+    assert detect_regions(page) == [(0, 0, 90, 120)]
+
+
+def test_uniform_dark_page_falls_back_to_whole_page():
+    assert detect_regions(np.zeros((50, 40), dtype=np.uint8)) == [(0, 0, 40, 50)]
+
+
+def _sleep_batch(delays):
+    time.sleep(max(delays))
+    return delays
+
+
+def test_slow_first_batch_does_not_hold_back_the_rest():
+    batches = [[("slow", 0.5)], [("fast-1", 0.0)], [("fast-2", 0.0)]]
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        order = [metas[0] for metas, _ in _completion_order(executor, batches, 10, _sleep_batch)]
+    assert order[-1] == "slow"
+    assert sorted(order) == ["fast-1", "fast-2", "slow"]
+
+
+def test_window_limits_batches_in_flight():
+    batches = [[(i, 0.0)] for i in range(7)]
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        done = sorted(metas[0] for metas, _ in _completion_order(executor, batches, 2, _sleep_batch))
+    assert done == list(range(7))
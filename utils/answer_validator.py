@@ -4,38 +4,43 @@ import re
 class AnswerValidator:
     """
     Validates solver output against expected answer type.
+
+    Symbol names come from the problem IR when one is given (the
+    equation's variable, the function's parameters); without an IR the
+    historical x / k are assumed.
     """
 
     @staticmethod
-    def validate(route: str, final_answer: str) -> bool:
+    def validate(route: str, final_answer: str, ir: dict = None) -> bool:
         if not final_answer or not isinstance(final_answer, str):
             return False
 
         answer = final_answer.lower()
+        variable = (ir or {}).get("variable") or "x"
+        parameters = (ir or {}).get("parameters") or ["k"]
 
         # -------- Quadratic equation --------
         if route == "quadratic_equation":
-            # Must solve for x
-            return bool(
-                re.search(r"x\s*=", answer) or
-                re.search(r"x\s*∈", answer)
-            )
+            # Must solve for the equation's variable
+            return _solves_for(final_answer, [variable], r"[=∈]")
 
         # -------- Quadratic optimization --------
         if route == "quadratic_optimization":
-            # Must mention k or minimum/maximum
+            # Must solve for a parameter or mention minimum/maximum
             return (
-                "k =" in answer or
+                _solves_for(final_answer, parameters) or
                 "minimum" in answer or
                 "maximum" in answer
             )
 
         # -------- Expression analysis --------
         if route == "expression_analysis":
-            # Must return expression, not x or k
-            return not (
-                "x =" in answer or
-                "k =" in answer
-            )
+            # Must return expression, not a solved symbol
+            return not _solves_for(final_answer, [variable] + parameters)
 
         return False
+
+
+def _solves_for(answer: str, symbols: list, relation: str = "=") -> bool:
+    names = "|".join(re.escape(s) for s in symbols)
+    return bool(re.search(rf"(?<![a-zA-Z])(?:{names})\s*{relation}", answer))
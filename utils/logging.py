@@ -0,0 +1,348 @@
+"""
+Span-based tracing, Prometheus-style metrics and JSON logs.
+
+    from utils.logging import span, start_trace
+
+    with start_trace("solve") as trace:
+        with span("agent.solver", route=route, input_size=len(text)) as s:
+            ...
+            s.set(cache_hit=True)
+    trace.to_dict()   # every span opened in this context, with timings
+
+Spans nest through contextvars, so they pick up their parent and the
+active trace automatically, also across await points. Thread pools do
+not inherit context: spans opened there still feed the metrics and the
+JSON log, but only join a trace when the caller passes the context along
+(contextvars.copy_context().run).
+
+Every finished span updates METRICS (duration histogram, error and
+cache-hit counters per span name) and emits one JSON log line on the
+"math_mentor.trace" logger at DEBUG level, which is silent until
+configure_logging() is called.
+"""
+import contextvars
+import functools
+import itertools
+import json
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+
+LOGGER_NAME = "math_mentor.trace"
+METRIC_PREFIX = "math_mentor"
+DURATION_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+logger = logging.getLogger(LOGGER_NAME)
+logger.addHandler(logging.NullHandler())
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_span_ids = itertools.count(1)
+
+
+# -------------------------------------------------
+# SPANS AND TRACES
+# -------------------------------------------------
+class Span:
+    __slots__ = ("id", "parent_id", "name", "attrs", "start", "duration", "error", "thread")
+
+    def __init__(self, name: str, parent_id: Optional[int], attrs: dict):
+        self.id = next(_span_ids)
+        self.parent_id = parent_id
+        self.name = name
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.duration = None
+        self.error = None
+        self.thread = threading.current_thread().name
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        return None if self.duration is None else round(self.duration * 1000, 3)
+
+    def to_dict(self, origin: float = None) -> dict:
+        return {
+            "id": self.id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 3) if origin is not None else None,
+            "duration_ms": self.duration_ms,
+            "attrs": self.attrs,
+            "error": self.error,
+            "thread": self.thread,
+        }
+
+
+class Trace:
+    """
+    The spans of one request (one app run, one pipeline.run, one API call).
+    """
+
+    def __init__(self, name: str, attrs: dict = None):
+        self.name = name
+        self.attrs = attrs or {}
+        self.start = time.perf_counter()
+        self.duration = None
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span_: Span):
+        with self._lock:
+            self.spans.append(span_)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start)
+        end = self.duration if self.duration is not None else time.perf_counter() - self.start
+        return {
+            "name": self.name,
+            "attrs": self.attrs,
+            "duration_ms": round(end * 1000, 3),
+            "spans": [s.to_dict(self.start) for s in spans],
+        }
+
+    def rows(self) -> List[dict]:
+        """
+        Flat, display-ready rows in start order, with the span name
+        indented by nesting depth.
+        """
+        spans = self.to_dict()["spans"]
+        depth = {}
+        rows = []
+        for s in spans:
+            depth[s["id"]] = depth.get(s["parent_id"], -1) + 1
+            rows.append({
+                "span": "  " * depth[s["id"]] + s["name"],
+                "start_ms": s["start_ms"],
+                "duration_ms": s["duration_ms"],
+                "details": ", ".join(f"{k}={v}" for k, v in s["attrs"].items()),
+                "error": s["error"] or "",
+            })
+        return rows
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """
+    Times the enclosed block. Attributes can be added while it runs with
+    span.set(); cache_hit=True/False is also counted in the metrics.
+    """
+    parent = _current_span.get()
+    current = Span(name, parent.id if parent is not None else None, attrs)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"[:300]
+        raise
+    finally:
+        current.duration = time.perf_counter() - current.start
+        _current_span.reset(token)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(current)
+        _record(current)
+
+
+def traced(name: str = None):
+    """
+    Decorator form of span() for functions and methods.
+    """
+    def decorator(fn):
+        span_name = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def start_trace(name: str, **attrs):
+    """
+    Collects every span opened in this context into a Trace. Nested calls
+    join the outer trace instead of starting a new one.
+    """
+    outer = _current_trace.get()
+    if outer is not None:
+        yield outer
+        return
+
+    trace = Trace(name, attrs)
+    token = _current_trace.set(trace)
+    try:
+        with span(name, **attrs):
+            yield trace
+    finally:
+        trace.duration = time.perf_counter() - trace.start
+        _current_trace.reset(token)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+# -------------------------------------------------
+# METRICS
+# -------------------------------------------------
+class MetricsRegistry:
+    """
+    Thread-safe counters and histograms, rendered in the Prometheus text
+    exposition format.
+    """
+
+    def __init__(self, prefix: str = METRIC_PREFIX, buckets=DURATION_BUCKETS):
+        self.prefix = prefix
+        self.buckets = buckets
+        self._counters: Dict[tuple, float] = {}
+        self._histograms: Dict[tuple, list] = {}
+        self._help: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, labels: dict = None, value: float = 1.0, help: str = ""):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._help.setdefault(name, ("counter", help))
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, labels: dict = None, help: str = ""):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._help.setdefault(name, ("histogram", help))
+            # [bucket counts..., sum, count]
+            state = self._histograms.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def snapshot(self) -> dict:
+        """
+        Plain-dict view (counters, and count / sum per histogram) for /stats
+        style JSON endpoints.
+        """
+        with self._lock:
+            counters = {_series(name, labels): value for (name, labels), value in self._counters.items()}
+            histograms = {
+                _series(name, labels): {"count": state[-1], "sum": round(state[-2], 6)}
+                for (name, labels), state in self._histograms.items()
+            }
+        return {"counters": counters, "histograms": histograms}
+
+    def render_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            for name, (kind, help_text) in sorted(self._help.items()):
+                full = f"{self.prefix}_{name}"
+                if help_text:
+                    lines.append(f"# HELP {full} {help_text}")
+                lines.append(f"# TYPE {full} {kind}")
+
+                if kind == "counter":
+                    for (series, labels), value in sorted(self._counters.items()):
+                        if series == name:
+                            lines.append(f"{full}{_format_labels(labels)} {value:g}")
+                    continue
+
+                for (series, labels), state in sorted(self._histograms.items()):
+                    if series != name:
+                        continue
+                    for bound, count in zip(self.buckets, state):
+                        lines.append(f"{full}_bucket{_format_labels(labels + (('le', f'{bound:g}'),))} {count}")
+                    lines.append(f"{full}_bucket{_format_labels(labels + (('le', '+Inf'),))} {state[-1]}")
+                    lines.append(f"{full}_sum{_format_labels(labels)} {state[-2]:.6f}")
+                    lines.append(f"{full}_count{_format_labels(labels)} {state[-1]}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._help.clear()
+
+
+def _label_key(labels: Optional[dict]) -> tuple:
+    return tuple(sorted((labels or {}).items()))
+
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in labels
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+
+def _series(name: str, labels: tuple) -> str:
+    return name + _format_labels(labels)
+
+
+METRICS = MetricsRegistry()
+
+
+def _record(finished: Span):
+    labels = {"span": finished.name}
+    METRICS.observe("span_duration_seconds", finished.duration, labels, help="Span wall-clock duration")
+    if finished.error is not None:
+        METRICS.inc("span_errors_total", labels, help="Spans that raised")
+
+    cache_hit = finished.attrs.get("cache_hit")
+    if isinstance(cache_hit, bool):
+        METRICS.inc(
+            "cache_requests_total", {**labels, "result": "hit" if cache_hit else "miss"},
+            help="Cache lookups by span and outcome"
+        )
+
+    if logger.isEnabledFor(logging.DEBUG):
+        trace = _current_trace.get()
+        logger.debug(finished.name, extra={"span": {
+            **finished.to_dict(),
+            "trace": trace.name if trace is not None else None,
+        }})
+
+
+# -------------------------------------------------
+# JSON LOGS
+# -------------------------------------------------
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line; span fields are merged in when present.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        payload.update(getattr(record, "span", None) or {})
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+def configure_logging(level: str = "DEBUG", json_logs: bool = True, stream=None):
+    """
+    Sends span logs (and anything else on the math_mentor.* loggers) to
+    stream (stderr by default), as JSON lines unless json_logs=False.
+    """
+    parent = logging.getLogger(LOGGER_NAME.split(".")[0])
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(JsonFormatter() if json_logs else logging.Formatter(
+        "%(asctime)s %(levelname)s %(name)s %(message)s"
+    ))
+    parent.handlers = [handler]
+    parent.setLevel(level)
+    parent.propagate = False
@@ -0,0 +1,174 @@
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+from utils.logging import span
+
+
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+VECTOR_STORE_PATH = "rag/vector_store"
+WHISPER_MODEL = "base"
+OCR_LANGUAGES = ["en"]
+SOLVER_TIMEOUT = 10.0
+SOLVER_MEMORY_LIMIT_MB = 1024
+
+
+class ModelRegistry:
+    """
+    Process-wide registry of heavy resources (embedder, vector store,
+    Whisper, EasyOCR, the SymPy worker pool).
+
+    Each resource is loaded lazily on first use, exactly once per process,
+    and then shared by every caller. Streamlit re-executes app.py on every
+    rerun but keeps imported modules alive, so the module-level `registry`
+    survives reruns and is shared between sessions.
+    """
+
+    def __init__(self):
+        self._loaders: Dict[str, Callable] = {}
+        self._resources: Dict[str, object] = {}
+        self._locks: Dict[str, threading.RLock] = {}
+        self._lock = threading.Lock()
+        self.load_times: Dict[str, float] = {}
+
+    def register(self, name: str, loader: Callable):
+        with self._lock:
+            self._loaders[name] = loader
+            self._locks.setdefault(name, threading.RLock())
+
+    def get(self, name: str):
+        # Fast path: already loaded, no locking needed
+        resource = self._resources.get(name)
+        if resource is not None:
+            return resource
+
+        with self._lock:
+            if name not in self._loaders:
+                raise KeyError(f"Unknown resource: {name}")
+            lock = self._locks[name]
+
+        # Per-resource lock so a slow Whisper load never blocks the embedder
+        with lock:
+            resource = self._resources.get(name)
+            if resource is None:
+                start = time.perf_counter()
+                with span("model.load", model=name):
+                    resource = self._loaders[name]()
+                self.load_times[name] = time.perf_counter() - start
+                self._resources[name] = resource
+            return resource
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._resources
+
+    def reset(self, name: str):
+        """
+        Drops a loaded resource so the next get() reloads it
+        (e.g. after the vector store has been rebuilt on disk).
+        """
+        with self._locks.get(name, self._lock):
+            self._resources.pop(name, None)
+            self.load_times.pop(name, None)
+
+    def warm_up(self, names: Optional[Iterable[str]] = None, background: bool = False):
+        """
+        Loads the given resources (all registered ones by default).
+        With background=True the loads run in a daemon thread and the
+        thread is returned immediately.
+        """
+        names = list(names) if names is not None else list(self._loaders)
+        names = [name for name in names if not self.is_loaded(name)]
+        if not names:
+            return None
+
+        def _load_all():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception:
+                    # Warm-up is best effort; the real caller will surface the error
+                    pass
+
+        if background:
+            thread = threading.Thread(target=_load_all, name="model-warmup", daemon=True)
+            thread.start()
+            return thread
+
+        _load_all()
+        return None
+
+    def stats(self) -> dict:
+        return {
+            name: {
+                "loaded": name in self._resources,
+                "load_seconds": self.load_times.get(name),
+            }
+            for name in self._loaders
+        }
+
+
+# -------------------------------------------------
+# BUILT-IN LOADERS
+# Heavy libraries are imported inside the loaders so that importing
+# this module stays cheap.
+# -------------------------------------------------
+class SentenceEmbeddings:
+    """
+    Same model, preprocessing and vectors as LangChain's
+    HuggingFaceEmbeddings, without importing LangChain (and pydantic) at
+    query time. Returns float32 arrays rather than nested lists; every
+    caller converts with np.asarray anyway.
+    """
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+
+        self.client = SentenceTransformer(model_name)
+
+    def embed_documents(self, texts):
+        texts = [text.replace("\n", " ") for text in texts]
+        return self.client.encode(texts, show_progress_bar=False)
+
+    def embed_query(self, text: str):
+        return self.embed_documents([text])[0]
+
+
+def _load_embeddings():
+    return SentenceEmbeddings(EMBEDDING_MODEL)
+
+
+def _load_vector_store():
+    from rag.index_store import IndexStore
+    from rag.store import current_store_dir
+
+    return IndexStore(current_store_dir(VECTOR_STORE_PATH))
+
+
+def _load_whisper():
+    import whisper
+
+    return whisper.load_model(WHISPER_MODEL)
+
+
+def _load_ocr_reader():
+    import easyocr
+
+    return easyocr.Reader(OCR_LANGUAGES, gpu=False)
+
+
+def _load_solver_pool():
+    from utils.process_pool import IsolatedPool
+
+    return IsolatedPool(
+        timeout=SOLVER_TIMEOUT,
+        memory_limit_mb=SOLVER_MEMORY_LIMIT_MB,
+        preload=("sympy", "agents.solver_agent")
+    )
+
+
+registry = ModelRegistry()
+registry.register("embeddings", _load_embeddings)
+registry.register("vector_store", _load_vector_store)
+registry.register("whisper", _load_whisper)
+registry.register("ocr_reader", _load_ocr_reader)
+registry.register("solver_pool", _load_solver_pool)
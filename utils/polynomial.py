@@ -0,0 +1,206 @@
+"""
+Tiered polynomial solving: cheap exact formulas first, sp.solve last.
+
+    closed_form   degree <= 2 with numeric coefficients: the quadratic
+                  (or linear) formula, exact; vertex() for optimization
+    numpy         higher degree with numeric coefficients: NumPy's
+                  companion-matrix roots. With rational coefficients the
+                  polynomial is first split into square-free factors
+                  (sp.sqf_list), so repeated roots cannot split apart;
+                  each factor's rational roots are recovered exactly
+                  (checked in exact arithmetic) and divided out, and a
+                  remaining quadratic is solved in closed form. Float
+                  coefficients stay numeric, with roots closer than
+                  CLUSTER_TOLERANCE merged into one
+    sympy         everything else (symbolic coefficients, non-polynomial
+                  equations, rational cubic/quartic factors left after
+                  the rational roots, which sp.solve gives as radicals)
+
+Exact results are ordered like sp.solve orders them (SymPy's default
+sort key), so answers do not change when a problem moves between tiers.
+"""
+from fractions import Fraction
+
+import numpy as np
+
+
+TIERS = ("closed_form", "numpy", "sympy")
+# Largest denominator tried when recovering rational roots from floats
+MAX_DENOMINATOR = 1000
+# Digits kept for roots that only have a numeric form
+NUMERIC_DIGITS = 10
+ROOT_TOLERANCE = 1e-9
+# Roots NumPy returns this close together (relative) are one repeated root:
+# a root of multiplicity m is perturbed by about eps ** (1 / m)
+CLUSTER_TOLERANCE = 1e-5
+
+
+def slowest(*tiers: str) -> str:
+    return max(tiers, key=TIERS.index)
+
+
+def solve_polynomial(expr, x) -> tuple:
+    """
+    Roots of expr = 0 in x as (list of SymPy numbers, tier).
+    """
+    import sympy as sp
+
+    coeffs = numeric_coeffs(expr, x)
+    if coeffs is None or len(coeffs) < 2:
+        return sp.solve(expr, x), "sympy"
+
+    if len(coeffs) <= 3:
+        return sorted(_closed_form(coeffs), key=sp.default_sort_key), "closed_form"
+
+    if all(c.is_Rational for c in coeffs):
+        return _rational_factors(coeffs, x)
+
+    return _numeric_roots(coeffs), "numpy"
+
+
+def numeric_coeffs(expr, x):
+    """
+    Coefficients (highest degree first) when expr is a polynomial in x
+    with real numeric coefficients, else None.
+    """
+    import sympy as sp
+
+    try:
+        poly = sp.Poly(expr, x)
+    except (sp.PolynomialError, sp.GeneratorsNeeded):
+        return None
+
+    coeffs = poly.all_coeffs()
+    if not all(c.is_number and c.is_real for c in coeffs):
+        return None
+    return coeffs
+
+
+def vertex(expr, x):
+    """
+    (x at the vertex, value there) of a quadratic in x, whose
+    coefficients may contain parameters; None for anything else.
+    """
+    import sympy as sp
+
+    try:
+        poly = sp.Poly(expr, x)
+    except (sp.PolynomialError, sp.GeneratorsNeeded):
+        return None
+    if poly.degree() != 2:
+        return None
+
+    a, b, c = poly.all_coeffs()
+    return -b / (2 * a), c - b ** 2 / (4 * a)
+
+
+# -------------------------------------------------
+# TIERS
+# -------------------------------------------------
+def _closed_form(coeffs: list) -> list:
+    import sympy as sp
+
+    if len(coeffs) == 2:
+        b, c = coeffs
+        return [-c / b]
+
+    a, b, c = coeffs
+    discriminant = b ** 2 - 4 * a * c
+    center = -b / (2 * a)
+    if discriminant == 0:
+        return [center]
+    if any(coeff.is_Float for coeff in coeffs):
+        # b**2 and 4ac cancel only up to rounding
+        if abs(discriminant) <= ROOT_TOLERANCE * max(b ** 2, abs(4 * a * c)):
+            return [center]
+    delta = sp.sqrt(discriminant) / (2 * abs(a))
+    return [center - delta, center + delta]
+
+
+def _rational_factors(coeffs: list, x) -> tuple:
+    """
+    Roots of a rational polynomial, one square-free factor at a time.
+    """
+    import sympy as sp
+
+    exact, numeric, tier = [], [], "numpy"
+    for factor, _ in sp.Poly(coeffs, x, domain=sp.QQ).sqf_list()[1]:
+        rational, rest = _rational_roots([Fraction(int(c.p), int(c.q)) for c in factor.all_coeffs()])
+        rest = [sp.Rational(c.numerator, c.denominator) for c in rest]
+        exact += rational
+        if len(rest) <= 3:
+            exact += _closed_form(rest) if len(rest) > 1 else []
+        elif len(rest) <= 5:
+            # Cubic and quartic factors have radicals; keep sp.solve's exact form
+            exact += sp.solve(sp.Poly(rest, x).as_expr(), x)
+            tier = "sympy"
+        else:
+            numeric += _numeric_roots(rest)
+
+    return sorted(exact, key=sp.default_sort_key) + numeric, tier
+
+
+def _rational_roots(coeffs: list) -> tuple:
+    """
+    Exact rational roots of a rational polynomial, found from NumPy's
+    approximations, and the coefficients left after dividing them out.
+    """
+    import sympy as sp
+
+    found = []
+    for guess in np.roots([float(c) for c in coeffs]):
+        if abs(guess.imag) > 1e-6 or len(coeffs) < 2:
+            continue
+        candidate = Fraction(float(guess.real)).limit_denominator(MAX_DENOMINATOR)
+        remainder, quotient = _divide(coeffs, candidate)
+        if remainder == 0:
+            coeffs = quotient
+            if candidate not in found:
+                found.append(candidate)
+            # A repeated root divides out again
+            while len(coeffs) > 1:
+                remainder, quotient = _divide(coeffs, candidate)
+                if remainder != 0:
+                    break
+                coeffs = quotient
+
+    return [sp.Rational(r.numerator, r.denominator) for r in sorted(found)], coeffs
+
+
+def _divide(coeffs: list, root: Fraction) -> tuple:
+    # Synthetic division by (x - root): (remainder, quotient coefficients)
+    quotient = [coeffs[0]]
+    for c in coeffs[1:]:
+        quotient.append(c + quotient[-1] * root)
+    return quotient[-1], quotient[:-1]
+
+
+def _numeric_roots(coeffs: list) -> list:
+    import sympy as sp
+
+    clusters = []
+    for r in np.roots([complex(c) for c in coeffs]):
+        for cluster in clusters:
+            if abs(r - cluster[0]) < CLUSTER_TOLERANCE * max(1.0, abs(r)):
+                cluster.append(r)
+                break
+        else:
+            clusters.append([r])
+
+    roots = []
+    for cluster in clusters:
+        r = complex(np.mean(cluster))
+        # Components that are rounding noise relative to the root are zero
+        scale = ROOT_TOLERANCE * max(1.0, abs(r))
+        roots.append(complex(0.0 if abs(r.real) <= scale else r.real, 0.0 if abs(r.imag) <= scale else r.imag))
+
+    # Real roots ascending, then complex pairs by real part
+    roots.sort(key=lambda r: (r.imag != 0, round(r.real, NUMERIC_DIGITS - 1), r.imag))
+    result = []
+    for r in roots:
+        real = sp.Float(r.real, NUMERIC_DIGITS) if r.real else sp.Integer(0)
+        if not r.imag:
+            result.append(real)
+        else:
+            result.append(real + sp.Float(r.imag, NUMERIC_DIGITS) * sp.I)
+    return result
@@ -0,0 +1,198 @@
+import importlib
+import multiprocessing as mp
+import threading
+import time
+from typing import Callable, Optional
+
+try:
+    import resource
+except ImportError:  # Windows: no per-process memory limits
+    resource = None
+
+
+class TaskTimeout(Exception):
+    pass
+
+
+class TaskCancelled(Exception):
+    pass
+
+
+class WorkerCrashed(Exception):
+    pass
+
+
+class TaskFailed(Exception):
+    pass
+
+
+_POLL_INTERVAL = 0.05
+
+
+def _worker_main(conn, memory_limit_mb: Optional[int], preload: tuple):
+    if memory_limit_mb and resource is not None:
+        limit = memory_limit_mb * 1024 * 1024
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ValueError, OSError):
+            pass
+
+    # Import heavy modules (SymPy) before the first task arrives
+    for module in preload:
+        importlib.import_module(module)
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+
+        fn, args, kwargs = task
+        try:
+            conn.send(("ok", fn(*args, **kwargs)))
+        except MemoryError:
+            conn.send(("error", "MemoryError: worker memory limit exceeded"))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+class _Worker:
+
+    def __init__(self, ctx, memory_limit_mb: Optional[int], preload: tuple):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, memory_limit_mb, preload),
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=1)
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (OSError, BrokenPipeError):
+            pass
+        self.process.join(timeout=1)
+        self.kill()
+
+
+class IsolatedPool:
+    """
+    Bounded pool of long-lived worker processes for CPU-heavy, possibly
+    runaway work (SymPy).
+
+    Every call gets a wall-clock timeout; a worker that exceeds it, is
+    cancelled or dies is killed and replaced, so one bad input never
+    blocks the caller or poisons the pool. On POSIX each worker also runs
+    under an address-space limit (memory_limit_mb).
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        timeout: Optional[float] = 10.0,
+        memory_limit_mb: Optional[int] = 1024,
+        preload: tuple = ()
+    ):
+        self.max_workers = max_workers or mp.cpu_count()
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.preload = tuple(preload)
+
+        # spawn: forking a multi-threaded Streamlit/asyncio process is unsafe
+        self._ctx = mp.get_context("spawn")
+        self._slots = threading.BoundedSemaphore(self.max_workers)
+        self._idle = []
+        self._lock = threading.Lock()
+        self.timeouts = 0
+        self.crashes = 0
+
+    def run(
+        self,
+        fn: Callable,
+        *args,
+        timeout: Optional[float] = None,
+        cancel_event: Optional[threading.Event] = None,
+        **kwargs
+    ):
+        """
+        Runs fn(*args, **kwargs) in a worker and returns its result.
+        fn must be a picklable module-level function.
+
+        Raises TaskTimeout, TaskCancelled, WorkerCrashed or TaskFailed.
+        """
+        timeout = self.timeout if timeout is None else timeout
+
+        with self._slots:
+            worker = self._checkout()
+            try:
+                worker.conn.send((fn, args, kwargs))
+                self._wait(worker, timeout, cancel_event)
+                status, payload = worker.conn.recv()
+            except (TaskTimeout, TaskCancelled):
+                worker.kill()
+                raise
+            except (EOFError, OSError):
+                worker.kill()
+                self.crashes += 1
+                raise WorkerCrashed("Solver worker process died")
+
+            with self._lock:
+                self._idle.append(worker)
+
+        if status == "error":
+            raise TaskFailed(payload)
+        return payload
+
+    def warm_up(self, n: Optional[int] = None):
+        """
+        Starts workers ahead of time so the first call skips process spawn.
+        """
+        n = min(n or self.max_workers, self.max_workers)
+        with self._lock:
+            while len(self._idle) < n:
+                self._idle.append(_Worker(self._ctx, self.memory_limit_mb, self.preload))
+
+    def shutdown(self):
+        with self._lock:
+            workers, self._idle = self._idle, []
+        for worker in workers:
+            worker.stop()
+
+    def stats(self) -> dict:
+        return {
+            "max_workers": self.max_workers,
+            "idle_workers": len(self._idle),
+            "timeouts": self.timeouts,
+            "crashes": self.crashes,
+        }
+
+    def _checkout(self) -> _Worker:
+        with self._lock:
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.process.is_alive():
+                    return worker
+                worker.kill()
+        return _Worker(self._ctx, self.memory_limit_mb, self.preload)
+
+    def _wait(self, worker: _Worker, timeout: Optional[float], cancel_event):
+        deadline = time.monotonic() + timeout if timeout else None
+
+        while not worker.conn.poll(_POLL_INTERVAL):
+            if cancel_event is not None and cancel_event.is_set():
+                raise TaskCancelled("Task cancelled")
+            if deadline is not None and time.monotonic() > deadline:
+                self.timeouts += 1
+                raise TaskTimeout(f"Task exceeded {timeout}s")
+            if not worker.process.is_alive():
+                raise EOFError
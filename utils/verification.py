@@ -0,0 +1,241 @@
+"""
+Numeric verification of solver answers.
+
+The solver's structured values (solution["values"], SymPy srepr
+strings) are substituted back into the problem's IR expression:
+
+    equation      every root makes the equation vanish; for numeric
+                  polynomials no root is missing
+    optimization  f'(vertex) = 0, f(vertex) equals the reported
+                  extremum, the extremum equals the given value once
+                  the constant is substituted, and f'' at the vertex
+                  has the sign a minimum / maximum needs
+    factoring     the factored form equals the expression
+
+Each check is lambdified once (NumPy, cached per process) and evaluated
+in a single vectorized call over a batch of random complex values for
+the free parameters (and for x, when checking an identity). A check
+passes where |residual| <= RESIDUAL_TOLERANCE * (1 + sum of |terms|);
+the confidence is the share of passing (check, sample) pairs. Checks
+that cannot be evaluated numerically (non-lambdifiable functions, every
+sample outside the domain) fall back to sp.simplify(residual) == 0.
+"""
+import functools
+
+import numpy as np
+
+
+SAMPLES = 32
+RESIDUAL_TOLERANCE = 1e-6
+SAMPLE_RANGE = 3.0
+SEED = 7
+
+
+def check_solution(ir: dict, values: dict) -> dict:
+    """
+    {"confidence", "method", "checks", "max_residual", "reason"}; reason
+    names the first failed check (None when everything passed).
+    """
+    import sympy as sp
+
+    from agents.problem_ir import load_expr, variable_symbol
+
+    expr, x = load_expr(ir), variable_symbol(ir)
+    checks = []
+    missing = 0
+
+    if "vertex" in values:
+        vertex, extremum = _load(values["vertex"]), _load(values["extremum"])
+        fixed = {}
+        if values.get("roots"):
+            fixed = {sp.Symbol(values["symbol"]): _load(values["roots"][0])}
+            checks.append(("given value", extremum - sp.sympify(ir["target"]), fixed))
+        checks.append(("critical point", sp.diff(expr, x), {x: vertex, **fixed}))
+        checks.append(("extremum value", expr - extremum, {x: vertex, **fixed}))
+
+        reason = _wrong_direction(expr, x, ir["objective"], {x: vertex, **fixed})
+        if reason:
+            return _result(0.0, "symbolic", len(checks), None, reason)
+
+    elif "roots" in values:
+        roots = [_load(r) for r in values["roots"]]
+        checks += [(f"root {r}", expr, {x: r}) for r in roots]
+        missing = _missing_roots(expr, x, roots, ir)
+
+    elif "factored" in values:
+        checks.append(("factored form", expr - _load(values["factored"]), {}))
+
+    if not checks:
+        return _result(None, "none", 0, None, None)
+
+    # Each check (and each missing root) weighs the same, however many samples it took
+    passed, worst, failed = 0.0, 0.0, None
+    method = "numeric"
+    for name, residual, subs in checks:
+        found = _numeric_check(residual, subs)
+        if found is None:
+            method = "symbolic"
+            found = _symbolic_check(residual, subs)
+        share, max_residual = found
+        passed += share
+        worst = max(worst, max_residual)
+        if share < 1.0 and failed is None:
+            failed = name
+
+    if missing and failed is None:
+        failed = "missing roots"
+    confidence = passed / (len(checks) + missing)
+    return _result(confidence, method, len(checks), worst, f"Check failed: {failed}" if failed else None)
+
+
+def _result(confidence, method, checks, max_residual, reason) -> dict:
+    return {
+        "confidence": None if confidence is None else round(float(confidence), 4),
+        "method": method,
+        "checks": checks,
+        "max_residual": None if max_residual is None else float(f"{max_residual:.3g}"),
+        "reason": reason,
+    }
+
+
+@functools.lru_cache(maxsize=4096)
+def _load(srepr: str):
+    import sympy as sp
+
+    return sp.sympify(srepr)
+
+
+# -------------------------------------------------
+# NUMERIC
+# -------------------------------------------------
+def _numeric_check(residual, subs: dict) -> tuple:
+    """
+    (share of passing samples, max relative residual) for residual(subs)
+    == 0 over random parameter values; None when it cannot be evaluated.
+    """
+    import sympy as sp
+
+    inner = sorted(residual.free_symbols - set(subs), key=str)
+    outer = sorted(set().union(*(sp.sympify(v).free_symbols for v in subs.values())) - set(subs), key=str) if subs else []
+    params = sorted(set(inner) | set(outer), key=str)
+
+    try:
+        terms_fn = _lambdified(residual, tuple(subs) + tuple(params))
+        values_fn = _lambdified(sp.Tuple(*subs.values()), tuple(params)) if subs else None
+    except Exception:
+        return None
+
+    rng = np.random.default_rng(SEED)
+    samples = [
+        rng.uniform(-SAMPLE_RANGE, SAMPLE_RANGE, SAMPLES) + 1j * rng.uniform(-SAMPLE_RANGE, SAMPLE_RANGE, SAMPLES)
+        for _ in params
+    ]
+    if not params:
+        samples = []
+
+    with np.errstate(all="ignore"):
+        try:
+            substituted = values_fn(*samples) if values_fn else ()
+            terms = terms_fn(*[_batch(v) for v in substituted], *[_batch(s) for s in samples])
+        except Exception:
+            return None
+
+        terms = np.array([_batch(t) for t in terms], dtype=complex)
+        total = np.abs(terms.sum(axis=0))
+        scale = 1.0 + np.abs(terms).sum(axis=0)
+        relative = total / scale
+
+    finite = np.isfinite(relative)
+    if not finite.any():
+        return None
+    relative = relative[finite]
+    return float((relative <= RESIDUAL_TOLERANCE).mean()), float(relative.max())
+
+
+def _batch(value) -> np.ndarray:
+    return np.broadcast_to(np.asarray(value, dtype=complex), (SAMPLES,))
+
+
+def _lambdified(expr, args: tuple):
+    # Keyed on srepr so equal expressions built separately share a function
+    import sympy as sp
+
+    return _lambdify_cached(sp.srepr(expr), tuple(sp.srepr(a) for a in args))
+
+
+@functools.lru_cache(maxsize=1024)
+def _lambdify_cached(expr_srepr: str, arg_sreprs: tuple):
+    """
+    For an Expr: a function returning its top-level terms (summed by the
+    caller, which also gives the residual's scale). For a Tuple: its items.
+    """
+    import sympy as sp
+
+    expr = sp.sympify(expr_srepr)
+    args = [sp.sympify(a) for a in arg_sreprs]
+    items = list(expr) if isinstance(expr, sp.Tuple) else list(sp.Add.make_args(expr))
+    return sp.lambdify(args, items, modules="numpy")
+
+
+def _missing_roots(expr, x, roots: list, ir: dict) -> int:
+    """
+    Roots of a numeric polynomial that the answer does not list.
+    """
+    from utils.polynomial import numeric_coeffs
+
+    if ir["parameters"]:
+        return 0
+    coeffs = numeric_coeffs(expr, x)
+    if coeffs is None or len(coeffs) < 2:
+        return 0
+
+    expected = []
+    for r in np.roots([complex(c) for c in coeffs]):
+        if all(abs(r - e) > 1e-6 * max(1.0, abs(r)) for e in expected):
+            expected.append(r)
+    try:
+        given = [complex(r.evalf()) for r in roots]
+    except TypeError:
+        return 0
+    # Repeated roots come back from np.roots slightly apart
+    return sum(
+        1 for e in expected
+        if all(abs(e - g) > 1e-4 * max(1.0, abs(e)) for g in given)
+    )
+
+
+def _wrong_direction(expr, x, objective, point: dict):
+    """
+    Second-derivative test at the reported critical point: f'' > 0 there
+    is a minimum, f'' < 0 a maximum.
+    """
+    import sympy as sp
+
+    if objective is None:
+        return None
+    curvature = sp.diff(expr, x, 2).subs(point)
+    if not curvature.is_number or not curvature.is_real:
+        return None
+    if objective == "minimum" and curvature < 0:
+        return f"f''(x) < 0 at x = {point[x]}, so the reported point is a maximum, not a minimum."
+    if objective == "maximum" and curvature > 0:
+        return f"f''(x) > 0 at x = {point[x]}, so the reported point is a minimum, not a maximum."
+    return None
+
+
+# -------------------------------------------------
+# SYMBOLIC FALLBACK
+# -------------------------------------------------
+def _symbolic_check(residual, subs: dict) -> tuple:
+    import sympy as sp
+
+    try:
+        value = sp.simplify(residual.subs(subs))
+    except Exception:
+        return 0.0, float("inf")
+    if value == 0:
+        return 1.0, 0.0
+    if value.is_number:
+        magnitude = abs(complex(value.evalf()))
+        return float(magnitude <= RESIDUAL_TOLERANCE), magnitude
+    return 0.0, float("inf")